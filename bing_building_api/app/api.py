@@ -1,3 +1,4 @@
+import asyncio
 from typing import Union
 from fastapi import APIRouter, Request
 from fastapi.responses import FileResponse
@@ -5,12 +6,14 @@ from shapely.geometry import shape, box
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from loguru import logger
-import json
 
 from app import schemas
 from app.config import settings
+from app.responses import ORJSONResponse
 from app.services.query import BingBuildingQuery
 from app.services.downloader import BingBuildingDownloader
+from app.services.cache import quadkey_cache
+from app.services.manifest import dataset_manifest
 
 api_router = APIRouter()
 
@@ -32,14 +35,25 @@ def health() -> dict:
     )
     return health.model_dump()
 
+@api_router.get("/stats", response_model=schemas.Stats, status_code=200)
+async def stats() -> dict:
+    """
+    Usage of the quadkey cache and version of the dataset links index
+    """
+    stats = schemas.Stats(
+        quadkey_cache=quadkey_cache.stats(),
+        dataset_links=await asyncio.to_thread(dataset_manifest.stats),
+    )
+    return stats.model_dump()
+
 @api_router.post('/query/buildings',
                 response_model=Union[schemas.BuildingResponse, schemas.ErrorResponse],
                 status_code=200)
 async def query_buildings(request: schemas.BatchGeometryRequest):
     try:
         query_engine = BingBuildingQuery()
-        results = query_engine.query_buildings(request.geometries)
-        return JSONResponse(content=json.loads(results))
+        results = query_engine.query_buildings(request.geometries, request.tag_geometry_index)
+        return ORJSONResponse(content=results)
     except Exception as e:
         print(e)
         return JSONResponse(
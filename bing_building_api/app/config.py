@@ -8,8 +8,18 @@ class Settings(BaseSettings):
     ZOOM_LEVEL: int = 9
     BING_BUILDING_CRS: int = 4326
     
+    # Global index of the building files, mirrored to a SQLite database in data_dir
+    DATASET_LINKS_URL: str = "https://minedbuildings.z5.web.core.windows.net/global-buildings/dataset-links.csv"
+    # Seconds between checks of DATASET_LINKS_URL for a new version
+    DATASET_LINKS_REFRESH_SECONDS: int = 24 * 3600
+    
+    # Features buffered per downloaded file before they are appended to disk
+    DOWNLOAD_BATCH_SIZE: int = 10000
+    
     data_dir: str = "data"
     cache_dir: str = "cache"
+    # Memory budget for parsed quadkeys kept between queries, least recently used ones are dropped
+    QUADKEY_CACHE_MAX_BYTES: int = 2 * 1024**3
 
     class Config:
         case_sensitive = True
@@ -1,17 +1,33 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from app.api import api_router
 from app.config import settings
+from app.responses import ORJSONResponse
+from app.services.manifest import dataset_manifest
 from loguru import logger
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keep the local index of dataset-links.csv up to date while the app runs."""
+    dataset_manifest.start()
+    try:
+        yield
+    finally:
+        await dataset_manifest.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.API_VERSION,
     openapi_url="/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -0,0 +1,20 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON with orjson, accepting NumPy arrays and scalars directly."""
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Large FeatureCollections serialize several times faster than with the
+    standard library encoder used by JSONResponse.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
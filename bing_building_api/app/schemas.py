@@ -6,6 +6,11 @@ class Health(BaseModel):
     name: str
     api_version: str
 
+class Stats(BaseModel):
+    """Cache and dataset index statistics schema"""
+    quadkey_cache: Dict[str, Any]
+    dataset_links: Dict[str, Any]
+
 class ErrorResponse(BaseModel):
     """Error response schema"""
     error: Dict[str, str]
@@ -37,5 +42,9 @@ class GeometryInput(BaseModel):
 
 class BatchGeometryRequest(BaseModel):
     geometries: List[GeometryInput]
+    tag_geometry_index: bool = Field(
+        default=False,
+        description="Add the indices of the matching geometries to each building as geometry_indices"
+    )
 
 
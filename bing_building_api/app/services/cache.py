@@ -0,0 +1,154 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import geopandas as gpd
+import shapely
+from loguru import logger
+
+from app.config import settings
+from app.services.storage import building_file_path, legacy_building_file_path
+
+
+def estimate_gdf_bytes(gdf: gpd.GeoDataFrame) -> int:
+    """Approximate memory held by a GeoDataFrame, its geometries and its spatial index."""
+    attributes = int(gdf.drop(columns=gdf.geometry.name).memory_usage(deep=True).sum())
+    geometries = gdf.geometry.values
+    # Coordinates are float64 pairs, plus a fixed overhead per shapely object and index entry
+    return attributes + int(shapely.get_num_coordinates(geometries).sum()) * 16 + len(gdf) * 200
+
+
+class QuadkeyCache:
+    """Process-wide LRU cache of parsed quadkey GeoDataFrames with their spatial index.
+
+    Entries are keyed by quadkey and remember the file they were read from.
+    A file whose modification time or size changed is read again. Least
+    recently used quadkeys are dropped when the cache exceeds ``max_bytes``.
+
+    A miss does not make the caller wait for the whole file: get returns None,
+    so the caller reads only the features it needs by bbox, and the quadkey is
+    loaded into the cache by a background thread. Concurrent misses share one
+    load. Quadkeys found to be larger than the budget once loaded are
+    remembered and not loaded again until their file changes.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes (int): Memory budget in bytes
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._oversized: Dict[str, Tuple[str, float, int]] = {}
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # Full loads run one at a time, so a burst of misses does not read many files at once
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quadkey-cache")
+
+    @staticmethod
+    def _source(quad_key: str) -> Optional[Tuple[str, float, int]]:
+        for path in (building_file_path(quad_key), legacy_building_file_path(quad_key)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return path, stat.st_mtime, stat.st_size
+        return None
+
+    def get(self, quad_key: str) -> Optional[gpd.GeoDataFrame]:
+        """Return the buildings of a quadkey with a built spatial index.
+
+        Returns None if the quadkey has not been downloaded, is too large to
+        cache or is not cached yet. In the last case it is loaded in the background.
+        """
+        source = self._source(quad_key)
+        if source is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(quad_key)
+            if entry is not None and entry["source"] == source:
+                self._entries.move_to_end(quad_key)
+                self.hits += 1
+                return entry["gdf"]
+            self.misses += 1
+            # The file changed since it was cached
+            self._forget(quad_key)
+            if self._oversized.get(quad_key) == source:
+                return None
+            # Parsed buildings take more memory than their file, so a file over the budget never fits
+            if source[2] > self.max_bytes:
+                self._oversized[quad_key] = source
+                return None
+            if quad_key not in self._loading:
+                self._loading[quad_key] = self._executor.submit(self._load, quad_key, source)
+        return None
+
+    def _load(self, quad_key: str, source: Tuple[str, float, int]):
+        try:
+            gdf = gpd.read_file(source[0])
+            gdf.sindex  # Build the spatial index once, while loading
+            nbytes = estimate_gdf_bytes(gdf)
+            with self._lock:
+                self._forget(quad_key)
+                if nbytes > self.max_bytes:
+                    self._oversized[quad_key] = source
+                    logger.info(f"Quadkey {quad_key} ({nbytes / 1024**2:.0f} MiB) is larger than the cache")
+                    return
+                self._entries[quad_key] = {"gdf": gdf, "source": source, "nbytes": nbytes}
+                self._total_bytes += nbytes
+                self._evict()
+            logger.info(f"Cached quadkey {quad_key} ({len(gdf)} buildings, {nbytes / 1024**2:.0f} MiB)")
+        except Exception as e:
+            logger.error(f"Error caching quadkey {quad_key}: {e}")
+        finally:
+            with self._lock:
+                self._loading.pop(quad_key, None)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until the background loads started so far have finished."""
+        with self._lock:
+            pending = list(self._loading.values())
+        futures.wait(pending, timeout=timeout)
+
+    def _forget(self, quad_key: str):
+        entry = self._entries.pop(quad_key, None)
+        if entry is not None:
+            self._total_bytes -= entry["nbytes"]
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            quad_key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry["nbytes"]
+            self.evictions += 1
+            logger.info(f"Evicted quadkey {quad_key} from the cache")
+
+    def clear(self):
+        """Drop every cached quadkey."""
+        with self._lock:
+            self._entries.clear()
+            self._oversized.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "loading": len(self._loading),
+                "oversized": len(self._oversized),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+quadkey_cache = QuadkeyCache(settings.QUADKEY_CACHE_MAX_BYTES)
@@ -1,34 +1,24 @@
 import os
-import json
-import pandas as pd
-import geopandas as gpd
+import zlib
 from shapely.geometry import shape
 import mercantile
-from tqdm import tqdm
-import yaml
 from loguru import logger
 from app.config import settings
+from app.services.manifest import dataset_manifest
+from app.services.storage import building_file_path, migrate_legacy_file, write_buildings_from_geojsonseq
 import aiohttp
 import asyncio
 from typing import List, Dict
 
+# Bytes read from a download at a time
+CHUNK_SIZE = 1024 * 1024
+
 class BingBuildingDownloader:
     def __init__(self):
         self.settings = settings
-        self._df = None
         self.force_download = False
         self.semaphore = asyncio.Semaphore(2)  # limit to 2 concurrent downloads
         self._ensure_directories()
-        self._df = None
-        
-    @property
-    def df(self):
-        if self._df is None:
-            self._df = pd.read_csv(
-                "https://minedbuildings.z5.web.core.windows.net/global-buildings/dataset-links.csv", 
-                dtype=str
-            )
-        return self._df
 
     def _ensure_directories(self):
         """Ensure required directories exist."""
@@ -39,34 +29,103 @@ class BingBuildingDownloader:
             logger.error(f"Error creating directories: {e}")
             raise
         
-    async def _download_each_quad(self, quad_key: str) -> str:
+    async def _stream_url(self, session, url: str, out, write_lock: asyncio.Lock) -> int:
+        """Append the features of one manifest file to the open GeoJSONSeq file ``out``.
+
+        The gzipped response is decompressed chunk by chunk and split into
+        lines, each of them a GeoJSON feature. Lines are written in batches of
+        DOWNLOAD_BATCH_SIZE, so memory does not grow with the file size.
+
+        Returns:
+            int: Number of features written
+        """
+        decompressor = None
+        pending = b""
+        batch = []
+        count = 0
+
+        async def flush():
+            nonlocal batch, count
+            if batch:
+                # Batches of concurrent downloads share the file, whole batches are written at a time
+                async with write_lock:
+                    await asyncio.to_thread(out.writelines, batch)
+                count += len(batch)
+                batch = []
+
+        async with self.semaphore:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    if decompressor is None:
+                        # Files are gzipped unless the server already decoded them
+                        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if chunk[:2] == b"\x1f\x8b" else False
+                    if decompressor:
+                        data = decompressor.decompress(chunk)
+                        # Files of several gzip members are decompressed member by member
+                        while decompressor.eof and decompressor.unused_data:
+                            rest = decompressor.unused_data
+                            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                            data += decompressor.decompress(rest)
+                    else:
+                        data = chunk
+                    lines = (pending + data).split(b"\n")
+                    pending = lines.pop()
+                    batch.extend(line + b"\n" for line in lines if line.strip())
+                    if len(batch) >= self.settings.DOWNLOAD_BATCH_SIZE:
+                        await flush()
+        if decompressor:
+            pending += decompressor.flush()
+        if pending.strip():
+            batch.append(pending + b"\n")
+        await flush()
+        return count
+
+    async def _download_each_quad(self, session, quad_key: str) -> str:
         quad_key_str = mercantile.quadkey(quad_key)
+        building_file = building_file_path(quad_key_str)
         
-        rows = self.df[self.df["QuadKey"] == quad_key_str]
-        if rows.shape[0] != 1:
+        if not self.force_download:
+            if os.path.exists(building_file):
+                logger.info(f"Using cached file for {quad_key}: {building_file}")
+                return building_file
+            if await asyncio.to_thread(migrate_legacy_file, quad_key_str):
+                return building_file
+
+        # Quadkeys on a border are split across the files of several countries
+        links = await asyncio.to_thread(dataset_manifest.lookup, quad_key_str)
+        if not links:
             raise ValueError(f"No data found for quad_key: {quad_key_str}")
-            
-        url = rows.iloc[0]["Url"]
-        building_json_file_path = os.path.join(self.settings.data_dir, self.settings.cache_dir, f"{quad_key_str}_processed.json")
-        
-        if not self.force_download and os.path.exists(building_json_file_path):
-            logger.info(f"Using cached file for {quad_key}: {building_json_file_path}")
-            return building_json_file_path
-            
-        async with self.semaphore:
-            try:
-                # read data from url
-                df2 = pd.read_json(url, lines=True)
-                df2["geometry"] = df2["geometry"].apply(shape)
-                gdf = gpd.GeoDataFrame(df2, crs=self.settings.BING_BUILDING_CRS)
-                gdf.to_file(building_json_file_path, driver="GeoJSON")
-                
-                logger.info(f"Successfully downloaded {quad_key}")
-                return building_json_file_path
-                
-            except Exception as e:
-                logger.error(f"Error downloading {quad_key}: {e}")
-                raise
+
+        features_file = f"{os.path.splitext(building_file)[0]}.tmp.geojsons"
+        try:
+            write_lock = asyncio.Lock()
+            with open(features_file, "wb") as out:
+                tasks = [
+                    asyncio.ensure_future(self._stream_url(session, link["url"], out, write_lock))
+                    for link in links
+                ]
+                try:
+                    counts = await asyncio.gather(*tasks)
+                except BaseException:
+                    # Stop the other downloads before the file is closed
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+            if not sum(counts):
+                raise ValueError(f"No buildings found for quad_key: {quad_key_str}")
+            await asyncio.to_thread(write_buildings_from_geojsonseq, features_file, building_file)
+
+            logger.info(f"Successfully downloaded {quad_key}: {sum(counts)} buildings from {len(links)} file(s)")
+            return building_file
+
+        except Exception as e:
+            logger.error(f"Error downloading {quad_key}: {e}")
+            raise
+        finally:
+            if os.path.exists(features_file):
+                os.remove(features_file)
 
     async def download_buildings(self, geometries: List[Dict]) -> List[Dict]:
         all_quad_keys = set()
@@ -83,10 +142,13 @@ class BingBuildingDownloader:
                 logger.error(f"Error processing geometry: {e}")
 
         logger.info(f"Preparing to download {len(all_quad_keys)} quad keys")
+        # The index is only downloaded on first use or when it is due for a refresh
+        await dataset_manifest.ensure_fresh()
         
         # download 
-        tasks = [self._download_each_quad(quad_key) for quad_key in all_quad_keys]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        async with aiohttp.ClientSession() as session:
+            tasks = [self._download_each_quad(session, quad_key) for quad_key in all_quad_keys]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
         
         downloaded = []
         for quad_key, result in zip(all_quad_keys, results):
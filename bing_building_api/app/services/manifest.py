@@ -0,0 +1,227 @@
+import asyncio
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+from app.config import settings
+
+# Wait before contacting the server again after a failed refresh
+RETRY_SECONDS = 300
+
+
+class DatasetManifest:
+    """Local SQLite index of dataset-links.csv, keyed by QuadKey.
+
+    The manifest lists the download URLs of every Bing building file. It is
+    downloaded once, stored in SQLite with an index on QuadKey and shared by
+    all requests, so lookups need no network. SQLite calls block, coroutines
+    run them in a thread. The server is asked for a new
+    version every ``refresh_seconds`` with If-None-Match/If-Modified-Since, so
+    an unchanged manifest is not downloaded again. When a refresh fails the
+    existing index keeps being used.
+    """
+
+    def __init__(self, path: str, url: str, refresh_seconds: int):
+        """
+        Args:
+            path (str): Path of the SQLite database, created on first use
+            url (str): URL of dataset-links.csv
+            refresh_seconds (int): Seconds between checks for a new version
+        """
+        self.path = path
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._refresh_lock = asyncio.Lock()
+        self._retry_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS links (
+                quad_key TEXT NOT NULL,
+                location TEXT,
+                url TEXT NOT NULL,
+                size TEXT,
+                upload_date TEXT
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS links_quad_key ON links (quad_key)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _connection(self):
+        with self._schema_lock:
+            if not self._schema_ready:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                    self._create_schema(conn)
+                    conn.commit()
+                self._schema_ready = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _meta(self) -> Dict[str, str]:
+        with self._connection() as conn:
+            return {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM meta")}
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, **values):
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items() if value is not None],
+        )
+
+    def count(self) -> int:
+        """Number of files listed in the local index."""
+        return int(self._meta().get("links", 0))
+
+    def lookup(self, quad_key: str) -> List[Dict[str, Any]]:
+        """Files of a quadkey, read from the local index without network access.
+
+        Returns:
+            list: Dicts with location, quad_key, url, size and upload_date, empty if the quadkey is not listed
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT quad_key, location, url, size, upload_date FROM links WHERE quad_key = ? ORDER BY rowid",
+                (quad_key,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def is_stale(self) -> bool:
+        """Whether the manifest should be checked for a new version."""
+        if time.time() < self._retry_at:
+            return False
+        meta = self._meta()
+        if not int(meta.get("links", 0)):
+            return True
+        return time.time() - float(meta.get("checked_at", 0)) >= self.refresh_seconds
+
+    def _replace_links(self, text: str, etag: Optional[str], last_modified: Optional[str]) -> int:
+        rows = [
+            (row["QuadKey"], row.get("Location"), row["Url"], row.get("Size"), row.get("UploadDate"))
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+        # Readers see either the old or the new manifest, the swap is a single transaction
+        with self._connection() as conn:
+            conn.execute("DELETE FROM links")
+            conn.executemany(
+                "INSERT INTO links (quad_key, location, url, size, upload_date) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("DELETE FROM meta")
+            self._set_meta(conn, links=len(rows), etag=etag, last_modified=last_modified, checked_at=time.time())
+        return len(rows)
+
+    def _mark_checked(self):
+        with self._connection() as conn:
+            self._set_meta(conn, checked_at=time.time())
+
+    async def refresh(self) -> bool:
+        """Download the manifest if the server has a newer version than the local index.
+
+        Returns:
+            bool: True if the index was replaced, False if it was up to date
+        """
+        meta = await asyncio.to_thread(self._meta)
+        if not int(meta.get("links", 0)):
+            meta = {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(self.url, headers=headers) as response:
+                if response.status == 304:
+                    await asyncio.to_thread(self._mark_checked)
+                    logger.info("Dataset links are up to date")
+                    return False
+                response.raise_for_status()
+                text = await response.text()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+        count = await asyncio.to_thread(self._replace_links, text, etag, last_modified)
+        logger.info(f"Indexed {count} dataset links from {self.url}")
+        return True
+
+    async def ensure_fresh(self):
+        """Refresh the index if it is empty or older than ``refresh_seconds``.
+
+        Raises:
+            Exception: If the manifest cannot be downloaded and there is no local index yet.
+        """
+        if not await asyncio.to_thread(self.is_stale):
+            return
+        async with self._refresh_lock:
+            # Another request may have refreshed the index while this one waited
+            if not await asyncio.to_thread(self.is_stale):
+                return
+            try:
+                await self.refresh()
+            except Exception as e:
+                if await asyncio.to_thread(self.count) == 0:
+                    raise
+                self._retry_at = time.time() + RETRY_SECONDS
+                logger.warning(f"Could not refresh dataset links, using the local index: {e}")
+
+    async def _refresh_periodically(self):
+        while True:
+            try:
+                await self.ensure_fresh()
+            except Exception as e:
+                logger.error(f"Error refreshing dataset links: {e}")
+            await asyncio.sleep(min(self.refresh_seconds, RETRY_SECONDS))
+
+    def start(self):
+        """Refresh the index in the background of the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_periodically())
+
+    async def stop(self):
+        """Stop the background refresh."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the size and version of the local index."""
+        meta = self._meta()
+        return {
+            "links": int(meta.get("links", 0)),
+            "etag": meta.get("etag"),
+            "last_modified": meta.get("last_modified"),
+            "checked_at": float(meta["checked_at"]) if "checked_at" in meta else None,
+        }
+
+
+dataset_manifest = DatasetManifest(
+    os.path.join(settings.data_dir, "dataset-links.sqlite3"),
+    settings.DATASET_LINKS_URL,
+    settings.DATASET_LINKS_REFRESH_SECONDS,
+)
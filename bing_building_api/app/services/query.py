@@ -1,31 +1,61 @@
 import geopandas as gpd
-import json
+import numpy as np
+import pandas as pd
 import os
 import mercantile
 from tqdm import tqdm
-import tempfile
 from shapely import geometry
 from loguru import logger
 from app.config import settings
+from app.services.cache import quadkey_cache
+from app.services.storage import building_file_path, legacy_building_file_path
 
 class BingBuildingQuery:
     def __init__(self):
         self.settings = settings
-        self.building_json_location = os.path.join(self.settings.data_dir, self.settings.cache_dir)
 
-    def _find_intersecting_buildings(self, aoi_shape, quad_keys):
-        intersecting_features = []  # 统一变量名
-        with tempfile.TemporaryDirectory() as tmpdir:
-            for quad_key in tqdm(quad_keys):
-                file_path = os.path.join(self.building_json_location, f'{quad_key}_processed.json')
-                if os.path.exists(file_path):
-                    gdf = gpd.read_file(file_path)                              
-                    if not gdf.empty:
-                        intersecting = gdf[gdf.intersects(aoi_shape)]
-                        if not intersecting.empty:
-                            for idx, feature in intersecting.iterrows():
-                                intersecting_features.append(feature)  # 使用正确的变量名
-        return intersecting_features  # 返回正确的变量名
+    def _read_candidates(self, quad_key, bounds):
+        """Buildings of a quadkey whose bounding boxes intersect ``bounds``.
+
+        FlatGeobuf files are read through their spatial index, so only candidate
+        features are loaded. Files from earlier downloader versions are read whole.
+        """
+        file_path = building_file_path(quad_key)
+        if os.path.exists(file_path):
+            return gpd.read_file(file_path, bbox=bounds)
+        legacy_path = legacy_building_file_path(quad_key)
+        if os.path.exists(legacy_path):
+            logger.warning(f"Reading {legacy_path} without a spatial index, download the quadkey again to convert it")
+            return gpd.read_file(legacy_path)
+        return None
+
+    def _query_quad_key(self, quad_key, aois, tag_geometry_index=False):
+        """Buildings of one quadkey intersecting any of ``aois``, each returned once.
+
+        Args:
+            quad_key (str): Quadkey to load
+            aois (GeoDataFrame): The AOIs overlapping the quadkey, indexed by geometry_index
+            tag_geometry_index (bool): Add the indices of the matching AOIs as geometry_indices
+
+        Returns:
+            GeoDataFrame: Matching buildings, or None if the quadkey has not been downloaded
+        """
+        buildings = quadkey_cache.get(quad_key)
+        if buildings is None:
+            # Quadkeys that are not cached are read by the bbox of their AOIs
+            buildings = self._read_candidates(quad_key, tuple(aois.total_bounds))
+            if buildings is None or buildings.empty:
+                return None
+
+        # The join queries the spatial index of the buildings with every AOI
+        joined = gpd.sjoin(aois, buildings, how="inner", predicate="intersects")
+        if joined.empty:
+            return None
+        matched = buildings.loc[np.unique(joined["index_right"].to_numpy())]
+        if tag_geometry_index:
+            indices = joined.reset_index().groupby("index_right")["geometry_index"].agg(sorted)
+            matched = matched.assign(geometry_indices=indices.loc[matched.index].tolist())
+        return matched
     
     def _get_quad_keys(self, minx, miny, maxx, maxy):
         quad_keys = set()
@@ -33,34 +63,51 @@ class BingBuildingQuery:
             quad_keys.add(mercantile.quadkey(tile))
         return quad_keys
     
-    def query_buildings(self, geometries):
-        all_buildings = [] 
-        
-        for geom in geometries:
-            # Convert GeometryInput to dict
-            geom_dict = {
-                "type": geom.type,
-                "coordinates": geom.coordinates
-            }
-            aoi_shape = geometry.shape(geom_dict)
-            minx, miny, maxx, maxy = aoi_shape.bounds
-            quad_keys = self._get_quad_keys(minx, miny, maxx, maxy)
-            logger.info('quad_keys', quad_keys)
+    def query_buildings(self, geometries, tag_geometry_index=False):
+        """Find the buildings intersecting any of the geometries.
+
+        The quadkeys of all geometries are planned together, so every quadkey
+        is loaded once and joined against all geometries that overlap it.
+        Buildings matched by several geometries are returned once.
+
+        Args:
+            geometries (list): GeometryInput AOIs
+            tag_geometry_index (bool): Add the indices of the matching geometries
+                to each building as the geometry_indices property
 
-            # Remove duplicate aoi_shape parameter
-            intersecting_buildings = self._find_intersecting_buildings(aoi_shape, quad_keys)
+        Returns:
+            dict: GeoJSON FeatureCollection, ready to be serialized once by the response
+        """
+        aois = gpd.GeoDataFrame(
+            geometry=[geometry.shape({"type": geom.type, "coordinates": geom.coordinates}) for geom in geometries],
+            crs=self.settings.BING_BUILDING_CRS,
+        )
+        aois.index.name = "geometry_index"
 
-            logger.info('intersecting_buildings', intersecting_buildings)
-            all_buildings.extend(intersecting_buildings)
+        # Plan which geometries overlap each quadkey
+        plan = {}
+        for index, aoi_shape in enumerate(aois.geometry):
+            for quad_key in self._get_quad_keys(*aoi_shape.bounds):
+                plan.setdefault(quad_key, []).append(index)
+        logger.info(f"Querying {len(plan)} quad keys for {len(aois)} geometries")
+
+        all_buildings = []
+        for quad_key, indices in tqdm(plan.items()):
+            matched = self._query_quad_key(quad_key, aois.iloc[indices], tag_geometry_index)
+            if matched is not None:
+                all_buildings.append(matched)
 
         # Create GeoDataFrame from all intersecting features
         if all_buildings:
-            gdf = gpd.GeoDataFrame(all_buildings)
-            return gdf.to_json()
+            gdf = pd.concat(all_buildings)
+            # Build the GeoJSON mapping directly instead of to_json() followed by json.loads()
+            return {
+                "type": "FeatureCollection",
+                "features": list(gdf.iterfeatures(na="null")),
+            }
         
         # Return empty FeatureCollection if no buildings found
-        return json.dumps({
+        return {
             "type": "FeatureCollection",
             "features": []
-        })
-    
\ No newline at end of file
+        }
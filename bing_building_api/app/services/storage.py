@@ -0,0 +1,68 @@
+import os
+
+import geopandas as gpd
+from loguru import logger
+from pyogrio.raw import open_arrow, write_arrow
+
+from app.config import settings
+
+
+def building_file_path(quad_key: str) -> str:
+    """FlatGeobuf file holding the buildings of a quadkey."""
+    return os.path.join(settings.data_dir, settings.cache_dir, f"{quad_key}.fgb")
+
+
+def legacy_building_file_path(quad_key: str) -> str:
+    """GeoJSON file written by earlier versions of the downloader."""
+    return os.path.join(settings.data_dir, settings.cache_dir, f"{quad_key}_processed.json")
+
+
+def write_buildings(gdf: gpd.GeoDataFrame, path: str):
+    """Write buildings as FlatGeobuf with a packed R-tree, so readers can fetch them by bbox.
+
+    The file is written next to its final path and moved into place, so
+    concurrent readers never see a partial file.
+    """
+    tmp_path = _tmp_path(path)
+    gdf.to_file(tmp_path, driver="FlatGeobuf", SPATIAL_INDEX="YES")
+    os.replace(tmp_path, path)
+
+
+def write_buildings_from_geojsonseq(source: str, path: str, batch_size: int = 65536):
+    """Convert a GeoJSONSeq file to FlatGeobuf without loading it into memory.
+
+    GDAL reads the features in Arrow batches of ``batch_size`` and writes them
+    straight to the FlatGeobuf file, which is moved into place when complete.
+    """
+    tmp_path = _tmp_path(path)
+    with open_arrow(source, use_pyarrow=False, batch_size=batch_size) as (meta, reader):
+        write_arrow(
+            reader,
+            tmp_path,
+            driver="FlatGeobuf",
+            geometry_name=meta["geometry_name"] or "wkb_geometry",
+            geometry_type=meta["geometry_type"],
+            crs=meta["crs"],
+            layer_options={"SPATIAL_INDEX": "YES"},
+        )
+    os.replace(tmp_path, path)
+
+
+def _tmp_path(path: str) -> str:
+    # The FlatGeobuf driver writes a directory unless the path ends in .fgb
+    return f"{os.path.splitext(path)[0]}.tmp.fgb"
+
+
+def migrate_legacy_file(quad_key: str) -> bool:
+    """Convert the GeoJSON file of a quadkey to FlatGeobuf if there is one.
+
+    Returns:
+        bool: Whether a FlatGeobuf file was written
+    """
+    legacy_path = legacy_building_file_path(quad_key)
+    if not os.path.exists(legacy_path):
+        return False
+    logger.info(f"Converting {legacy_path} to FlatGeobuf")
+    write_buildings(gpd.read_file(legacy_path), building_file_path(quad_key))
+    os.remove(legacy_path)
+    return True
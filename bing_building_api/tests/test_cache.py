@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.config import settings
+from app.services.cache import QuadkeyCache, estimate_gdf_bytes
+from app.services.query import BingBuildingQuery
+from app.services.storage import building_file_path, write_buildings
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    os.makedirs(os.path.join(str(tmp_path), settings.cache_dir))
+    return tmp_path
+
+
+def buildings(count, offset=0.0):
+    return gpd.GeoDataFrame(
+        {"height": [float(i) for i in range(count)]},
+        geometry=[box(offset + i * 0.01, 0, offset + i * 0.01 + 0.005, 0.005) for i in range(count)],
+        crs=4326,
+    )
+
+
+def test_miss_returns_none_and_loads_in_the_background(data_dir):
+    write_buildings(buildings(10), building_file_path("0"))
+    cache = QuadkeyCache(max_bytes=1024**2)
+
+    assert cache.get("0") is None
+    cache.wait(5)
+    gdf = cache.get("0")
+    assert len(gdf) == 10
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_concurrent_misses_load_the_quadkey_once(data_dir):
+    write_buildings(buildings(10), building_file_path("0"))
+    cache = QuadkeyCache(max_bytes=1024**2)
+    release = threading.Event()
+    reads = []
+    read_file = gpd.read_file
+
+    def slow_read_file(path, **kwargs):
+        reads.append(path)
+        release.wait(5)
+        return read_file(path, **kwargs)
+
+    with patch("app.services.cache.gpd.read_file", slow_read_file):
+        assert [cache.get("0") for _ in range(5)] == [None] * 5
+        assert cache.stats()["loading"] == 1
+        release.set()
+        cache.wait(5)
+    assert len(reads) == 1
+    assert cache.get("0") is not None
+
+
+def test_quadkeys_larger_than_the_budget_are_not_loaded_again(data_dir):
+    gdf = buildings(50)
+    write_buildings(gdf, building_file_path("0"))
+    size = os.path.getsize(building_file_path("0"))
+    # The file fits the budget, its parsed buildings do not
+    cache = QuadkeyCache(max_bytes=(size + estimate_gdf_bytes(gdf)) // 2)
+    assert size < cache.max_bytes < estimate_gdf_bytes(gdf)
+
+    with patch("app.services.cache.gpd.read_file", wraps=gpd.read_file) as read_file:
+        assert cache.get("0") is None
+        cache.wait(5)
+        assert cache.get("0") is None
+        cache.wait(5)
+    assert read_file.call_count == 1
+    assert cache.stats()["oversized"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_changed_file_is_loaded_again(data_dir):
+    path = building_file_path("0")
+    write_buildings(buildings(10), path)
+    cache = QuadkeyCache(max_bytes=1024**2)
+    cache.get("0")
+    cache.wait(5)
+
+    write_buildings(buildings(20), path)
+    os.utime(path, (0, 0))
+    assert cache.get("0") is None
+    cache.wait(5)
+    assert len(cache.get("0")) == 20
+
+
+def test_least_recently_used_quadkey_is_evicted(data_dir):
+    for quad_key in ("0", "1", "2"):
+        write_buildings(buildings(10), building_file_path(quad_key))
+    cache = QuadkeyCache(max_bytes=int(estimate_gdf_bytes(buildings(10)) * 2.5))
+
+    for quad_key in ("0", "1", "2"):
+        cache.get(quad_key)
+        cache.wait(5)
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("1") is not None and cache.get("2") is not None
+    # A miss loads the quadkey again, so it is checked last
+    assert cache.get("0") is None
+
+
+def test_query_reads_by_bbox_on_a_miss(data_dir):
+    write_buildings(buildings(10), building_file_path("0"))
+    query = BingBuildingQuery()
+    aois = gpd.GeoDataFrame(geometry=[box(0, 0, 0.012, 0.004)], crs=4326)
+    aois.index.name = "geometry_index"
+
+    with patch("app.services.query.quadkey_cache", QuadkeyCache(max_bytes=1024**2)) as cache:
+        first = query._query_quad_key("0", aois)
+        cache.wait(5)
+        second = query._query_quad_key("0", aois)
+    assert sorted(first["height"]) == sorted(second["height"]) == [0.0, 1.0]
+    assert cache.stats()["hits"] == 1
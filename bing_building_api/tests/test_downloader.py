@@ -0,0 +1,147 @@
+import asyncio
+import gzip
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import aiohttp
+import geopandas as gpd
+import mercantile
+import pytest
+from aiohttp import web
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.config import settings
+from app.services.downloader import BingBuildingDownloader
+from app.services.manifest import DatasetManifest
+from app.services.storage import building_file_path
+
+TILE = mercantile.tile(0.5, 0.5, settings.ZOOM_LEVEL)
+QUAD_KEY = mercantile.quadkey(TILE)
+
+
+def features(count, height):
+    west, south, _, _ = mercantile.bounds(TILE)
+    lines = []
+    for i in range(count):
+        x, y = west + 0.01 + i * 1e-5, south + 0.01
+        lines.append(json.dumps({
+            "type": "Feature",
+            "properties": {"height": height, "confidence": -1},
+            "geometry": {"type": "Polygon", "coordinates": [[[x, y], [x + 5e-6, y], [x + 5e-6, y + 5e-6], [x, y]]]},
+        }))
+    return "\n".join(lines) + "\n"
+
+
+@asynccontextmanager
+async def file_server(routes):
+    """Serve each path of ``routes`` with its handler on a free local port."""
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+def manifest_for(tmp_path, base_url, paths):
+    manifest = DatasetManifest(str(tmp_path / "links.sqlite3"), f"{base_url}/dataset-links.csv", refresh_seconds=3600)
+    rows = "".join(f"Country{i},{QUAD_KEY},{base_url}{path},1MB,2023-04-25\n" for i, path in enumerate(paths))
+    manifest._replace_links("Location,QuadKey,Url,Size,UploadDate\n" + rows, None, None)
+    return manifest
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path / "data"))
+    # Small batches so that every file is written in several of them
+    monkeypatch.setattr(settings, "DOWNLOAD_BATCH_SIZE", 100)
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_streams_every_file_of_a_quadkey_into_one_flatgeobuf(data_dir):
+    first = gzip.compress(features(700, 1.0).encode())
+    # A file of several gzip members, as written by concatenating gzipped parts
+    parts = features(1500, 2.0)
+    second = gzip.compress(parts[:len(parts) // 2].encode()) + gzip.compress(parts[len(parts) // 2:].encode())
+
+    async def serve(body):
+        async def handler(request):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for start in range(0, len(body), 4096):
+                await response.write(body[start:start + 4096])
+            await response.write_eof()
+            return response
+        return handler
+
+    routes = {"/first.geojsonl.gz": await serve(first), "/second.geojsonl.gz": await serve(second)}
+    async with file_server(routes) as base_url:
+        manifest = manifest_for(data_dir, base_url, routes)
+        with patch("app.services.downloader.dataset_manifest", manifest):
+            west, south, _, _ = mercantile.bounds(TILE)
+            point = {"type": "Point", "coordinates": [west + 0.001, south + 0.001]}
+            downloaded = await BingBuildingDownloader().download_buildings([point])
+
+    assert [item["file"] for item in downloaded] == [building_file_path(QUAD_KEY)]
+    gdf = gpd.read_file(building_file_path(QUAD_KEY))
+    assert (gdf["height"] == 1.0).sum() == 700
+    assert (gdf["height"] == 2.0).sum() == 1500
+    assert sorted(os.listdir(os.path.dirname(building_file_path(QUAD_KEY)))) == [f"{QUAD_KEY}.fgb"]
+
+
+@pytest.mark.asyncio
+async def test_failed_file_cancels_the_other_downloads(data_dir):
+    started = asyncio.Event()
+    finished = asyncio.Event()
+
+    async def slow(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(gzip.compress(features(10, 1.0).encode()))
+        started.set()
+        # Only the end of the test completes the response
+        await finished.wait()
+        return response
+
+    async def failing(request):
+        await started.wait()
+        return web.Response(status=500)
+
+    routes = {"/slow.geojsonl.gz": slow, "/failing.geojsonl.gz": failing}
+    async with file_server(routes) as base_url:
+        manifest = manifest_for(data_dir, base_url, routes)
+        downloader = BingBuildingDownloader()
+        cancelled = []
+        stream_url = downloader._stream_url
+
+        async def record_cancellation(session, url, out, write_lock):
+            try:
+                return await stream_url(session, url, out, write_lock)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+
+        downloader._stream_url = record_cancellation
+        with patch("app.services.downloader.dataset_manifest", manifest):
+            async with aiohttp.ClientSession() as session:
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await downloader._download_each_quad(session, TILE)
+        finished.set()
+
+    assert cancelled == [f"{base_url}/slow.geojsonl.gz"]
+
+    # Neither the partial features nor a FlatGeobuf file are left behind
+    assert os.listdir(os.path.dirname(building_file_path(QUAD_KEY))) == []
@@ -0,0 +1,76 @@
+import os
+import sys
+
+from contextlib import asynccontextmanager
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.services.manifest import DatasetManifest
+
+LINKS_CSV = (
+    "Location,QuadKey,Url,Size,UploadDate\n"
+    "Mexico,023112,http://example.com/mexico.csv.gz,1.2MB,2023-04-25\n"
+    "UnitedStates,023112,http://example.com/us.csv.gz,3.4MB,2023-04-25\n"
+    "UnitedStates,023113,http://example.com/us2.csv.gz,2.1MB,2023-04-25\n"
+)
+
+
+@asynccontextmanager
+async def links_server():
+    """Serve LINKS_CSV with an ETag, answering conditional requests for it with 304."""
+    requests = []
+
+    async def handler(request):
+        requests.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text=LINKS_CSV, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/dataset-links.csv", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/dataset-links.csv", requests
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_refresh_indexes_links_and_skips_unchanged_versions(tmp_path):
+    async with links_server() as (url, requests):
+        manifest = DatasetManifest(str(tmp_path / "links.sqlite3"), url, refresh_seconds=0)
+
+        await manifest.ensure_fresh()
+        assert [link["location"] for link in manifest.lookup("023112")] == ["Mexico", "UnitedStates"]
+        assert manifest.lookup("000000") == []
+
+        assert await manifest.refresh() is False
+        assert requests[-1]["If-None-Match"] == '"v1"'
+    assert manifest.stats()["links"] == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_the_local_index(tmp_path):
+    async with links_server() as (url, _):
+        manifest = DatasetManifest(str(tmp_path / "links.sqlite3"), url, refresh_seconds=0)
+        await manifest.ensure_fresh()
+
+        manifest.url = url.replace("dataset-links.csv", "missing.csv")
+        await manifest.ensure_fresh()
+        assert len(manifest.lookup("023112")) == 2
+        # The server is not asked again before the retry delay
+        assert not manifest.is_stale()
+
+        empty = DatasetManifest(str(tmp_path / "empty.sqlite3"), manifest.url, refresh_seconds=0)
+        with pytest.raises(aiohttp.ClientResponseError):
+            await empty.ensure_fresh()
@@ -0,0 +1,98 @@
+import os
+import sys
+from unittest.mock import patch
+
+import geopandas as gpd
+import mercantile
+import pytest
+from shapely.geometry import box
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.config import settings
+from app.schemas import GeometryInput
+from app.services.cache import QuadkeyCache
+from app.services.query import BingBuildingQuery
+from app.services.storage import building_file_path, legacy_building_file_path, write_buildings
+
+TILE = mercantile.tile(0.5, 0.5, settings.ZOOM_LEVEL)
+QUAD_KEY = mercantile.quadkey(TILE)
+WEST, SOUTH, _, _ = mercantile.bounds(TILE)
+
+
+def building(column, row):
+    """Footprint of 0.001 degrees in a grid of 0.002 degrees from the corner of the tile."""
+    x, y = WEST + 0.01 + column * 0.002, SOUTH + 0.01 + row * 0.002
+    return box(x, y, x + 0.001, y + 0.001)
+
+
+@pytest.fixture
+def buildings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    os.makedirs(os.path.join(str(tmp_path), settings.cache_dir))
+    gdf = gpd.GeoDataFrame(
+        {"building_id": [f"{column}-{row}" for column in range(10) for row in range(10)]},
+        geometry=[building(column, row) for column in range(10) for row in range(10)],
+        crs=4326,
+    )
+    write_buildings(gdf, building_file_path(QUAD_KEY))
+    # Every query starts with a cold cache, so it reads the file by bbox
+    with patch("app.services.query.quadkey_cache", QuadkeyCache(max_bytes=0)):
+        yield gdf
+
+
+def test_flatgeobuf_is_read_by_bbox(buildings):
+    candidates = BingBuildingQuery()._read_candidates(QUAD_KEY, building(2, 3).bounds)
+    # Only the buildings whose extents intersect the bbox are read
+    assert candidates["building_id"].tolist() == ["2-3"]
+
+
+def test_legacy_files_are_read_whole(buildings):
+    os.remove(building_file_path(QUAD_KEY))
+    buildings.to_file(legacy_building_file_path(QUAD_KEY), driver="GeoJSON")
+
+    candidates = BingBuildingQuery()._read_candidates(QUAD_KEY, building(2, 3).bounds)
+    assert len(candidates) == 100
+    assert BingBuildingQuery()._read_candidates("0", building(2, 3).bounds) is None
+
+
+def aoi(first_column, last_column, rows=2):
+    """Polygon over the buildings of columns first_column to last_column in the first rows."""
+    polygon = box(
+        WEST + 0.0095 + first_column * 0.002,
+        SOUTH + 0.0095,
+        WEST + 0.0105 + last_column * 0.002,
+        SOUTH + 0.0105 + (rows - 1) * 0.002,
+    )
+    return GeometryInput(type="Polygon", coordinates=[list(map(list, polygon.exterior.coords))])
+
+
+def test_overlapping_geometries_return_each_building_once(buildings):
+    result = BingBuildingQuery().query_buildings([aoi(0, 3), aoi(2, 5)], tag_geometry_index=True)
+
+    indices = {
+        feature["properties"]["building_id"]: feature["properties"]["geometry_indices"]
+        for feature in result["features"]
+    }
+    assert len(result["features"]) == len(indices) == 12
+    assert indices["0-0"] == indices["1-1"] == [0]
+    assert indices["2-0"] == indices["3-1"] == [0, 1]
+    assert indices["4-0"] == indices["5-1"] == [1]
+
+
+def test_geometry_indices_are_only_added_on_request(buildings):
+    result = BingBuildingQuery().query_buildings([aoi(0, 0)])
+    [feature] = [f for f in result["features"] if f["properties"]["building_id"] == "0-0"]
+    assert "geometry_indices" not in feature["properties"]
+    assert result["type"] == "FeatureCollection"
+
+
+def test_geometries_without_buildings_return_an_empty_feature_collection(buildings):
+    empty = {"type": "FeatureCollection", "features": []}
+    # Between the buildings, in a quadkey that was not downloaded, and no geometries at all
+    between = GeometryInput(type="Point", coordinates=[WEST + 0.0115, SOUTH + 0.0115])
+    elsewhere = GeometryInput(type="Point", coordinates=[-120.5, 40.5])
+    assert BingBuildingQuery().query_buildings([between, elsewhere]) == empty
+    assert BingBuildingQuery().query_buildings([]) == empty
@@ -1,15 +1,57 @@
-from typing import Union
+from typing import Any, AsyncIterator, Dict, Union
 
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Response
+from fastapi.responses import StreamingResponse
 from app.segment_geospatial.predict import textPredictor
 from app.segment_geospatial.point_predict import pointPredictor
+from app.segment_geospatial.cache import tileCache, embeddingCache, resultCache, sessionStore
+from app.segment_geospatial.inference_pool import InferencePoolFull
+from app.segment_geospatial.jobs import JobQueueFull, jobManager
+from app.segment_geospatial.model_loader import ModelLoader
+from app.segment_geospatial.model_registry import modelRegistry
 from loguru import logger
 
 from app import __version__, schemas
+from app.responses import ORJSONResponse, dumps
 from app.config import settings
 
 api_router = APIRouter()
+modelLoader = ModelLoader({"text": textPredictor, "points": pointPredictor})
+
+
+def busy_response(error: Union[InferencePoolFull, JobQueueFull]) -> ORJSONResponse:
+    """Fast rejection for requests that arrive while the inference pool or job queue is full."""
+    return ORJSONResponse(
+        status_code=503,
+        content={"error": {"message": str(error)}},
+        headers={"Retry-After": "5"}
+    )
+
+def prediction_error_response(result: Dict[str, Any], kind: str) -> ORJSONResponse:
+    """400 for a request the predictor rejected, 500 for an error tagged as a server failure."""
+    if result.get("server"):
+        logger.error(f"{kind} prediction failed: {result['error']}")
+        status_code = 500
+    else:
+        logger.warning(f"{kind} prediction validation error: {result['error']}")
+        status_code = 400
+    return ORJSONResponse(
+        status_code=status_code,
+        content={"error": {"message": result["error"]}}
+    )
+
+async def ndjson_lines(first: Any, items: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    """Serialize streamed results as newline-delimited JSON."""
+    try:
+        yield dumps(first) + b"\n"
+        async for item in items:
+            yield dumps(item) + b"\n"
+    except Exception as e:
+        logger.error(f"Error during streamed prediction: {str(e)}")
+        yield dumps({"error": {"message": str(e)}}) + b"\n"
+    finally:
+        # Stop the worker right away when the client disconnects
+        await items.aclose()
 
 @api_router.get("/health", response_model=schemas.Health, status_code=200)
 def health() -> dict:
@@ -21,6 +63,30 @@ def health() -> dict:
     )
     return health.model_dump()
 
+@api_router.get("/ready", response_model=schemas.Readiness, status_code=200)
+def ready():
+    """
+    Readiness check, 503 until the models needed to serve requests are loaded
+    """
+    readiness = schemas.Readiness(ready=modelLoader.ready, models=modelLoader.status())
+    return ORJSONResponse(
+        status_code=200 if readiness.ready else 503,
+        content=readiness.model_dump()
+    )
+
+@api_router.get("/cache/stats", response_model=Dict[str, schemas.CacheStats], status_code=200)
+def cache_stats() -> dict:
+    """
+    Hit/miss counters and usage of the local caches
+    """
+    return {
+        "tiles": tileCache.stats(),
+        "embeddings": embeddingCache.stats(),
+        "results": resultCache.stats(),
+        "models": modelRegistry.stats(),
+        "sessions": sessionStore.stats(),
+    }
+
 @api_router.post("/predict", 
                 response_model=Union[schemas.PredictionResults, schemas.ErrorResponse], 
                 status_code=200,
@@ -34,22 +100,63 @@ async def predict_text(request: schemas.PredictionRequest):
             bounding_box=request.bounding_box,
             text_prompts=request.text_prompts,
             zoom_level=request.zoom_level,
+            windowed=request.windowed,
+            model_type=request.model_type,
+            **request.output_options(),
         )
+        if result.get("error") is not None:
+            return prediction_error_response(result, "Text")
 
         logger.info(f"Prediction finished successfully.")
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content=result.get("json")
         )
 
+    except InferencePoolFull as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error during prediction: {str(e)}")
+        return ORJSONResponse(
+            status_code=500,
+            content={"error": {"message": str(e)}}
+        )
+
+@api_router.post("/predict/text/stream", 
+                response_class=StreamingResponse, 
+                status_code=200)
+async def predict_text_stream(request: schemas.StreamingPredictionRequest):
+    """
+    Stream the result of each prompt as a line of newline-delimited JSON as soon as it is ready
+    """
+    items = textPredictor.stream_predictions(
+        bounding_box=request.bounding_box,
+        text_prompts=request.text_prompts,
+        zoom_level=request.zoom_level,
+        windowed=request.windowed,
+        stream_windows=request.stream_windows,
+        model_type=request.model_type,
+        **request.output_options(),
+    )
+    try:
+        # Wait for the first result so that errors before any output get a proper status
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type="application/x-ndjson")
+    except InferencePoolFull as e:
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Error during prediction: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": {"message": str(e)}}
         )
 
+    if "prompt" not in first:
+        return prediction_error_response(first, "Text")
+    return StreamingResponse(ndjson_lines(first, items), media_type="application/x-ndjson")
+
 @api_router.post("/predict/points", 
                 response_model=Union[schemas.PredictionResults, schemas.ErrorResponse], 
                 status_code=200)
@@ -60,23 +167,187 @@ async def predict_with_points(request: schemas.PointPredictionRequest):
             points_exclude=request.points_exclude,
             zoom_level=request.zoom_level,
             box_threshold=request.box_threshold,
+            model_type=request.model_type,
+            **request.output_options(),
         )
         if result.get("error") is not None:
             logger.warning(f"Point prediction validation error: {result.get('error')}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"error": {"message": result["error"]}}
             )
 
         logger.info(f"Point prediction finished successfully.")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content=result.get("json")
         )
 
+    except InferencePoolFull as e:
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Error during point prediction: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
+            status_code=500,
+            content={"error": {"message": str(e)}}
+        )
+
+
+@api_router.post("/sessions", 
+                response_model=Union[schemas.Session, schemas.ErrorResponse], 
+                status_code=201)
+async def create_session(request: schemas.SessionRequest):
+    """
+    Download and encode the imagery of an area once for interactive point refinement
+    """
+    try:
+        result = await pointPredictor.start_session(
+            bounding_box=request.bounding_box,
+            zoom_level=request.zoom_level,
+            model_type=request.model_type,
+        )
+        if result.get("error") is not None:
+            logger.warning(f"Session validation error: {result.get('error')}")
+            return ORJSONResponse(
+                status_code=400,
+                content={"error": {"message": result["error"]}}
+            )
+        return ORJSONResponse(status_code=201, content=result)
+
+    except InferencePoolFull as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error while creating session: {str(e)}")
+        return ORJSONResponse(
+            status_code=500,
+            content={"error": {"message": str(e)}}
+        )
+
+@api_router.post("/sessions/{session_id}/points", 
+                response_model=Union[schemas.PredictionResults, schemas.ErrorResponse], 
+                status_code=200)
+async def predict_session_points(session_id: str, request: schemas.SessionPointsRequest):
+    """
+    Predict a mask for the current points of a session, running only the mask decoder
+    """
+    try:
+        result = await pointPredictor.refine_session(
+            session_id,
+            points_include=request.points_include,
+            points_exclude=request.points_exclude,
+            **request.output_options(),
+        )
+        if result is None:
+            return ORJSONResponse(
+                status_code=404,
+                content={"error": {"message": f"Session {session_id} not found or expired"}}
+            )
+        if result.get("error") is not None:
+            logger.warning(f"Session point validation error: {result.get('error')}")
+            return ORJSONResponse(
+                status_code=400,
+                content={"error": {"message": result["error"]}}
+            )
+        return ORJSONResponse(
+            status_code=200,
+            content=result.get("json")
+        )
+
+    except Exception as e:
+        logger.error(f"Error during session point prediction: {str(e)}")
+        return ORJSONResponse(
             status_code=500,
             content={"error": {"message": str(e)}}
         )
+
+@api_router.delete("/sessions/{session_id}", status_code=204)
+def delete_session(session_id: str):
+    """
+    Close a session and release its embedding
+    """
+    if not pointPredictor.close_session(session_id):
+        return ORJSONResponse(
+            status_code=404,
+            content={"error": {"message": f"Session {session_id} not found or expired"}}
+        )
+    return Response(status_code=204)
+
+
+def run_text_job(request: dict, report) -> list:
+    """Execute a queued text prediction, reporting tile and prompt progress."""
+    request = schemas.PredictionRequest(**request)
+    report(prompts_total=len(request.text_prompts))
+    results = []
+    for result in textPredictor.iter_predictions(
+        bounding_box=request.bounding_box,
+        text_prompts=request.text_prompts,
+        zoom_level=request.zoom_level,
+        windowed=request.windowed,
+        on_tile=lambda done, total: report(tiles_done=done, tiles_total=total),
+        model_type=request.model_type,
+        **request.output_options(),
+    ):
+        if "prompt" not in result:
+            raise ValueError(result["error"])
+        results.append(result)
+        report(prompts_done=len(results))
+    return results
+
+
+def run_point_job(request: dict, report) -> list:
+    """Execute a queued point prediction, reporting tile progress."""
+    request = schemas.PointPredictionRequest(**request)
+    report(prompts_total=1)
+    result = pointPredictor.run_prediction(
+        points_include=request.points_include,
+        points_exclude=request.points_exclude,
+        zoom_level=request.zoom_level,
+        box_threshold=request.box_threshold,
+        on_tile=lambda done, total: report(tiles_done=done, tiles_total=total),
+        model_type=request.model_type,
+        **request.output_options(),
+    )
+    if result.get("error") is not None:
+        raise ValueError(result["error"])
+    # Download and inference failures are reported per prompt
+    errors = [item["error"] for item in result.get("json", []) if "error" in item]
+    if errors:
+        raise ValueError(errors[0])
+    report(prompts_done=1)
+    return result.get("json")
+
+
+jobManager.register("text", run_text_job)
+jobManager.register("points", run_point_job)
+
+
+@api_router.post("/jobs", 
+                response_model=Union[schemas.JobStatus, schemas.ErrorResponse], 
+                status_code=202)
+def create_job(request: schemas.JobRequest):
+    """
+    Queue a text or point prediction and return its job ID without waiting for the result
+    """
+    try:
+        job = jobManager.submit(request.type, request.model_dump(exclude={"type"}))
+    except JobQueueFull as e:
+        return busy_response(e)
+    job.pop("request")
+    return ORJSONResponse(status_code=202, content=job)
+
+@api_router.get("/jobs/{job_id}", 
+               response_model=Union[schemas.JobStatus, schemas.ErrorResponse], 
+               status_code=200)
+def get_job(job_id: str):
+    """
+    Status, progress and, once finished, results of a job
+    """
+    job = jobManager.get(job_id)
+    if job is None:
+        return ORJSONResponse(
+            status_code=404,
+            content={"error": {"message": f"Job {job_id} not found"}}
+        )
+    job.pop("request")
+    return job
+
@@ -21,10 +21,75 @@ class Settings(BaseSettings):
     # Model Settings
     DEFAULT_TEXT_MODEL_TYPE: str = "sam2-hiera-large"
     DEFAULT_POINT_MODEL_TYPE: str = "vit_h"  # Model type for point prediction. It can be one of vit_h, vit_l, vit_b
+    TEXT_MODEL_TYPES: List[str] = ["sam2-hiera-tiny", "sam2-hiera-small", "sam2-hiera-base-plus", "sam2-hiera-large", "vit_b", "vit_l", "vit_h"]  # Text model types clients may request
+    POINT_MODEL_TYPES: List[str] = ["vit_b", "vit_l", "vit_h"]  # Point model types clients may request
+    MODEL_CACHE_MAX_BYTES: int = 8 * 1024**3  # RAM budget for loaded models, least recently used models are unloaded
     MAX_TILES_LIMIT: int = 2000  # Maximum number of tiles allowed for processing
     MIN_ZOOM_LEVEL: int = 19  # Minimum zoom level allowed
     MAX_ZOOM_LEVEL: int = 22  # Maximum zoom level allowed
     BUFFER_DEGREES_FOR_POINT_PREDICTION: float = 0.001  # Buffer size in degrees
+    MODEL_LOADING: str = "background"  # "eager" loads models before serving, "background" while serving, "lazy" on first use
+    MODEL_WARMUP: bool = False  # Run a small prediction after loading each model
+    SNAP_POINT_BBOX_TO_TILES: bool = True  # Align point prediction boxes to the tile grid so nearby clicks share imagery
+    REUSE_IMAGE_EMBEDDING: bool = True  # Encode the image once per text request and share it across prompts
+
+    # Point Backend Settings
+    POINT_BACKEND: str = "torch"  # Runtime of the point model, either "torch" or "onnx" (ONNX Runtime on CPU)
+    ONNX_MODEL_DIR: str = "models/onnx"  # Directory for exported ONNX models, created on first use of each model type
+    ONNX_QUANTIZE: bool = True  # Use INT8 dynamically quantized weights with the onnx backend
+    ONNX_INTRA_OP_THREADS: int = 0  # Threads used inside each ONNX operator, 0 lets ONNX Runtime choose
+
+    # Debug Settings
+    SAVE_INTERMEDIATE_FILES: bool = False  # Keep imagery, masks and GeoJSON of each request on disk for debugging
+    INTERMEDIATE_FILES_DIR: str = "debug"  # Directory for intermediate files
+
+    # Windowed Inference Settings
+    MAX_TILES_SINGLE_PASS: int = 300  # Larger text requests are split into overlapping chips, up to MAX_TILES_LIMIT
+    WINDOW_CHIP_SIZE: int = 1024  # Edge length in pixels of a chip passed to the model in windowed mode
+    WINDOW_OVERLAP: int = 128  # Context in pixels shared by neighbouring chips
+
+    # Inference Pool Settings
+    INFERENCE_WORKERS: int = 4  # Number of worker threads for downloads and model inference
+    INFERENCE_QUEUE_SIZE: int = 8  # Requests allowed to wait for a worker before new ones get 503
+    STREAM_BUFFER_SIZE: int = 2  # Streamed results held for a slow client before the worker waits for it
+
+    # Job Settings
+    JOB_DB_PATH: str = "jobs/jobs.sqlite3"  # SQLite database holding job requests, progress and results
+    JOB_WORKERS: int = 2  # Jobs executed at the same time, each occupying a slot of the inference pool while it runs
+    JOB_QUEUE_SIZE: int = 100  # Jobs allowed to wait for a worker before new submissions get 503
+
+    # Point Prediction Batching Settings
+    POINT_BATCH_MAX_SIZE: int = 4  # Largest number of point requests encoded in one forward pass
+    POINT_BATCH_WINDOW_MS: float = 20  # How long to wait for more requests after the first one arrives
+    POINT_BATCH_LATENCY_BUDGET_MS: float = 2000  # Batches shrink so that queue wait, window and encoding of a request stay below this
+
+    # Point Session Settings
+    SESSION_IDLE_TIMEOUT_SECONDS: float = 600  # Sessions not used for this long are closed
+    SESSION_MAX_BYTES: int = 256 * 1024**2  # Memory budget for session embeddings, least recently used sessions are closed
+    SESSION_MAX_TILES: int = 64  # Largest area of a session in tiles, larger areas lose detail in the 1024 px embedding
+
+    # Tile Cache Settings
+    TILE_CACHE_ENABLED: bool = True  # Serve repeated XYZ tiles from the local disk cache
+    TILE_CACHE_DIR: str = "cache/tiles"  # Directory for cached tiles
+    TILE_CACHE_MAX_BYTES: int = 2 * 1024**3  # Disk budget for cached tiles, least recently used tiles are evicted
+
+    # Tile Download Settings
+    TILE_FETCH_MAX_CONNECTIONS: int = 64  # Open connections shared by all tile downloads
+    TILE_FETCH_MAX_PER_HOST: int = 16  # Concurrent connections per tile server
+    TILE_FETCH_RETRIES: int = 3  # Retries for a tile after server errors or connection failures
+    TILE_FETCH_BACKOFF_SECONDS: float = 0.5  # Delay before the first retry, doubled for each further retry
+    TILE_FETCH_TIMEOUT_SECONDS: float = 30  # Timeout of a single tile request
+
+    # Embedding Cache Settings
+    EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024**2  # Memory budget for cached SAM image embeddings
+    EMBEDDING_CACHE_TTL_SECONDS: float = 900  # Drop embeddings that were not used for this long
+
+    # Result Cache Settings
+    RESULT_CACHE_ENABLED: bool = True  # Answer repeated prediction requests from a cache of earlier results
+    RESULT_CACHE_BACKEND: str = "memory"  # Where results are kept, either "memory" or "disk"
+    RESULT_CACHE_DIR: str = "cache/results"  # Directory for cached results of the disk backend
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024**2  # Budget for cached results, least recently used results are evicted
+    RESULT_CACHE_TTL_SECONDS: float = 3600  # Recompute results older than this, as imagery may change
 
     # BACKEND_CORS_ORIGINS is a comma-separated list of origins
     # e.g: http://localhost,http://localhost:4200,http://localhost:3000
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Any
 
 from fastapi import APIRouter, FastAPI, Request
@@ -5,15 +7,35 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from loguru import logger
 
-from app.api import api_router
+from app.api import api_router, modelLoader
 from app.config import settings, setup_app_logging
+from app.responses import ORJSONResponse
+from app.segment_geospatial.jobs import jobManager
+from app.segment_geospatial.tile_fetcher import tileFetcher
 
 # setup logging as early as possible
 setup_app_logging(config=settings)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the models and start the job workers, close the tile fetcher on shutdown."""
+    # Eager loading blocks until the models are ready, keep it off the event loop
+    await asyncio.to_thread(modelLoader.start, settings.MODEL_LOADING, warmup=settings.MODEL_WARMUP)
+    # Resume queued jobs
+    jobManager.start()
+    try:
+        yield
+    finally:
+        # Close the shared tile download connection pool
+        await asyncio.to_thread(tileFetcher.close_blocking)
+
+
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Remove the duplicate CORS middleware and keep only this one
@@ -50,6 +72,7 @@ def index(request: Request) -> Any:
 app.include_router(api_router, prefix=settings.API_V1_STR)
 app.include_router(root_router)
 
+
 # Remove this second CORS middleware block
 # if settings.BACKEND_CORS_ORIGINS:
 #     app.add_middleware(...)
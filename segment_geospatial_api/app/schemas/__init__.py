@@ -1,2 +1,11 @@
-from .health import Health
-from .predict import PredictionRequest, PredictionResults, ErrorResponse, PointPredictionRequest
\ No newline at end of file
+from .health import Health, Readiness
+from .cache import CacheStats
+from .predict import (
+    PredictionRequest,
+    StreamingPredictionRequest,
+    PredictionResults,
+    ErrorResponse,
+    PointPredictionRequest,
+)
+from .jobs import JobRequest, JobStatus, JobProgress
+from .sessions import SessionRequest, Session, SessionPointsRequest
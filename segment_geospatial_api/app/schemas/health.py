@@ -1,5 +1,12 @@
+from typing import Dict
+
 from pydantic import BaseModel
 
 class Health(BaseModel):
     name: str
-    api_version: str
\ No newline at end of file
+    api_version: str
+
+
+class Readiness(BaseModel):
+    ready: bool
+    models: Dict[str, str]
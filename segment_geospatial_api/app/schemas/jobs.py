@@ -0,0 +1,35 @@
+from typing import Any, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+from typing_extensions import Annotated
+
+from .predict import PointPredictionRequest, PredictionRequest
+
+
+class TextJobRequest(PredictionRequest):
+    type: Literal["text"] = Field(..., description="Job type")
+
+
+class PointJobRequest(PointPredictionRequest):
+    type: Literal["points"] = Field(..., description="Job type")
+
+
+JobRequest = Annotated[Union[TextJobRequest, PointJobRequest], Field(discriminator="type")]
+
+
+class JobProgress(BaseModel):
+    tiles_done: int = Field(default=0, description="Tiles downloaded or read from the cache")
+    tiles_total: Optional[int] = Field(default=None, description="Tiles needed by the job")
+    prompts_done: int = Field(default=0, description="Prompts with a result")
+    prompts_total: Optional[int] = Field(default=None, description="Prompts in the job")
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    type: str
+    status: str = Field(..., description="One of queued, running, succeeded or failed")
+    progress: JobProgress
+    result: Optional[Any] = Field(default=None, description="Prediction results once the job succeeded")
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
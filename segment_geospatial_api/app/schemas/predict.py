@@ -1,4 +1,4 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -14,6 +14,29 @@ class PredictionResults(BaseModel):
     geojson: Optional[dict]
 
 
+class OutputOptions(BaseModel):
+    simplify_tolerance: Optional[float] = Field(
+        default=None,
+        description="Simplify polygons with this tolerance in meters, preserving topology",
+        ge=0
+    )
+    min_area: Optional[float] = Field(
+        default=None,
+        description="Drop polygons smaller than this many square meters",
+        ge=0
+    )
+    coordinate_precision: Optional[int] = Field(
+        default=None,
+        description="Round output coordinates to this many decimals, e.g. 7 for about 1 cm",
+        ge=0,
+        le=15
+    )
+
+    def output_options(self) -> Dict[str, Any]:
+        """The output options as keyword arguments for the predictors."""
+        return self.model_dump(include={"simplify_tolerance", "min_area", "coordinate_precision"})
+
+
 class PromptConfig(BaseModel):
     value: str = Field(..., description="Text prompt for detection")
     text_threshold: float = Field(default=0.25, description="Text threshold for this specific prompt")
@@ -29,10 +52,18 @@ class PromptConfig(BaseModel):
         }
 
 
-class PredictionRequest(BaseModel):
+class PredictionRequest(OutputOptions):
     bounding_box: List[float] = Field(..., description="Bounding box coordinates [min_lon, min_lat, max_lon, max_lat]")
     zoom_level: int = Field(..., description="Zoom level for the map")
     text_prompts: List[PromptConfig] = Field(..., description="List of prompts with their individual thresholds")
+    windowed: Optional[bool] = Field(
+        default=None,
+        description="Process the area in overlapping chips. Used automatically for large areas when not set"
+    )
+    model_type: Optional[str] = Field(
+        default=None,
+        description="Text model variant, e.g. sam2-hiera-tiny for previews. Defaults to the server default"
+    )
 
     class Config:
         json_schema_extra = {
@@ -47,7 +78,14 @@ class PredictionRequest(BaseModel):
         }
 
 
-class PointPredictionRequest(BaseModel):
+class StreamingPredictionRequest(PredictionRequest):
+    stream_windows: bool = Field(
+        default=False,
+        description="In windowed mode, also stream the features of every window before they are merged across seams"
+    )
+
+
+class PointPredictionRequest(OutputOptions):
     points_include: List[List[float]] = Field(
         description="List of points to include [lon, lat]"
     )
@@ -63,10 +101,14 @@ class PointPredictionRequest(BaseModel):
     )
     box_threshold: float = Field(
         default=0.3,
-        description="Confidence threshold for object detection boxes",
+        description="Ignored, point prompts produce no detection boxes. Kept for compatibility",
         ge=0,
         le=1
     )
+    model_type: Optional[str] = Field(
+        default=None,
+        description="SAM variant (vit_b, vit_l or vit_h), e.g. vit_b for fast previews. Defaults to the server default"
+    )
 
     class Config:
         json_schema_extra = {
@@ -0,0 +1,53 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from .predict import OutputOptions
+
+
+class SessionRequest(BaseModel):
+    bounding_box: List[float] = Field(..., description="Area to refine in [min_lon, min_lat, max_lon, max_lat]")
+    zoom_level: int = Field(
+        default=19,
+        description="Zoom level for satellite imagery",
+        ge=1,
+        le=22
+    )
+    model_type: Optional[str] = Field(
+        default=None,
+        description="SAM variant (vit_b, vit_l or vit_h). Defaults to the server default"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bounding_box": [-96.81100, 32.97100, -96.80950, 32.97220],
+                "zoom_level": 20
+            }
+        }
+
+
+class Session(BaseModel):
+    session_id: str
+    bounding_box: List[float] = Field(..., description="Area covered by the session, aligned to the tile grid")
+    zoom_level: int
+    model_type: str
+    idle_timeout_seconds: float = Field(..., description="The session is closed after this long without requests")
+
+
+class SessionPointsRequest(OutputOptions):
+    points_include: List[List[float]] = Field(
+        description="List of points to include [lon, lat]"
+    )
+    points_exclude: Optional[List[List[float]]] = Field(
+        default=None,
+        description="List of points to exclude [lon, lat]"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "points_include": [[-96.81020, 32.97160]],
+                "points_exclude": [[-96.81010, 32.97150]]
+            }
+        }
@@ -0,0 +1,234 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+from loguru import logger
+
+
+def encode_images(predictor, images: List[np.ndarray]) -> List[Dict[str, Any]]:
+    """Run the SAM image encoder on several RGB images in one forward pass.
+
+    Mirrors SamPredictor.set_image, but stacks the preprocessed images into a
+    single batch so the encoder weights are streamed once for all of them.
+
+    Args:
+        predictor (SamPredictor): Predictor whose model and transform are used
+        images (list): RGB arrays of shape (height, width, 3)
+
+    Returns:
+        list: One embedding dict per image with features, original_size and input_size
+    """
+    batch = []
+    sizes = []
+    for image in images:
+        input_image = predictor.transform.apply_image(image)
+        input_torch = torch.as_tensor(input_image, device=predictor.device)
+        input_torch = input_torch.permute(2, 0, 1).contiguous()[None, :, :, :]
+        sizes.append((tuple(image.shape[:2]), tuple(input_torch.shape[-2:])))
+        batch.append(predictor.model.preprocess(input_torch))
+
+    with torch.no_grad():
+        features = predictor.model.image_encoder(torch.cat(batch))
+
+    embeddings = []
+    for i, (original_size, input_size) in enumerate(sizes):
+        # Copy each slice so a cached embedding does not keep the whole batch alive
+        image_features = features[i:i + 1].clone()
+        embeddings.append({
+            "features": image_features,
+            "original_size": original_size,
+            "input_size": input_size,
+            "nbytes": image_features.numel() * image_features.element_size(),
+        })
+    return embeddings
+
+
+def decode_points(predictor, embedding: Dict[str, Any], point_coords: np.ndarray, point_labels: np.ndarray) -> np.ndarray:
+    """Run only the SAM mask decoder against a precomputed embedding.
+
+    Returns:
+        np.ndarray: Best scoring mask as uint8 with 255 for object pixels
+    """
+    predictor.features = embedding["features"]
+    predictor.original_size = embedding["original_size"]
+    predictor.input_size = embedding["input_size"]
+    predictor.is_image_set = True
+    masks, scores, _ = predictor.predict(
+        point_coords=point_coords,
+        point_labels=point_labels,
+        multimask_output=True,
+    )
+    return (masks[np.argmax(scores)] * 255).astype(np.uint8)
+
+
+class PointBatchScheduler:
+    """Micro-batching scheduler for point predictions.
+
+    Requests that arrive within ``window_ms`` of each other are collected into
+    one batch. Images without a cached embedding are encoded in a single forward
+    pass, then each request is decoded and its mask is handed back to the caller.
+    A single worker thread runs the encoder. Requests that already have an
+    embedding skip the queue and are decoded in the caller's thread, so clicks
+    are not held up by a batch that is still encoding; decoding sets state on the
+    shared predictor and is serialized by a per-scheduler decoder lock.
+
+    The batch size adapts to the measured encode time so that the time the
+    oldest request of a batch spends queued, collecting and encoding stays
+    within ``latency_budget_ms``. The collection window starts when the oldest
+    request was queued, so requests that waited behind a busy worker are not
+    held back any longer.
+    """
+
+    def __init__(
+        self,
+        predictor_provider: Callable[[], Any],
+        max_batch_size: int,
+        window_ms: float,
+        latency_budget_ms: float,
+        name: str = "points",
+    ):
+        """
+        Args:
+            predictor_provider (callable): Returns the SamPredictor to run, loading it if needed
+            max_batch_size (int): Largest number of requests processed together
+            window_ms (float): How long to wait for more requests after the first one
+            latency_budget_ms (float): Upper bound for queue wait, window and encoding of a request
+            name (str): Name used in logs and for the worker thread
+        """
+        self.predictor_provider = predictor_provider
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000
+        self.latency_budget = latency_budget_ms / 1000
+        self.name = name
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._seconds_per_image: Optional[float] = None
+        self._decode_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batch-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(
+        self,
+        *,
+        point_coords: Optional[np.ndarray] = None,
+        point_labels: Optional[np.ndarray] = None,
+        image: Optional[np.ndarray] = None,
+        embedding: Optional[Dict[str, Any]] = None,
+    ) -> Future:
+        """Queue a prediction for the next batch.
+
+        Either ``image`` or a cached ``embedding`` must be given. Without
+        ``point_coords`` the image is only encoded and the mask is None.
+
+        Returns:
+            Future: Resolves to a dict with the predicted ``mask`` and the ``embedding`` used
+        """
+        if image is None and embedding is None:
+            raise ValueError("Either image or embedding is required")
+        future: Future = Future()
+        self._queue.put({
+            "queued_at": time.monotonic(),
+            "image": image,
+            "embedding": embedding,
+            "point_coords": point_coords,
+            "point_labels": point_labels,
+            "future": future,
+        })
+        self._ensure_worker()
+        return future
+
+    def predict(self, **kwargs) -> Dict[str, Any]:
+        """Run a prediction and block until its mask is ready.
+
+        Requests with an embedding and points are decoded right away, all others
+        are submitted to the next batch.
+        """
+        embedding = kwargs.get("embedding")
+        if embedding is not None and kwargs.get("point_coords") is not None:
+            mask = self.decode(embedding, kwargs["point_coords"], kwargs["point_labels"])
+            return {"mask": mask, "embedding": embedding}
+        return self.submit(**kwargs).result()
+
+    def decode(self, embedding: Dict[str, Any], point_coords: np.ndarray, point_labels: np.ndarray) -> np.ndarray:
+        """Run only the mask decoder for points against an embedding, without queueing.
+
+        Returns:
+            np.ndarray: Best scoring mask as uint8 with 255 for object pixels
+        """
+        predictor = self.predictor_provider()
+        with self._decode_lock:
+            return decode_points(predictor, embedding, point_coords, point_labels)
+
+    def _batch_limit(self, waited: float, remaining_window: float) -> int:
+        """Largest batch that still fits the latency budget given recent encode times.
+
+        Args:
+            waited (float): Seconds the oldest request of the batch has been queued
+            remaining_window (float): Seconds the batch may still wait for more requests
+        """
+        if self._seconds_per_image is None:
+            return self.max_batch_size
+        available = self.latency_budget - waited - remaining_window
+        return max(1, min(self.max_batch_size, int(available / self._seconds_per_image)))
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        batch = [self._queue.get()]
+        oldest = batch[0]["queued_at"]
+        deadline = oldest + self.window
+        while True:
+            now = time.monotonic()
+            remaining = max(0.0, deadline - now)
+            if len(batch) >= self._batch_limit(now - oldest, remaining):
+                break
+            try:
+                # Requests that are already queued join the batch even after the window
+                batch.append(self._queue.get(timeout=remaining) if remaining else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"[Batch:{self.name}] Failed to process batch: {str(e)}")
+                for job in batch:
+                    if not job["future"].done():
+                        job["future"].set_exception(e)
+
+    def _process(self, batch: List[Dict[str, Any]]):
+        to_encode = [job for job in batch if job["embedding"] is None]
+        if to_encode:
+            start = time.monotonic()
+            embeddings = encode_images(self.predictor_provider(), [job["image"] for job in to_encode])
+            elapsed = (time.monotonic() - start) / len(to_encode)
+            self._seconds_per_image = (
+                elapsed if self._seconds_per_image is None
+                else 0.8 * self._seconds_per_image + 0.2 * elapsed
+            )
+            for job, embedding in zip(to_encode, embeddings):
+                job["embedding"] = embedding
+            logger.info(f"[Batch:{self.name}] Encoded {len(to_encode)} image(s) for {len(batch)} request(s)")
+
+        for job in batch:
+            if job["point_coords"] is None:
+                job["future"].set_result({"mask": None, "embedding": job["embedding"]})
+                continue
+            try:
+                mask = self.decode(job["embedding"], job["point_coords"], job["point_labels"])
+                job["future"].set_result({"mask": mask, "embedding": job["embedding"]})
+            except Exception as e:
+                job["future"].set_exception(e)
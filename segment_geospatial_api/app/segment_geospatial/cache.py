@@ -0,0 +1,377 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from loguru import logger
+
+from app.config import settings
+
+
+class DiskLRUCache:
+    """Disk-backed byte cache with a size budget and least-recently-used eviction.
+
+    Entries are stored as individual files below ``cache_dir``. The recency order
+    is kept in memory and persisted through file modification times, so the cache
+    survives restarts without a separate index file.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, name: str = "disk"):
+        """
+        Args:
+            cache_dir (str): Directory holding the cached files
+            max_bytes (int): Total size budget in bytes
+            name (str): Name used in logs and statistics
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._load_existing()
+
+    def _load_existing(self):
+        """Rebuild the LRU order from files already present in the cache directory."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if file.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = os.path.relpath(path, self.cache_dir).replace(os.sep, "/")
+                found.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        logger.info(f"[Cache:{self.name}] Loaded {len(self._entries)} entries ({self._total_bytes} bytes)")
+        with self._lock:
+            self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *key.split("/"))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for ``key`` or None on a miss."""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store ``data`` under ``key`` and evict old entries beyond the budget."""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[Cache:{self.name}] Failed to write {key}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def pop(self, key: str):
+        """Remove ``key`` from the cache."""
+        with self._lock:
+            if key not in self._entries:
+                return
+            self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class TileCache(DiskLRUCache):
+    """XYZ tile cache keyed by (source, z, x, y)."""
+
+    @staticmethod
+    def tile_key(source: str, z: int, x: int, y: int) -> str:
+        safe_source = "".join(c if c.isalnum() else "_" for c in source)
+        return f"{safe_source}/{z}/{x}/{y}"
+
+    def get_tile(self, source: str, z: int, x: int, y: int) -> Optional[bytes]:
+        return self.get(self.tile_key(source, z, x, y))
+
+    def put_tile(self, source: str, z: int, x: int, y: int, data: bytes):
+        self.put(self.tile_key(source, z, x, y), data)
+
+
+class LRUCache:
+    """Thread-safe in-memory cache with a byte budget, LRU eviction and an idle TTL.
+
+    Callers pass the size of every value explicitly, which lets the cache hold
+    objects such as tensors whose memory footprint Python cannot measure.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[float] = None, name: str = "memory"):
+        """
+        Args:
+            max_bytes (int): Total size budget in bytes
+            ttl_seconds (float, optional): Drop entries that were not used for this long
+            name (str): Name used in logs and statistics
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Any, list]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _expired(self, last_used: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - last_used > self.ttl_seconds
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Return the cached value for ``key`` or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, nbytes, last_used = entry
+            if self._expired(last_used, now):
+                self._forget(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            entry[2] = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any, nbytes: int):
+        """Store ``value`` under ``key`` and evict old entries beyond the budget."""
+        if nbytes > self.max_bytes:
+            logger.warning(f"[Cache:{self.name}] Entry of {nbytes} bytes exceeds the cache budget")
+            return
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = [value, nbytes, time.monotonic()]
+            self._total_bytes += nbytes
+            self._evict()
+
+    def pop(self, key: Any) -> Optional[Any]:
+        """Remove ``key`` from the cache and return its value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            self._forget(key)
+            return entry[0] if entry else None
+
+    def _forget(self, key: Any):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if self._expired(entry[2], now)]:
+            self._forget(key)
+            self.evictions += 1
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes, _) = self._entries.popitem(last=False)
+            self._total_bytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class ResultCache:
+    """Content-addressed cache of prediction results.
+
+    Keys are SHA-256 hashes of the canonical JSON of the request together with
+    the prediction kind and model type, so requests that differ only in key order
+    or number formatting share an entry. Results are stored as JSON bytes in a
+    memory or disk backend, which also hands every caller its own copy, and
+    expire ``ttl_seconds`` after they were computed.
+    """
+
+    def __init__(self, backend: str, max_bytes: int, ttl_seconds: float, cache_dir: str, name: str = "results"):
+        """
+        Args:
+            backend (str): "memory" or "disk"
+            max_bytes (int): Total size budget in bytes
+            ttl_seconds (float): Age after which a result is recomputed
+            cache_dir (str): Directory holding the cached results of the disk backend
+            name (str): Name used in logs and statistics
+        """
+        if backend == "memory":
+            self._store = LRUCache(max_bytes, name=name)
+        elif backend == "disk":
+            self._store = DiskLRUCache(cache_dir, max_bytes, name=name)
+        else:
+            raise ValueError(f"Unknown result cache backend: {backend}")
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def request_key(kind: str, model_type: str, request: Dict[str, Any]) -> str:
+        """Hash of the canonical form of a prediction request."""
+        canonical = json.dumps(
+            {"kind": kind, "model_type": model_type, "request": request},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def is_complete(result: Dict[str, Any], expected_items: int) -> bool:
+        """Whether a result has a GeoJSON item for each of the ``expected_items`` prompts.
+
+        Errors, missing items and failures reported for the whole request may be
+        transient and are not worth caching.
+        """
+        items = result.get("json")
+        return (
+            "error" not in result
+            and isinstance(items, list)
+            and len(items) == expected_items
+            and all("geojson" in item for item in items)
+        )
+
+    def _store_key(self, key: str) -> str:
+        # Spread files over subdirectories on disk
+        return f"{key[:2]}/{key}" if self.backend == "disk" else key
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached result for ``key`` or None on a miss or after expiry."""
+        store_key = self._store_key(key)
+        data = self._store.get(store_key)
+        if data is None:
+            return None
+        entry = json.loads(data)
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            self._store.pop(store_key)
+            return None
+        return entry["result"]
+
+    def put(self, key: str, result: Any):
+        """Store a JSON serializable result under ``key``."""
+        data = json.dumps({"created_at": time.time(), "result": result}).encode()
+        if self.backend == "memory":
+            self._store.put(self._store_key(key), data, len(data))
+        else:
+            self._store.put(self._store_key(key), data)
+
+    def clear(self):
+        """Remove every cached result."""
+        self._store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        return self._store.stats()
+
+
+tileCache = TileCache(settings.TILE_CACHE_DIR, settings.TILE_CACHE_MAX_BYTES, name="tiles")
+embeddingCache = LRUCache(
+    settings.EMBEDDING_CACHE_MAX_BYTES,
+    ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    name="embeddings",
+)
+# Interactive point sessions keep their image embedding until they go idle
+sessionStore = LRUCache(
+    settings.SESSION_MAX_BYTES,
+    ttl_seconds=settings.SESSION_IDLE_TIMEOUT_SECONDS,
+    name="sessions",
+)
+resultCache = ResultCache(
+    settings.RESULT_CACHE_BACKEND,
+    settings.RESULT_CACHE_MAX_BYTES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    cache_dir=settings.RESULT_CACHE_DIR,
+)
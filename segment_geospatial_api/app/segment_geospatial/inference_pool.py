@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from loguru import logger
+
+from app.config import settings
+
+
+# Marks the end of a streamed generator
+_STREAM_END = object()
+
+
+class InferencePoolFull(RuntimeError):
+    """Raised when the inference pool has no free worker or queue slot."""
+
+
+class InferencePool:
+    """Bounded thread pool that runs blocking downloads and model inference off the event loop.
+
+    At most ``max_workers`` jobs run at a time and at most ``max_queue`` more wait
+    for a worker. Submissions beyond that are rejected immediately with
+    InferencePoolFull instead of piling up behind slow requests.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, stream_buffer: int = 2):
+        """
+        Args:
+            max_workers (int): Number of worker threads
+            max_queue (int): Number of jobs allowed to wait for a free worker
+            stream_buffer (int): Items of a stream held for the consumer before the generator waits
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.stream_buffer = max(1, stream_buffer)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._submitted = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._submitted -= 1
+        self._slots.release()
+
+    def _submit(self, func: Callable, *args, _wait: bool = False, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=_wait):
+            logger.warning("Inference pool is full, rejecting request")
+            raise InferencePoolFull("Server is busy, please retry later")
+        with self._lock:
+            self._submitted += 1
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is released when the work finishes, even if the caller stops waiting
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run ``func(*args, **kwargs)`` on a worker thread and await its result.
+
+        Raises:
+            InferencePoolFull: If all workers are busy and the queue is full.
+        """
+        return await asyncio.wrap_future(self._submit(func, *args, **kwargs))
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Run ``func(*args, **kwargs)`` on a worker thread from a background thread.
+
+        Waits for a free slot instead of raising InferencePoolFull, so background
+        work such as jobs counts against the same capacity as requests without
+        being rejected.
+        """
+        return self._submit(func, *args, _wait=True, **kwargs).result()
+
+    async def stream(self, func: Callable[..., Iterator], *args, **kwargs) -> AsyncIterator[Any]:
+        """Run the generator ``func(*args, **kwargs)`` on a worker thread and yield its items.
+
+        Items are handed to the event loop as soon as the generator produces them.
+        At most ``stream_buffer`` items wait for the consumer, then the generator
+        is paused until the consumer catches up, so a slow client does not make
+        results pile up in memory. If the consumer stops early, the generator is
+        closed after its next item.
+
+        Raises:
+            InferencePoolFull: If all workers are busy and the queue is full.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue(maxsize=self.stream_buffer)
+        cancelled = threading.Event()
+
+        def put(item, error=None):
+            # Blocks the worker while the queue is full
+            asyncio.run_coroutine_threadsafe(items.put((item, error)), loop).result()
+
+        def produce():
+            generator = func(*args, **kwargs)
+            try:
+                for item in generator:
+                    if cancelled.is_set():
+                        break
+                    put(item)
+            except Exception as e:
+                if not cancelled.is_set():
+                    put(_STREAM_END, e)
+                return
+            finally:
+                generator.close()
+            if not cancelled.is_set():
+                put(_STREAM_END)
+
+        self._submit(produce)
+        try:
+            while True:
+                item, error = await items.get()
+                if item is _STREAM_END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            cancelled.set()
+            # Unblock a worker waiting for space, it stops before the next item
+            while not items.empty():
+                items.get_nowait()
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool capacity and the number of running or queued jobs."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "submitted": self._submitted,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+inferencePool = InferencePool(settings.INFERENCE_WORKERS, settings.INFERENCE_QUEUE_SIZE, settings.STREAM_BUFFER_SIZE)
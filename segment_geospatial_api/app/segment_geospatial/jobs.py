@@ -0,0 +1,269 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.segment_geospatial.inference_pool import InferencePool, inferencePool
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the job queue has no free slot."""
+
+
+class JobStore:
+    """SQLite store for job requests, progress and results.
+
+    Every call opens its own connection, so the store can be used from the
+    request handlers and the job worker threads at the same time.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the SQLite database, created on first use
+        """
+        self.path = path
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                progress TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connection(self):
+        with self._schema_lock:
+            if not self._schema_ready:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                    self._create_schema(conn)
+                    conn.commit()
+                self._schema_ready = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["id"],
+            "type": row["kind"],
+            "status": row["status"],
+            "request": json.loads(row["request"]),
+            "progress": json.loads(row["progress"]),
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def create(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new queued job and return it."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, request, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, JOB_QUEUED, json.dumps(request), json.dumps({}), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job with ``job_id`` or None if it does not exist."""
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        """Update the status, progress, result or error of a job."""
+        columns = []
+        values = []
+        for name, value in fields.items():
+            if name not in ("status", "progress", "result", "error"):
+                raise ValueError(f"Unknown job field: {name}")
+            columns.append(f"{name} = ?")
+            values.append(json.dumps(value) if name in ("progress", "result") else value)
+        columns.append("updated_at = ?")
+        values.append(time.time())
+        with self._connection() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", (*values, job_id))
+
+    def ids_with_status(self, status: str) -> List[str]:
+        """IDs of the jobs with ``status`` in submission order."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (status,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+
+class JobManager:
+    """Runs queued jobs on background worker threads and records their progress.
+
+    Each job kind is registered with a runner that receives the stored request
+    and a ``report(**progress)`` callback and returns the job result. Job state
+    lives in the store, so it survives restarts: start() picks up jobs that
+    were still queued and marks jobs that were running as failed.
+
+    With a ``pool``, runners execute on the inference pool, so jobs share its
+    capacity with requests instead of running in addition to it.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        max_queue: int,
+        progress_interval: float = 1.0,
+        pool: Optional[InferencePool] = None,
+    ):
+        """
+        Args:
+            store (JobStore): Store persisting the jobs
+            workers (int): Number of jobs executed at the same time
+            max_queue (int): Number of jobs allowed to wait for a worker
+            progress_interval (float): Minimum seconds between progress writes of a job
+            pool (InferencePool, optional): Pool the runners execute on, the worker thread itself if None
+        """
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.progress_interval = progress_interval
+        self.pool = pool
+        self.runners: Dict[str, Callable[[Dict[str, Any], Callable[..., None]], Any]] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._recovered = False
+
+    def register(self, kind: str, runner: Callable[[Dict[str, Any], Callable[..., None]], Any]):
+        """Register the function that executes jobs of ``kind``."""
+        self.runners[kind] = runner
+
+    def start(self):
+        """Recover jobs from the store and start the worker threads."""
+        with self._start_lock:
+            if not self._recovered:
+                self._recovered = True
+                interrupted = self.store.ids_with_status(JOB_RUNNING)
+                for job_id in interrupted:
+                    self.store.update(job_id, status=JOB_FAILED, error="Interrupted by a server restart")
+                queued = self.store.ids_with_status(JOB_QUEUED)
+                for job_id in queued:
+                    self._queue.put(job_id)
+                if interrupted or queued:
+                    logger.info(f"[Jobs] Resuming {len(queued)} queued jobs, {len(interrupted)} interrupted")
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"job-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job and return its initial state.
+
+        Raises:
+            ValueError: If no runner is registered for ``kind``.
+            JobQueueFull: If too many jobs are already waiting.
+        """
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job type: {kind}")
+        if self._queue.qsize() >= self.max_queue:
+            logger.warning("Job queue is full, rejecting job")
+            raise JobQueueFull("Too many queued jobs, please retry later")
+        # Recover stored jobs first so that the new job is not queued twice
+        self.start()
+        job = self.store.create(kind, request)
+        self._queue.put(job["job_id"])
+        logger.info(f"[Jobs] Queued {kind} job {job['job_id']}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the current state of a job or None if it does not exist."""
+        return self.store.get(job_id)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._execute(job_id)
+            except Exception as e:
+                logger.error(f"[Jobs] Failed to record job {job_id}: {str(e)}")
+
+    def _execute(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] != JOB_QUEUED:
+            return
+        self.store.update(job_id, status=JOB_RUNNING)
+        logger.info(f"[Jobs] Running {job['type']} job {job_id}")
+
+        progress = dict(job["progress"])
+        progress_lock = threading.Lock()
+        last_saved = 0.0
+
+        def report(**fields):
+            nonlocal last_saved
+            with progress_lock:
+                progress.update(fields)
+                now = time.monotonic()
+                if now - last_saved < self.progress_interval:
+                    return
+                last_saved = now
+                self.store.update(job_id, progress=progress)
+
+        try:
+            runner = self.runners[job["type"]]
+            if self.pool is not None:
+                result = self.pool.call(runner, job["request"], report)
+            else:
+                result = runner(job["request"], report)
+        except Exception as e:
+            logger.error(f"[Jobs] Job {job_id} failed: {str(e)}")
+            with progress_lock:
+                self.store.update(job_id, status=JOB_FAILED, progress=progress, error=str(e))
+            return
+        with progress_lock:
+            self.store.update(job_id, status=JOB_SUCCEEDED, progress=progress, result=result)
+        logger.success(f"[Jobs] Job {job_id} finished")
+
+
+jobManager = JobManager(
+    JobStore(settings.JOB_DB_PATH),
+    workers=settings.JOB_WORKERS,
+    max_queue=settings.JOB_QUEUE_SIZE,
+    pool=inferencePool,
+)
@@ -0,0 +1,100 @@
+import threading
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+MODEL_LOADING_MODES = ("eager", "background", "lazy")
+
+
+class ModelLoader:
+    """Loads the predictor models concurrently and tracks their readiness.
+
+    Each predictor must provide ``setup()`` and ``warmup()``. Depending on the
+    mode, models are loaded before the app starts serving ("eager"), in
+    background threads while the app already answers liveness checks
+    ("background"), or by the first request that needs them ("lazy").
+    """
+
+    def __init__(self, predictors: Dict[str, Any]):
+        """
+        Args:
+            predictors (dict): Predictors keyed by the name reported in status()
+        """
+        self.predictors = predictors
+        self.mode = "lazy"
+        self._threads: Dict[str, threading.Thread] = {}
+        self._loaded: Dict[str, bool] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name: str, warmup: bool):
+        predictor = self.predictors[name]
+        try:
+            predictor.setup()
+        except Exception as e:
+            logger.error(f"[Models] Failed to load {name} model: {str(e)}")
+            with self._lock:
+                self._errors[name] = str(e)
+            return
+        if warmup:
+            try:
+                predictor.warmup()
+            except Exception as e:
+                # A failed warm-up only costs latency on the first request
+                logger.warning(f"[Models] Warm-up of {name} model failed: {str(e)}")
+        with self._lock:
+            self._loaded[name] = True
+        logger.success(f"[Models] {name} model is ready")
+
+    def start(self, mode: str, warmup: bool = False):
+        """Start loading all models.
+
+        Args:
+            mode (str): "eager", "background" or "lazy"
+            warmup (bool): Run a small prediction after loading each model
+        """
+        if mode not in MODEL_LOADING_MODES:
+            raise ValueError(f"Unknown model loading mode: {mode}")
+        self.mode = mode
+        if mode == "lazy":
+            return
+        with self._lock:
+            for name in self.predictors:
+                if name in self._threads:
+                    continue
+                thread = threading.Thread(
+                    target=self._load, args=(name, warmup), name=f"load-{name}", daemon=True
+                )
+                self._threads[name] = thread
+                thread.start()
+        if mode == "eager":
+            self.wait()
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until every started model has finished loading or failed."""
+        for thread in list(self._threads.values()):
+            thread.join(timeout)
+
+    def status(self) -> Dict[str, str]:
+        """Loading state of each model: pending, loading, ready or failed."""
+        states = {}
+        with self._lock:
+            for name, predictor in self.predictors.items():
+                thread = self._threads.get(name)
+                if name in self._errors:
+                    states[name] = "failed"
+                elif self._loaded.get(name) or (thread is None and getattr(predictor, "_initialized", False)):
+                    states[name] = "ready"
+                elif thread is not None and thread.is_alive():
+                    states[name] = "loading"
+                else:
+                    states[name] = "pending"
+        return states
+
+    @property
+    def ready(self) -> bool:
+        """Whether requests can be served. In lazy mode models load on first use."""
+        states = self.status().values()
+        if self.mode == "lazy":
+            return "failed" not in states
+        return all(state == "ready" for state in states)
@@ -0,0 +1,198 @@
+import gc
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from loguru import logger
+
+from app.config import settings
+
+
+def estimate_model_bytes(model: Any, depth: int = 3) -> int:
+    """Memory held by the torch parameters and buffers reachable from a model wrapper.
+
+    Wrappers such as SamGeo and LangSAM keep their networks in attributes, so
+    attributes are searched up to ``depth`` levels for torch modules. Modules
+    shared between attributes are counted once. Models that do not keep their
+    weights in torch, such as the ONNX backend, report them in ``nbytes``.
+    """
+    nbytes = getattr(model, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        import torch
+    except ImportError:
+        return 0
+
+    seen_modules = set()
+    seen_tensors = set()
+    total = 0
+
+    def visit(obj, level):
+        nonlocal total
+        if isinstance(obj, torch.nn.Module):
+            if id(obj) in seen_modules:
+                return
+            seen_modules.add(id(obj))
+            for tensor in list(obj.parameters()) + list(obj.buffers()):
+                if tensor.data_ptr() not in seen_tensors:
+                    seen_tensors.add(tensor.data_ptr())
+                    total += tensor.numel() * tensor.element_size()
+            return
+        if level == 0 or not hasattr(obj, "__dict__"):
+            return
+        for value in vars(obj).values():
+            visit(value, level - 1)
+
+    visit(model, depth)
+    return total
+
+
+class ModelRegistry:
+    """Loads model variants on demand and keeps the recently used ones within a RAM budget.
+
+    Each model family ("text", "points") registers a factory and the model
+    types it supports. Models are loaded the first time they are requested.
+    When the loaded models exceed ``max_bytes``, the least recently used ones
+    that are not in use are dropped. Models in use and the most recently used
+    model are never evicted, so the budget can be exceeded while they are needed.
+    """
+
+    def __init__(self, max_bytes: int, name: str = "models"):
+        """
+        Args:
+            max_bytes (int): RAM budget for loaded models in bytes
+            name (str): Name used in logs and statistics
+        """
+        self.max_bytes = max_bytes
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._factories: Dict[str, Tuple[Callable[[str], Any], List[str]]] = {}
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def register(self, family: str, factory: Callable[[str], Any], model_types: Iterable[str]):
+        """Register how to load the models of a family.
+
+        Args:
+            family (str): Name of the model family
+            factory (callable): Loads and returns the model for a model type
+            model_types (list): Model types that may be requested
+        """
+        self._factories[family] = (factory, list(model_types))
+
+    def model_types(self, family: str) -> List[str]:
+        """Model types supported by a family."""
+        return list(self._factories[family][1])
+
+    def is_loaded(self, family: str, model_type: str) -> bool:
+        with self._lock:
+            return (family, model_type) in self._entries
+
+    def _pin(self, key: Tuple[str, str]):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["pins"] += 1
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def _load(self, family: str, model_type: str) -> Dict[str, Any]:
+        factory, model_types = self._factories[family]
+        if model_type not in model_types:
+            raise ValueError(f"Unsupported {family} model type: {model_type}. Choose one of {', '.join(model_types)}")
+        key = (family, model_type)
+        with self._lock:
+            entry = self._pin(key)
+            if entry is not None:
+                return entry
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Concurrent requests for the same model wait for a single load
+        with load_lock:
+            with self._lock:
+                entry = self._pin(key)
+                if entry is not None:
+                    return entry
+            logger.info(f"[Models] Loading {family} model {model_type}")
+            model = factory(model_type)
+            nbytes = estimate_model_bytes(model)
+            with self._lock:
+                self.misses += 1
+                entry = {"key": key, "model": model, "nbytes": nbytes, "pins": 1}
+                self._entries[key] = entry
+                self._total_bytes += nbytes
+                evicted = self._evict()
+            logger.success(f"[Models] Loaded {family} model {model_type} ({nbytes / 1024**2:.0f} MiB)")
+        if evicted:
+            gc.collect()
+        return entry
+
+    def _release(self, entry: Dict[str, Any]):
+        with self._lock:
+            entry["pins"] -= 1
+            # Recency counts from the end of the last use
+            if entry["key"] in self._entries:
+                self._entries.move_to_end(entry["key"])
+            evicted = self._evict()
+        if evicted:
+            gc.collect()
+
+    def _evict(self) -> bool:
+        evicted = False
+        # The most recently used model stays loaded even if it alone exceeds the budget
+        for key in list(self._entries)[:-1]:
+            if self._total_bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry["pins"] > 0:
+                continue
+            del self._entries[key]
+            self._total_bytes -= entry["nbytes"]
+            self.evictions += 1
+            evicted = True
+            logger.info(f"[Models] Evicted {key[0]} model {key[1]} to stay within the memory budget")
+        return evicted
+
+    @contextmanager
+    def acquire(self, family: str, model_type: str) -> Iterator[Any]:
+        """Load a model if needed and keep it loaded while the block runs.
+
+        Raises:
+            ValueError: If the model type is not supported by the family.
+        """
+        entry = self._load(family, model_type)
+        try:
+            yield entry["model"]
+        finally:
+            self._release(entry)
+
+    def get(self, family: str, model_type: str) -> Any:
+        """Load a model if needed and return it without keeping it loaded.
+
+        Use acquire when the model must not be evicted while it is used.
+        """
+        with self.acquire(family, model_type) as model:
+            return model
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "loaded": [f"{family}:{model_type}" for family, model_type in self._entries],
+            }
+
+
+modelRegistry = ModelRegistry(settings.MODEL_CACHE_MAX_BYTES)
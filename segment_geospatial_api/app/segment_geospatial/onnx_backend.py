@@ -0,0 +1,279 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from loguru import logger
+from segment_anything.utils.transforms import ResizeLongestSide
+
+POINT_BACKENDS = ("torch", "onnx")
+
+# Image normalization and input size used by all SAM v1 models
+SAM_IMAGE_SIZE = 1024
+SAM_PIXEL_MEAN = torch.tensor([123.675, 116.28, 103.53]).view(-1, 1, 1)
+SAM_PIXEL_STD = torch.tensor([58.395, 57.12, 57.375]).view(-1, 1, 1)
+SAM_MASK_THRESHOLD = 0.0
+
+
+def onnx_model_paths(model_dir: str, model_type: str, quantize: bool) -> Tuple[str, str]:
+    """Paths of the exported encoder and decoder of a model type.
+
+    Each variant gets its own directory, as large models keep their weights in
+    separate files next to the graph.
+    """
+    directory = os.path.join(model_dir, f"{model_type}-int8" if quantize else model_type)
+    return os.path.join(directory, "encoder.onnx"), os.path.join(directory, "decoder.onnx")
+
+
+def _decoder_module(sam):
+    """Prompt encoder and mask decoder of ``sam`` in a traceable form.
+
+    Upscaling the masks to the image size is left to the caller, because the
+    crop to the unpadded size cannot be traced for variable image sizes.
+    """
+    from segment_anything.utils.onnx import SamOnnxModel
+
+    class SamOnnxDecoder(SamOnnxModel):
+        @torch.no_grad()
+        def forward(self, image_embeddings, point_coords, point_labels, mask_input, has_mask_input):
+            masks, scores = self.model.mask_decoder.predict_masks(
+                image_embeddings=image_embeddings,
+                image_pe=self.model.prompt_encoder.get_dense_pe(),
+                sparse_prompt_embeddings=self._embed_points(point_coords, point_labels),
+                dense_prompt_embeddings=self._embed_masks(mask_input, has_mask_input),
+            )
+            return scores, masks
+
+    return SamOnnxDecoder(sam, return_single_mask=False)
+
+
+def export_sam_onnx(sam, model_dir: str, model_type: str, quantize: bool) -> Tuple[str, str]:
+    """Export the image encoder and the prompt decoder of a SAM model to ONNX.
+
+    The encoder accepts a batch of preprocessed images, so batching.encode_images
+    works unchanged. The decoder combines the prompt encoder and the mask
+    decoder, as in the segment_anything export script.
+
+    Args:
+        sam (Sam): segment_anything model to export
+        model_dir (str): Directory for the ONNX files
+        model_type (str): Model type used in the file names
+        quantize (bool): Also write INT8 dynamically quantized copies and return those
+
+    Returns:
+        tuple: Paths of the encoder and decoder to load
+    """
+    encoder_path, decoder_path = onnx_model_paths(model_dir, model_type, quantize=False)
+    os.makedirs(os.path.dirname(encoder_path), exist_ok=True)
+    sam = sam.to("cpu").eval()
+
+    logger.info(f"[ONNX] Exporting {model_type} image encoder to {encoder_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            sam.image_encoder,
+            (torch.randn(1, 3, SAM_IMAGE_SIZE, SAM_IMAGE_SIZE),),
+            encoder_path,
+            input_names=["images"],
+            output_names=["image_embeddings"],
+            dynamic_axes={"images": {0: "batch"}, "image_embeddings": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+
+    logger.info(f"[ONNX] Exporting {model_type} mask decoder to {decoder_path}")
+    decoder = _decoder_module(sam)
+    embed_dim = sam.prompt_encoder.embed_dim
+    embed_size = sam.prompt_encoder.image_embedding_size
+    mask_input_size = [4 * x for x in embed_size]
+    dummy_inputs = {
+        "image_embeddings": torch.randn(1, embed_dim, *embed_size, dtype=torch.float),
+        "point_coords": torch.randint(low=0, high=SAM_IMAGE_SIZE, size=(1, 5, 2), dtype=torch.float),
+        "point_labels": torch.randint(low=0, high=4, size=(1, 5), dtype=torch.float),
+        "mask_input": torch.randn(1, 1, *mask_input_size, dtype=torch.float),
+        "has_mask_input": torch.tensor([1], dtype=torch.float),
+    }
+    with torch.no_grad():
+        torch.onnx.export(
+            decoder,
+            tuple(dummy_inputs.values()),
+            decoder_path,
+            input_names=list(dummy_inputs.keys()),
+            output_names=["iou_predictions", "low_res_masks"],
+            dynamic_axes={"point_coords": {1: "num_points"}, "point_labels": {1: "num_points"}},
+            opset_version=17,
+            dynamo=False,
+        )
+
+    if not quantize:
+        return encoder_path, decoder_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_paths = onnx_model_paths(model_dir, model_type, quantize=True)
+    os.makedirs(os.path.dirname(quantized_paths[0]), exist_ok=True)
+    for source, target in zip((encoder_path, decoder_path), quantized_paths):
+        logger.info(f"[ONNX] Quantizing {source} to INT8")
+        quantize_dynamic(
+            model_input=source,
+            model_output=target,
+            per_channel=False,
+            reduce_range=False,
+            weight_type=QuantType.QUInt8,
+            # vit_h weights exceed the 2GB protobuf limit
+            use_external_data_format=True,
+        )
+    return quantized_paths
+
+
+def create_session(path: str, intra_op_threads: int = 0):
+    """ONNX Runtime CPU session. ``intra_op_threads`` of 0 lets ONNX Runtime choose."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def _directory_nbytes(directory: str) -> int:
+    """Size of the ONNX graphs and external weight files of a model variant."""
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+class OnnxImageEncoder:
+    """Callable stand-in for Sam.image_encoder backed by an ONNX Runtime session."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        (features,) = self.session.run(None, {"images": images.numpy().astype(np.float32)})
+        return torch.from_numpy(features)
+
+
+class OnnxSamModel:
+    """The parts of segment_anything's Sam used by batching.encode_images."""
+
+    image_format = "RGB"
+    img_size = SAM_IMAGE_SIZE
+    mask_threshold = SAM_MASK_THRESHOLD
+
+    def __init__(self, encoder_session):
+        self.image_encoder = OnnxImageEncoder(encoder_session)
+
+    def preprocess(self, x: torch.Tensor) -> torch.Tensor:
+        """Normalize pixel values and pad to a square input, as Sam.preprocess does."""
+        x = (x.float() - SAM_PIXEL_MEAN) / SAM_PIXEL_STD
+        h, w = x.shape[-2:]
+        return F.pad(x, (0, self.img_size - w, 0, self.img_size - h))
+
+
+class OnnxSamPredictor:
+    """SamPredictor replacement running the encoder and decoder on ONNX Runtime.
+
+    Implements the attributes and the predict() call that batching.encode_images
+    and batching.decode_points rely on, so the batch scheduler can drive either
+    backend.
+    """
+
+    device = torch.device("cpu")
+
+    def __init__(self, encoder_session, decoder_session):
+        self.model = OnnxSamModel(encoder_session)
+        self.decoder = decoder_session
+        self.transform = ResizeLongestSide(SAM_IMAGE_SIZE)
+        self.features: Optional[torch.Tensor] = None
+        self.original_size: Optional[Tuple[int, int]] = None
+        self.input_size: Optional[Tuple[int, int]] = None
+        self.is_image_set = False
+
+    def set_image(self, image: np.ndarray):
+        """Encode a single RGB image, as SamPredictor.set_image does."""
+        input_image = self.transform.apply_image(image)
+        input_torch = torch.as_tensor(input_image).permute(2, 0, 1).contiguous()[None, :, :, :]
+        self.features = self.model.image_encoder(self.model.preprocess(input_torch))
+        self.original_size = tuple(image.shape[:2])
+        self.input_size = tuple(input_torch.shape[-2:])
+        self.is_image_set = True
+
+    def predict(
+        self,
+        point_coords: np.ndarray,
+        point_labels: np.ndarray,
+        multimask_output: bool = True,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Predict masks for points on the current image.
+
+        Returns:
+            tuple: Boolean masks, their predicted IoU scores and the low resolution logits
+        """
+        if not self.is_image_set:
+            raise RuntimeError("An image must be set with set_image(...) before mask prediction.")
+        coords = self.transform.apply_coords(np.asarray(point_coords, dtype=np.float32), self.original_size)
+        # SamPredictor pads point prompts with a "not a point" entry when no box is given
+        coords = np.concatenate([coords, np.zeros((1, 2), dtype=np.float32)])[None, :, :].astype(np.float32)
+        labels = np.concatenate([np.asarray(point_labels, dtype=np.float32), [-1.0]])[None, :].astype(np.float32)
+        scores, low_res = self.decoder.run(None, {
+            "image_embeddings": self.features.numpy(),
+            "point_coords": coords,
+            "point_labels": labels,
+            "mask_input": np.zeros((1, 1, 256, 256), dtype=np.float32),
+            "has_mask_input": np.zeros(1, dtype=np.float32),
+        })
+        selected = slice(1, None) if multimask_output else slice(0, 1)
+        scores, low_res = scores[:, selected], low_res[:, selected]
+        masks = self.postprocess_masks(torch.from_numpy(low_res))
+        return masks[0].numpy() > SAM_MASK_THRESHOLD, scores[0], low_res[0]
+
+    def postprocess_masks(self, masks: torch.Tensor) -> torch.Tensor:
+        """Upscale low resolution masks to the original image size, as Sam.postprocess_masks does."""
+        masks = F.interpolate(masks, (SAM_IMAGE_SIZE, SAM_IMAGE_SIZE), mode="bilinear", align_corners=False)
+        masks = masks[..., : self.input_size[0], : self.input_size[1]]
+        return F.interpolate(masks, self.original_size, mode="bilinear", align_corners=False)
+
+
+class OnnxSamGeo:
+    """Point model served from ONNX Runtime, exposing ``predictor`` like SamGeo.
+
+    ``nbytes`` reports the size of the loaded weights for the model registry.
+    """
+
+    def __init__(self, encoder_path: str, decoder_path: str, intra_op_threads: int = 0):
+        """
+        Args:
+            encoder_path (str): Exported image encoder
+            decoder_path (str): Exported mask decoder
+            intra_op_threads (int): Threads used inside each ONNX operator, 0 for the default
+        """
+        self.encoder_path = encoder_path
+        self.decoder_path = decoder_path
+        self.predictor = OnnxSamPredictor(
+            create_session(encoder_path, intra_op_threads),
+            create_session(decoder_path, intra_op_threads),
+        )
+        self.nbytes = _directory_nbytes(os.path.dirname(encoder_path))
+
+    @classmethod
+    def from_sam(
+        cls,
+        sam_loader,
+        model_dir: str,
+        model_type: str,
+        quantize: bool,
+        intra_op_threads: int = 0,
+    ) -> "OnnxSamGeo":
+        """Load the exported model, exporting it first if it is not on disk yet.
+
+        Args:
+            sam_loader (callable): Returns the segment_anything Sam model, only called for the export
+            model_dir (str): Directory holding the ONNX files
+            model_type (str): SAM model type
+            quantize (bool): Use the INT8 dynamically quantized model
+            intra_op_threads (int): Threads used inside each ONNX operator, 0 for the default
+        """
+        encoder_path, decoder_path = onnx_model_paths(model_dir, model_type, quantize)
+        if not (os.path.exists(encoder_path) and os.path.exists(decoder_path)):
+            encoder_path, decoder_path = export_sam_onnx(sam_loader(), model_dir, model_type, quantize)
+        logger.info(f"[ONNX] Loading {encoder_path} and {decoder_path}")
+        return cls(encoder_path, decoder_path, intra_op_threads)
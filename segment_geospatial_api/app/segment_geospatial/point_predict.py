@@ -1,14 +1,29 @@
-from samgeo import raster_to_vector, SamGeo
+from samgeo import SamGeo
+import asyncio
 import uuid
+import threading
 import json
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Optional
 from loguru import logger
 import sys
-import os
-from pyproj import Transformer
 from app.config import settings
 import numpy as np
-from app.segment_geospatial.utils import transform_coordinates, download_satellite_image, calculate_bounding_box
+from app.segment_geospatial.cache import embeddingCache, resultCache, sessionStore
+from app.segment_geospatial.inference_pool import inferencePool
+from app.segment_geospatial.batching import PointBatchScheduler
+from app.segment_geospatial.model_registry import modelRegistry
+from app.segment_geospatial.onnx_backend import POINT_BACKENDS, OnnxSamGeo
+from app.segment_geospatial.utils import (
+    to_output_geojson,
+    fetch_satellite_image,
+    calculate_bounding_box,
+    count_tiles,
+    snap_bounding_box_to_tiles,
+    lonlat_to_pixel,
+    vectorize_mask,
+    write_geotiff,
+    intermediate_file_path,
+)
 # Configure loguru logger
 logger.remove()  # Remove default handler
 logger.add(
@@ -24,10 +39,51 @@ logger.add(
 logger.add(sys.stderr, level="INFO")
 
 
+def load_point_model(model_type: str):
+    """Load a SamGeo model, or its ONNX Runtime counterpart, for the model registry."""
+    logger.info(f"\n[Loading Point Model] model_type: {model_type}, backend: {settings.POINT_BACKEND}")
+    if settings.POINT_BACKEND not in POINT_BACKENDS:
+        raise RuntimeError(f"Unknown point backend: {settings.POINT_BACKEND}")
+    try:
+        if settings.POINT_BACKEND == "onnx":
+            # The PyTorch model is only loaded to export it when no ONNX model exists yet
+            sam = OnnxSamGeo.from_sam(
+                lambda: SamGeo(model_type=model_type, automatic=False, sam_kwargs=None).predictor.model,
+                settings.ONNX_MODEL_DIR,
+                model_type,
+                quantize=settings.ONNX_QUANTIZE,
+                intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+            )
+        else:
+            sam = SamGeo(
+                model_type=model_type,
+                automatic=False,
+                sam_kwargs=None
+            )
+    except Exception as e:
+        logger.error(f"Failed to initialize models: {str(e)}")
+        raise RuntimeError(f"Failed to initialize models: {str(e)}")
+    logger.success("Models initialized successfully")
+    return sam
+
+
+modelRegistry.register("points", load_point_model, settings.POINT_MODEL_TYPES)
+
+
+def point_prompt_labels(points_include: list, points_exclude: list = None) -> np.ndarray:
+    """SAM point labels, 1 for points on the object and 0 for background points.
+
+    SAM treats -1 as padding and ignores such points, so excluded points are labelled 0.
+    """
+    return np.array([1] * len(points_include) + [0] * len(points_exclude or []))
+
+
 class PointPredictor:
     """Segmentation predictor class that supports both text and point-based prediction."""
     _instance = None
     _initialized = False
+    _lock = threading.Lock()
+    _schedulers: Dict[str, PointBatchScheduler] = {}
     DEFAULT_MODEL_TYPE = settings.DEFAULT_POINT_MODEL_TYPE  # Add point model type
     DEFAULT_BUFFER_SIZE = settings.BUFFER_DEGREES_FOR_POINT_PREDICTION
     
@@ -42,46 +98,50 @@ class PointPredictor:
         pass
 
     def setup(self, model_type=DEFAULT_MODEL_TYPE):
-        """Initialize both LangSAM and SamGeo models."""
-        logger.info("Initializing models...")
-        
-        try:            
-            # Initialize point-based model
-            logger.info(f"\n[Loading Point Model] model_type: {self.DEFAULT_MODEL_TYPE}")
-            self._sam = SamGeo(
-                model_type=model_type,
-                automatic=False,
-                sam_kwargs=None
+        """Load a SamGeo model into the model registry.
+
+        Safe to call from several threads, a model that is already loaded is kept.
+        """
+        modelRegistry.get("points", model_type)
+        self._initialized = True
+
+    def warmup(self):
+        """Run one small prediction so the first request does not pay for lazy initialization."""
+        with modelRegistry.acquire("points", self.DEFAULT_MODEL_TYPE):
+            self.scheduler_for(self.DEFAULT_MODEL_TYPE).predict(
+                image=np.zeros((256, 256, 3), dtype=np.uint8),
+                point_coords=np.array([[128, 128]]),
+                point_labels=np.array([1]),
             )
-            
-            self.transformer = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
-            self._initialized = True
-            logger.success("Models initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize models: {str(e)}")
-            raise RuntimeError(f"Failed to initialize models: {str(e)}")
+        logger.success("[Warmup] Point model warmed up")
 
     @property
     def sam(self):
-        """Get the SAM model instance, initializing with default model if needed.
+        """Get the SAM model instance of the default model type, loading it if needed.
         
         Returns:
-            LangSAM: The initialized SAM model instance.
+            SamGeo: The initialized SAM model instance.
         
         Raises:
             RuntimeError: If model initialization fails.
         """
-        if not self._initialized:
-            self.setup()  # Initialize with default model
-        return self._sam
-
-    def __del__(self):
-        """Cleanup when instance is deleted."""
-        if hasattr(self, '_sam'):
-            logger.info("Cleaning up SegmentationPredictor instance")
-            self._sam = None
-            self.transformer = None
-            PointPredictor._initialized = False
+        return modelRegistry.get("points", self.DEFAULT_MODEL_TYPE)
+
+    def scheduler_for(self, model_type: str) -> PointBatchScheduler:
+        """Micro-batching scheduler that owns all calls into the SAM predictor of a model type.
+
+        Callers keep the model loaded with modelRegistry.acquire while their request runs.
+        """
+        with self._lock:
+            if model_type not in self._schedulers:
+                self._schedulers[model_type] = PointBatchScheduler(
+                    lambda: modelRegistry.get("points", model_type).predictor,
+                    max_batch_size=settings.POINT_BATCH_MAX_SIZE,
+                    window_ms=settings.POINT_BATCH_WINDOW_MS,
+                    latency_budget_ms=settings.POINT_BATCH_LATENCY_BUDGET_MS,
+                    name=f"points-{model_type}",
+                )
+            return self._schedulers[model_type]
 
     async def make_prediction(
         self,
@@ -89,24 +149,102 @@ class PointPredictor:
         points_include: list,
         points_exclude: list = None,
         box_threshold: float = 0.3,
-        zoom_level: int = 20
+        zoom_level: int = 20,
+        model_type: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
+        min_area: Optional[float] = None,
+        coordinate_precision: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Make a prediction using points on the inference pool.
+
+        Identical requests are answered from the result cache without touching the pool.
+
+        Raises:
+            InferencePoolFull: If the inference pool has no free capacity.
+        """
+        model_type = model_type or self.DEFAULT_MODEL_TYPE
+        cache_key = None
+        if settings.RESULT_CACHE_ENABLED:
+            cache_key = resultCache.request_key("points", model_type, {
+                "points_include": points_include,
+                "points_exclude": points_exclude,
+                "zoom_level": zoom_level,
+                "snap_to_tiles": settings.SNAP_POINT_BBOX_TO_TILES,
+                "backend": settings.POINT_BACKEND,
+                "quantize": settings.POINT_BACKEND == "onnx" and settings.ONNX_QUANTIZE,
+                "simplify_tolerance": simplify_tolerance,
+                "min_area": min_area,
+                "coordinate_precision": coordinate_precision,
+            })
+            cached = resultCache.get(cache_key)
+            if cached is not None:
+                logger.info("\n[Cache] Returning cached point prediction result")
+                # box_threshold is not part of the key, echo the value of this request
+                for item in cached["json"]:
+                    item["prompt"]["box_threshold"] = box_threshold
+                return cached
+
+        result = await inferencePool.run(
+            self.run_prediction,
+            points_include=points_include,
+            points_exclude=points_exclude,
+            box_threshold=box_threshold,
+            zoom_level=zoom_level,
+            model_type=model_type,
+            simplify_tolerance=simplify_tolerance,
+            min_area=min_area,
+            coordinate_precision=coordinate_precision,
+        )
+        # Only complete results are cached, failures may be transient
+        if cache_key and resultCache.is_complete(result, 1):
+            resultCache.put(cache_key, result)
+        return result
+
+    def run_prediction(
+        self,
+        *,
+        points_include: list,
+        points_exclude: list = None,
+        box_threshold: float = 0.3,
+        zoom_level: int = 20,
+        on_tile: Optional[Callable[[int, int], None]] = None,
+        model_type: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
+        min_area: Optional[float] = None,
+        coordinate_precision: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Make a prediction using points."""
+        """Make a prediction using points. Blocks until the prediction is done.
+
+        Args:
+            box_threshold (float, optional): Accepted for compatibility and echoed in the
+                result prompt. Point prompts produce no detection boxes, so it has no effect.
+            on_tile (callable, optional): Called with (done, total) as tiles arrive
+            model_type (str, optional): One of settings.POINT_MODEL_TYPES. Defaults to
+                settings.DEFAULT_POINT_MODEL_TYPE.
+            simplify_tolerance (float, optional): Simplify polygons with this tolerance in meters
+            min_area (float, optional): Drop polygons smaller than this many square meters
+            coordinate_precision (int, optional): Round output coordinates to this many decimals
+        """
+        model_type = model_type or self.DEFAULT_MODEL_TYPE
         logger.info("\n[Point Predict] Parameters:")
         logger.info(f"- points_include: {points_include}")
         logger.info(f"- points_exclude: {points_exclude}")
         logger.info(f"- box_threshold: {box_threshold}")
         logger.info(f"- zoom_level: {zoom_level}")
+        logger.info(f"- model_type: {model_type}")
+
+        if model_type not in modelRegistry.model_types("points"):
+            return {"error": f"Unsupported model type {model_type}. Choose one of {', '.join(modelRegistry.model_types('points'))}"}
 
-        # Generate unique filenames
         request_id = str(uuid.uuid4())
-        input_image = f"satellite_{request_id}.tif"
-        output_image = f"segment_{request_id}.tif"
-        output_geojson = f"segment_{request_id}.geojson"
         
         all_points = points_include + (points_exclude or [])
         
-        bounding_box = calculate_bounding_box(all_points, self.DEFAULT_BUFFER_SIZE)
+        bounding_box = calculate_bounding_box(
+            all_points,
+            self.DEFAULT_BUFFER_SIZE,
+            zoom_level=zoom_level if settings.SNAP_POINT_BBOX_TO_TILES else None
+        )
 
         results = []
         prompt_json = None
@@ -120,33 +258,43 @@ class PointPredictor:
                 "type": "points"
             }
 
-            # Download satellite imagery
-            logger.info("\n[Download] Downloading satellite imagery...")
-            try:
-                download_satellite_image(
-                    input_image,
-                    bounding_box,
-                    zoom_level
-                )
-                logger.success("[Download] Satellite imagery downloaded successfully")
-            except Exception as e:
-                logger.error(f"[Error] Failed to download satellite imagery: {str(e)}")
-                raise
+            # Prepare the image embedding, reusing a cached one for the same area
+            cache_key = (model_type, zoom_level, tuple(round(v, 9) for v in bounding_box))
+            embedding = embeddingCache.get(cache_key)
+            if embedding is not None:
+                logger.info("\n[Embedding] Reusing cached image embedding")
+                image, transform = None, embedding["transform"]
+            else:
+                # Download satellite imagery
+                logger.info("\n[Download] Downloading satellite imagery...")
+                try:
+                    image, transform = fetch_satellite_image(bounding_box, zoom_level, on_tile=on_tile)
+                    input_image = intermediate_file_path(f"satellite_{request_id}.tif")
+                    if input_image:
+                        write_geotiff(input_image, image, transform)
+                    logger.success("[Download] Satellite imagery downloaded successfully")
+                except Exception as e:
+                    logger.error(f"[Error] Failed to download satellite imagery: {str(e)}")
+                    raise
 
             # Run point-based prediction
             logger.info("\n[Predict] Running point-based prediction...")
             try:
-                all_points = points_include + (points_exclude or [])
-                point_labels = [1] * len(points_include) + [-1] * len(points_exclude or [])
-                
-                self.sam.set_image(input_image)
-                self.sam.predict(
-                    point_coords=np.array(all_points),
-                    point_labels=np.array(point_labels),
-                    point_crs="EPSG:4326",
-                    box_threshold=box_threshold,
-                    output=output_image
-                )
+                # Requests from concurrent callers are batched through the image encoder
+                with modelRegistry.acquire("points", model_type):
+                    prediction = self.scheduler_for(model_type).predict(
+                        image=image,
+                        embedding=embedding,
+                        point_coords=lonlat_to_pixel(all_points, transform),
+                        point_labels=point_prompt_labels(points_include, points_exclude),
+                    )
+                if embedding is None:
+                    embedding = dict(prediction["embedding"], transform=transform, crs="EPSG:3857")
+                    embeddingCache.put(cache_key, embedding, embedding["nbytes"])
+                mask = prediction["mask"]
+                output_image = intermediate_file_path(f"segment_{request_id}.tif")
+                if output_image:
+                    write_geotiff(output_image, mask, embedding["transform"], embedding["crs"])
                 logger.success("[Predict] Point-based prediction completed successfully")
             except Exception as e:
                 logger.error(f"[Error] Failed to run point-based prediction: {str(e)}")
@@ -154,14 +302,22 @@ class PointPredictor:
 
             # Convert to GeoJSON and process
             try:
-                raster_to_vector(output_image, output_geojson, None)
+                geojson_content = vectorize_mask(mask, embedding["transform"])
                 logger.success("[Convert] GeoJSON converted successfully")
+                logger.info(f"[Process] Vectorized {len(geojson_content.get('features', []))} features")
+
+                output_geojson = intermediate_file_path(f"segment_{request_id}.geojson")
+                if output_geojson:
+                    with open(output_geojson, 'w') as f:
+                        json.dump(geojson_content, f)
                 
-                with open(output_geojson, 'r') as f:
-                    geojson_content = json.load(f)
-                logger.info(f"[Process] Loaded GeoJSON with {len(geojson_content.get('features', []))} features")
-                
-                transformed_geojson = transform_coordinates(geojson_content)
+                transformed_geojson = to_output_geojson(
+                    geojson_content["features"],
+                    latitude=(bounding_box[1] + bounding_box[3]) / 2,
+                    simplify_tolerance=simplify_tolerance,
+                    min_area=min_area,
+                    coordinate_precision=coordinate_precision,
+                )
                 geojson_count = len(transformed_geojson.get('features', []))
                 logger.info(f"[Process] Transformed {geojson_count} features to WGS84")
 
@@ -181,15 +337,6 @@ class PointPredictor:
             })
             
         finally:
-            # Clean up temporary files
-            logger.info("\n[Cleanup] Removing temporary files...")
-            for file in [input_image, output_image, output_geojson]:
-                if os.path.exists(file):
-                    try:
-                        os.remove(file)
-                        logger.info(f"[Cleanup] Removed: {file}")
-                    except Exception as e:
-                        logger.error(f"[Cleanup] Failed to remove {file}: {str(e)}")
             # Return results
             return {
                     "version": "1.0",
@@ -197,6 +344,123 @@ class PointPredictor:
             }    
 
 
+    async def start_session(self, *, bounding_box: list, zoom_level: int = 19, model_type: Optional[str] = None) -> Dict[str, Any]:
+        """Prepare imagery and the image embedding of an interactive session on the inference pool.
+
+        Raises:
+            InferencePoolFull: If the inference pool has no free capacity.
+        """
+        return await inferencePool.run(
+            self.create_session,
+            bounding_box=bounding_box,
+            zoom_level=zoom_level,
+            model_type=model_type,
+        )
+
+    def create_session(self, *, bounding_box: list, zoom_level: int = 19, model_type: Optional[str] = None) -> Dict[str, Any]:
+        """Download and encode the imagery of an area once, for refine_session to decode against.
+
+        Returns:
+            dict: The session description, or {"error": message} for invalid requests
+        """
+        model_type = model_type or self.DEFAULT_MODEL_TYPE
+        if model_type not in modelRegistry.model_types("points"):
+            return {"error": f"Unsupported model type {model_type}. Choose one of {', '.join(modelRegistry.model_types('points'))}"}
+        if len(bounding_box) != 4 or bounding_box[0] >= bounding_box[2] or bounding_box[1] >= bounding_box[3]:
+            return {"error": "Bounding box must be [min_lon, min_lat, max_lon, max_lat]"}
+        bounding_box = snap_bounding_box_to_tiles(bounding_box, zoom_level)
+        num_tiles = count_tiles(bounding_box, zoom_level)
+        if num_tiles > settings.SESSION_MAX_TILES:
+            return {"error": f"Session area covers {num_tiles} tiles, the limit is {settings.SESSION_MAX_TILES}. Use a smaller area or zoom level"}
+
+        cache_key = (model_type, zoom_level, tuple(round(v, 9) for v in bounding_box))
+        embedding = embeddingCache.get(cache_key)
+        if embedding is None:
+            logger.info(f"\n[Session] Downloading and encoding {num_tiles} tiles")
+            image, transform = fetch_satellite_image(bounding_box, zoom_level)
+            with modelRegistry.acquire("points", model_type):
+                prediction = self.scheduler_for(model_type).predict(image=image)
+            embedding = dict(prediction["embedding"], transform=transform, crs="EPSG:3857")
+            embeddingCache.put(cache_key, embedding, embedding["nbytes"])
+        else:
+            logger.info("\n[Session] Reusing cached image embedding")
+
+        session = {
+            "session_id": str(uuid.uuid4()),
+            "bounding_box": bounding_box,
+            "zoom_level": zoom_level,
+            "model_type": model_type,
+            "idle_timeout_seconds": settings.SESSION_IDLE_TIMEOUT_SECONDS,
+        }
+        sessionStore.put(session["session_id"], dict(session, embedding=embedding), embedding["nbytes"])
+        logger.success(f"[Session] Started session {session['session_id']}")
+        return session
+
+    async def refine_session(
+        self,
+        session_id: str,
+        *,
+        points_include: list,
+        points_exclude: list = None,
+        simplify_tolerance: Optional[float] = None,
+        min_area: Optional[float] = None,
+        coordinate_precision: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Predict a mask for new points of a session, running only the SAM mask decoder.
+
+        Decoding runs in a thread outside the inference pool and the encoder
+        queue of the batch scheduler, so clicks are not queued behind long
+        downloads or image encodes.
+
+        Returns:
+            dict: Results like run_prediction, {"error": message} for points outside
+            the session area, or None if the session does not exist or has expired
+        """
+        session = sessionStore.get(session_id)
+        if session is None:
+            return None
+        embedding = session["embedding"]
+        all_points = points_include + (points_exclude or [])
+        min_lon, min_lat, max_lon, max_lat = session["bounding_box"]
+        if not all_points or not all(min_lon <= lon <= max_lon and min_lat <= lat <= max_lat for lon, lat in all_points):
+            return {"error": "Points must lie within the session bounding box"}
+
+        def decode():
+            # Acquiring may load the model, neither that nor decoding runs on the event loop
+            with modelRegistry.acquire("points", session["model_type"]):
+                return self.scheduler_for(session["model_type"]).decode(
+                    embedding,
+                    lonlat_to_pixel(all_points, embedding["transform"]),
+                    point_prompt_labels(points_include, points_exclude),
+                )
+
+        mask = await asyncio.to_thread(decode)
+        geojson = await asyncio.to_thread(
+            lambda: to_output_geojson(
+                vectorize_mask(mask, embedding["transform"])["features"],
+                latitude=(min_lat + max_lat) / 2,
+                simplify_tolerance=simplify_tolerance,
+                min_area=min_area,
+                coordinate_precision=coordinate_precision,
+            )
+        )
+        return {
+            "version": "1.0",
+            "json": [{
+                "prompt": {
+                    "points_include": points_include,
+                    "points_exclude": points_exclude,
+                    "session_id": session_id,
+                    "type": "points"
+                },
+                "geojson": geojson
+            }]
+        }
+
+    def close_session(self, session_id: str) -> bool:
+        """Close a session and release its embedding. Returns False if it did not exist."""
+        return sessionStore.pop(session_id) is not None
+
+
 # Create singleton instance
-pointPredictor = PointPredictor()
-pointPredictor.setup()
\ No newline at end of file
+pointPredictor = PointPredictor()
\ No newline at end of file
@@ -1,14 +1,33 @@
-from samgeo import raster_to_vector
 from samgeo.text_sam import LangSAM
+from PIL import Image
+import numpy as np
 import uuid
+import threading
 import json
-from typing import Dict, Any, List
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional
+from affine import Affine
 from loguru import logger
 import sys
-import os
 from app.config import settings 
-from app.segment_geospatial.utils import transform_coordinates, download_satellite_image, count_tiles
+from app.segment_geospatial.utils import (
+    to_output_geojson,
+    bounding_box_to_pixel_window,
+    pixel_window_transform,
+    pixel_window_tile_range,
+    iter_windows,
+    fetch_pixel_window,
+    count_tiles,
+    vectorize_mask,
+    dissolve_features,
+    SeamDissolver,
+    write_geotiff,
+    intermediate_file_path,
+)
 from app.schemas.predict import PromptConfig
+from app.segment_geospatial.inference_pool import inferencePool
+from app.segment_geospatial.cache import resultCache
+from app.segment_geospatial.model_registry import modelRegistry
 
 # Configure loguru logger
 logger.remove()  # Remove default handler
@@ -25,10 +44,75 @@ logger.add(
 logger.add(sys.stderr, level="INFO")
 
 
+@contextmanager
+def shared_image_embedding(sam):
+    """Encode the image only on the first set_image call inside the block.
+
+    LangSAM.predict calls set_image on its SAM predictor for every prompt, although
+    the image does not change between prompts of the same request. Inside this
+    block the first call computes the embedding and later calls reuse it.
+
+    Args:
+        sam (LangSAM): The LangSAM model whose SAM predictor should be shared
+    """
+    predictor = sam.sam
+    original_set_image = predictor.set_image
+    encoded = False
+
+    def set_image_once(*args, **kwargs):
+        nonlocal encoded
+        if encoded:
+            logger.debug("Reusing cached image embedding")
+            return None
+        encoded = True
+        return original_set_image(*args, **kwargs)
+
+    predictor.set_image = set_image_once
+    try:
+        yield
+    finally:
+        predictor.set_image = original_set_image
+
+
+def merge_masks(masks):
+    """Merge the per-object masks predicted by LangSAM into one binary uint8 mask.
+
+    Args:
+        masks: Tensor or array of shape (N, H, W), or None when nothing was detected
+
+    Returns:
+        np.ndarray: Mask of shape (H, W) with 255 for object pixels, or None
+    """
+    if masks is None or len(masks) == 0:
+        return None
+    if hasattr(masks, "cpu"):
+        masks = masks.cpu().numpy()
+    masks = np.asarray(masks)
+    if masks.ndim == 2:
+        masks = masks[np.newaxis]
+    return (masks > 0).any(axis=0).astype(np.uint8) * 255
+
+
+def load_text_model(model_type: str) -> LangSAM:
+    """Load a LangSAM model for the model registry."""
+    logger.info(f"\n[Loading Model] model_type: {model_type}")
+    try:
+        sam = LangSAM(model_type=model_type)
+    except Exception as e:
+        logger.error(f"Failed to initialize LangSAM model: {str(e)}")
+        raise RuntimeError(f"Failed to initialize LangSAM model: {str(e)}")
+    logger.success("LangSAM model initialized successfully")
+    return sam
+
+
+modelRegistry.register("text", load_text_model, settings.TEXT_MODEL_TYPES)
+
+
 class TextPredictor:
     """Segmentation predictor class."""
     _instance = None
     _initialized = False
+    _lock = threading.Lock()
     DEFAULT_MODEL_TYPE = settings.DEFAULT_TEXT_MODEL_TYPE
     
     def __new__(cls):
@@ -42,22 +126,24 @@ class TextPredictor:
         pass
 
     def setup(self, model_type=DEFAULT_MODEL_TYPE):
-        """Initialize the LangSAM model."""
-        logger.info("Initializing LangSAM model...")
-        
-        try:
-            logger.info(f"\n[Loading Model] model_type: {model_type}")
-            self._sam = LangSAM(model_type=model_type)
-            
-            self._initialized = True
-            logger.success("LangSAM model initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize LangSAM model: {str(e)}")
-            raise RuntimeError(f"Failed to initialize LangSAM model: {str(e)}")
+        """Load a LangSAM model into the model registry.
+
+        Safe to call from several threads, a model that is already loaded is kept.
+        """
+        modelRegistry.get("text", model_type)
+        self._initialized = True
+
+    def warmup(self):
+        """Run one small prediction so the first request does not pay for lazy initialization."""
+        image = Image.fromarray(np.zeros((256, 256, 3), dtype=np.uint8))
+        with modelRegistry.acquire("text", self.DEFAULT_MODEL_TYPE) as sam, self._lock:
+            sam.predict(image, "tree", 0.3, 0.25)
+            sam.masks = None
+        logger.success("LangSAM model warmed up")
 
     @property
     def sam(self):
-        """Get the SAM model instance, initializing with default model if needed.
+        """Get the SAM model instance of the default model type, loading it if needed.
         
         Returns:
             LangSAM: The initialized SAM model instance.
@@ -65,43 +151,144 @@ class TextPredictor:
         Raises:
             RuntimeError: If model initialization fails.
         """
-        if not self._initialized:
-            self.setup()  # Initialize with default model
-        return self._sam
+        return modelRegistry.get("text", self.DEFAULT_MODEL_TYPE)
 
-
-    def __del__(self):
-        """Cleanup when instance is deleted."""
-        if hasattr(self, '_sam'):
-            logger.info("Cleaning up SegmentationPredictor instance")
-            self._sam = None
-            TextPredictor._initialized = False
-
-    def _handle_error(self, prompt: PromptConfig, error_msg: str, results: list):
+    def _handle_error(self, prompt: PromptConfig, error_msg: str) -> Dict[str, Any]:
         """Helper function to handle errors consistently.
         
         Args:
             prompt (PromptConfig): The current prompt being processed
             error_msg (str): Error message to log and return
-            results (list): List of results to append to
+
+        Returns:
+            dict: Result entry reporting the error for the prompt
         """
         logger.error(error_msg)
+        return {
+            "prompt": self._prompt_json(prompt),
+            "error": error_msg
+        }
+
+    @staticmethod
+    def _prompt_json(prompt: PromptConfig) -> Dict[str, Any]:
         prompt_json = prompt.model_dump()
         prompt_json["type"] = "text"
-        results.append({
-            "prompt": prompt_json,
-            "error": error_msg
-        })
-        return True  # Indicates should break the loop
+        return prompt_json
 
     async def make_predictions(
         self, 
         *, 
         bounding_box: list, 
         text_prompts: List[PromptConfig],     
-        zoom_level: int = 20
+        zoom_level: int = 20,
+        reuse_embedding: bool = settings.REUSE_IMAGE_EMBEDDING,
+        windowed: Optional[bool] = None,
+        model_type: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
+        min_area: Optional[float] = None,
+        coordinate_precision: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Make a prediction using SAM.
+        """Make a prediction using SAM on the inference pool.
+
+        Takes the same arguments as run_predictions.
+
+        Identical requests are answered from the result cache without touching the pool.
+
+        Raises:
+            InferencePoolFull: If the inference pool has no free capacity.
+        """
+        model_type = model_type or self.DEFAULT_MODEL_TYPE
+        cache_key = None
+        if settings.RESULT_CACHE_ENABLED:
+            cache_key = resultCache.request_key("text", model_type, {
+                "bounding_box": bounding_box,
+                "text_prompts": [prompt.model_dump() for prompt in text_prompts],
+                "zoom_level": zoom_level,
+                "windowed": windowed,
+                "simplify_tolerance": simplify_tolerance,
+                "min_area": min_area,
+                "coordinate_precision": coordinate_precision,
+            })
+            cached = resultCache.get(cache_key)
+            if cached is not None:
+                logger.info("Returning cached prediction result")
+                return cached
+
+        result = await inferencePool.run(
+            self.run_predictions,
+            bounding_box=bounding_box,
+            text_prompts=text_prompts,
+            zoom_level=zoom_level,
+            reuse_embedding=reuse_embedding,
+            windowed=windowed,
+            model_type=model_type,
+            simplify_tolerance=simplify_tolerance,
+            min_area=min_area,
+            coordinate_precision=coordinate_precision,
+        )
+        # Only complete results are cached, failures may be transient
+        if cache_key and resultCache.is_complete(result, len(text_prompts)):
+            resultCache.put(cache_key, result)
+        return result
+
+    def stream_predictions(self, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Run iter_predictions on the inference pool and yield its results as they are ready.
+
+        Takes the same arguments as iter_predictions.
+
+        Raises:
+            InferencePoolFull: If the inference pool has no free capacity.
+        """
+        return inferencePool.stream(self.iter_predictions, **kwargs)
+
+    def run_predictions(self, **kwargs) -> Dict[str, Any]:
+        """Make a prediction using SAM. Blocks until all prompts are done.
+
+        Takes the same arguments as iter_predictions.
+
+        Returns:
+            dict: {"version": "1.0", "json": [result per prompt]}, or {"error": message}
+                if the request could not be processed at all. Failures of the server,
+                such as a model that cannot be loaded, are tagged with "server": True
+        """
+        results = []
+        try:
+            for result in self.iter_predictions(**kwargs):
+                if "prompt" not in result:
+                    return result
+                results.append(result)
+        except Exception as e:
+            # Partial results would look like a success to callers and the result cache
+            logger.error(f"Prediction failed: {str(e)}")
+            return {"error": f"Prediction failed: {str(e)}", "server": True}
+        return {
+            "version": "1.0",
+            "json": results
+        }
+
+    def iter_predictions(
+        self, 
+        *, 
+        bounding_box: list, 
+        text_prompts: List[PromptConfig],     
+        zoom_level: int = 20,
+        reuse_embedding: bool = settings.REUSE_IMAGE_EMBEDDING,
+        windowed: Optional[bool] = None,
+        stream_windows: bool = False,
+        on_tile: Optional[Callable[[int, int], None]] = None,
+        model_type: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
+        min_area: Optional[float] = None,
+        coordinate_precision: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Make a prediction using SAM, yielding the result of each prompt as soon as it is done.
+
+        Areas above settings.MAX_TILES_SINGLE_PASS tiles are processed in windowed
+        mode: the area is split into overlapping chips of settings.WINDOW_CHIP_SIZE
+        pixels which are downloaded and segmented one after another. Each chip only
+        contributes the polygons of its core region. Polygons are merged across
+        core edges as the windows are processed, only those along open seams are
+        kept in pixel coordinates, so memory stays flat for large areas.
         
         Args:
             bounding_box (list): Coordinates [west, south, east, north]
@@ -109,6 +296,24 @@ class TextPredictor:
             box_threshold (float): Confidence threshold for object detection boxes (0-1)
             text_threshold (float): Confidence threshold for text-to-image matching (0-1)
             zoom_level (int, optional): Zoom level for satellite imagery. Defaults to 20.
+            reuse_embedding (bool, optional): Encode the image once and reuse the embedding
+                for every prompt. Defaults to settings.REUSE_IMAGE_EMBEDDING.
+            windowed (bool, optional): Force windowed mode on or off. By default it is
+                used for areas above settings.MAX_TILES_SINGLE_PASS tiles.
+            stream_windows (bool, optional): In windowed mode, also yield the features of
+                every window as soon as it is segmented. These are not merged across seams.
+            on_tile (callable, optional): Called with (done, total) as tiles of all windows arrive
+            model_type (str, optional): One of settings.TEXT_MODEL_TYPES. Defaults to
+                settings.DEFAULT_TEXT_MODEL_TYPE.
+            simplify_tolerance (float, optional): Simplify polygons with this tolerance in meters
+            min_area (float, optional): Drop polygons smaller than this many square meters
+            coordinate_precision (int, optional): Round output coordinates to this many decimals
+
+        Yields:
+            dict: {"prompt", "geojson"} or {"prompt", "error"} per prompt, plus
+                {"prompt", "window", "windows", "geojson"} per window if requested.
+                A single {"error"} is yielded if the request cannot be processed, with
+                "server": True if the imagery could not be downloaded.
         """
         logger.info(f"Starting prediction bbox={bounding_box}, zoom={zoom_level}")
         
@@ -116,140 +321,237 @@ class TextPredictor:
         # Validate inputs
         if len(bounding_box) != 4:
             logger.error(f"Invalid bounding box length: {len(bounding_box)}")
-            return {"error": "Bounding box must contain exactly 4 coordinates [west, south, east, north]"}
+            yield {"error": "Bounding box must contain exactly 4 coordinates [west, south, east, north]"}
+            return
         
         # Check number of tiles
         total_tiles = count_tiles(bounding_box, zoom_level)
-        if total_tiles > 300:  
+        if windowed is None:
+            windowed = total_tiles > settings.MAX_TILES_SINGLE_PASS
+        tile_limit = settings.MAX_TILES_LIMIT if windowed else settings.MAX_TILES_SINGLE_PASS
+        if total_tiles > tile_limit:  
             logger.error(f"Too many tiles requested: {total_tiles}")
-            return {"error": f"Area too large for zoom level {zoom_level}. Please reduce zoom level or area size."}
+            yield {"error": f"Area too large for zoom level {zoom_level}. Please reduce zoom level or area size."}
+            return
         else:
             logger.info(f"Number of tiles to download: {total_tiles}")
             
         if not (1 <= zoom_level <= 22):
             logger.error(f"Invalid zoom level: {zoom_level}")
-            return {"error": "Zoom level must be between 1 and 22"}
+            yield {"error": "Zoom level must be between 1 and 22"}
+            return
+
+        model_type = model_type or self.DEFAULT_MODEL_TYPE
+        if model_type not in modelRegistry.model_types("text"):
+            logger.error(f"Unsupported model type: {model_type}")
+            yield {"error": f"Unsupported model type {model_type}. Choose one of {', '.join(modelRegistry.model_types('text'))}"}
+            return
+
+        # Validate thresholds
+        for prompt in text_prompts:
+            if not (0 < prompt.box_threshold <= 1) or not (0 < prompt.text_threshold <= 1):
+                logger.error(f"Invalid threshold values: box={prompt.box_threshold}, text={prompt.text_threshold}")
+                yield {"error": "Threshold values must be between 0 and 1"}
+                return
 
-        # Generate unique filenames for this request
         request_id = str(uuid.uuid4())
         logger.info(f"Generated request ID: {request_id}")
-        input_image = f"satellite_{request_id}.tif"
-        output_image = f"segment_{request_id}.tif"
-        output_geojson = f"segment_{request_id}.geojson"
 
-        results = []
-        
-        try:
-            # Download satellite imagery
-            logger.info("Downloading satellite imagery...")
-            try:
-                download_satellite_image(
-                    input_image,
-                    bounding_box,
-                    zoom_level
-                )
-                logger.success("Satellite imagery downloaded successfully")
-            except Exception as e:
-                logger.error(f"Failed to download satellite imagery: {str(e)}", exc_info=True)
-                return {"error": f"Failed to download satellite imagery: {str(e)}"}
-
-            # Run prediction
-            logger.info("Running SAM prediction...")
-
-            for prompt in text_prompts:
-                box_threshold = prompt.box_threshold
-                text_threshold = prompt.text_threshold
-                prompt_value = prompt.value
-
-                # Validate thresholds
-                if not (0 < box_threshold <= 1) or not (0 < text_threshold <= 1):
-                    logger.error(f"Invalid threshold values: box={box_threshold}, text={text_threshold}")
-                    return {"error": "Threshold values must be between 0 and 1"}
-                try:
-                    logger.info(f"Running SAM prediction for {prompt_value}, box_threshold={box_threshold}, text_threshold={text_threshold}")
-                    self.sam.predict(
-                        input_image, 
-                        prompt_value, 
-                        box_threshold,
-                        text_threshold
-                    )
-                    logger.success(f"SAM prediction completed successfully")
+        window = bounding_box_to_pixel_window(bounding_box, zoom_level)
+        if windowed:
+            windows = list(iter_windows(window, settings.WINDOW_CHIP_SIZE, settings.WINDOW_OVERLAP))
+            logger.info(f"Processing {len(windows)} windows of up to {settings.WINDOW_CHIP_SIZE}px")
+        else:
+            windows = [(window, window)]
 
-                except Exception as e:
-                    if self._handle_error(prompt, f"Failed to run prediction for {prompt}: {str(e)}", results):
-                        break
-                
-                # Generate visualization
-                logger.info("Generating visualization...")
-                try:
-                    self.sam.show_anns(
-                        cmap="Greys_r",
-                        add_boxes=False,
-                        alpha=1,
-                        title=f"Automatic Segmentation of {prompt_value}",
-                        blend=False,
-                        output=output_image,
-                    )
-                    logger.success("Visualization generated successfully")
-                except Exception as e:
-                    if self._handle_error(prompt, f"Failed to generate visualization: {str(e)}", results):
-                        break
-            
-                # Convert to GeoJSON
-                logger.info("Converting to GeoJSON...")
+        # Report tile progress over all windows rather than per window
+        window_tiles = [
+            (x1 - x0) * (y1 - y0)
+            for x0, y0, x1, y1 in (pixel_window_tile_range(chip) for _, chip in windows)
+        ]
+        tiles_before = 0
+
+        def on_window_tile(done, _total):
+            if on_tile:
+                on_tile(tiles_before + done, sum(window_tiles))
+
+        # In windowed mode the features of each prompt are merged across seams as the
+        # windows are processed and collected in EPSG:3857. Prompts after a failure
+        # are skipped, as a failure ends the response.
+        pixel_to_mercator = pixel_window_transform((0, 0), zoom_level)
+        features = [[] for _ in text_prompts]
+        dissolvers = [SeamDissolver(window, pixel_to_mercator) for _ in text_prompts]
+        failure_index = len(text_prompts)
+        failure_message = None
+        output = {
+            "latitude": (bounding_box[1] + bounding_box[3]) / 2,
+            "simplify_tolerance": simplify_tolerance,
+            "min_area": min_area,
+            "coordinate_precision": coordinate_precision,
+        }
+
+        # Keep the model loaded while the request runs
+        with modelRegistry.acquire("text", model_type) as sam:
+            for window_index, (core, chip) in enumerate(windows):
+                # Download satellite imagery
+                logger.info("Downloading satellite imagery...")
                 try:
-                    raster_to_vector(output_image, output_geojson, None)
-                    logger.success("Converted to GeoJSON successfully")
+                    image, transform = fetch_pixel_window(chip, zoom_level, on_tile=on_window_tile)
+                    tiles_before += window_tiles[window_index]
+                    suffix = f"_{window_index}" if windowed else ""
+                    input_image = intermediate_file_path(f"satellite_{request_id}{suffix}.tif")
+                    if input_image:
+                        write_geotiff(input_image, image, transform)
+                    image = Image.fromarray(image)
+                    logger.success("Satellite imagery downloaded successfully")
                 except Exception as e:
-                    error_msg = f"Failed to convert to GeoJSON. There may be no {prompt_value} in the specified area"
-                    if self._handle_error(prompt, error_msg, results):
-                        break
-            
-                # Read GeoJSON content
-                logger.info("Reading GeoJSON content...")
-                try:
-                    with open(output_geojson, 'r') as f:
-                        geojson_content = json.load(f)
-                        
-                    if not geojson_content.get('features'):
-                        error_msg = f"No {prompt_value} found in the specified area"
-                        if self._handle_error(prompt, error_msg, results):
+                    logger.error(f"Failed to download satellite imagery: {str(e)}", exc_info=True)
+                    yield {"error": f"Failed to download satellite imagery: {str(e)}", "server": True}
+                    return
+
+                # Polygonize windows in global pixel coordinates so that edges shared
+                # by neighbouring cores are identical and can be dissolved exactly
+                core_width, core_height = core[2] - core[0], core[3] - core[1]
+                offset_x, offset_y = core[0] - chip[0], core[1] - chip[1]
+                vector_transform = Affine.translation(core[0], core[1]) if windowed else transform
+
+                # Run prediction
+                logger.info("Running SAM prediction...")
+
+                embedding_context = shared_image_embedding(sam) if reuse_embedding else nullcontext()
+                # The LangSAM model holds per-image state, so model calls are serialized.
+                # Only the model calls hold the lock, masks are vectorized and yielded after
+                # it is released, so a slow consumer does not hold up other requests.
+                masks = []
+                with self._lock, embedding_context:
+                    for index, prompt in enumerate(text_prompts[:failure_index]):
+                        box_threshold = prompt.box_threshold
+                        text_threshold = prompt.text_threshold
+                        prompt_value = prompt.value
+                        try:
+                            logger.info(f"Running SAM prediction for {prompt_value}, box_threshold={box_threshold}, text_threshold={text_threshold}")
+                            # LangSAM leaves the previous masks in place when nothing is detected
+                            sam.masks = None
+                            sam.predict(
+                                image, 
+                                prompt_value, 
+                                box_threshold,
+                                text_threshold
+                            )
+                            logger.success(f"SAM prediction completed successfully")
+
+                        except Exception as e:
+                            failure_index = index
+                            failure_message = f"Failed to run prediction for {prompt}: {str(e)}"
                             break
-                    
-                    # Transform coordinates to lat/long
-                    logger.info("Transforming coordinates to WGS84...")
-                    transformed_geojson = transform_coordinates(geojson_content)
-                    geojson_count = len(transformed_geojson.get('features', []))
-                    
-                    logger.success(f"Successfully found {geojson_count} features")
-                    prompt_json = prompt.model_dump()
-                    prompt_json["type"] = "text"
-                    results.append({
-                        "prompt": prompt_json,
-                        "geojson": transformed_geojson
-                    })
-                    
-                except Exception as e:
-                    if self._handle_error(prompt, f"Failed to process GeoJSON output: {str(e)}", results):
-                        break
-            
-        finally:
-            # Clean up temporary files
-            logger.info("Cleaning up temporary files...")
-            for file in [input_image, output_image, output_geojson]:
-                if os.path.exists(file):
-                    try:
-                        os.remove(file)
-                        logger.debug(f"Removed temporary file: {file}")
-                    except Exception as e:
-                        logger.warning(f"Failed to remove temporary file {file}: {str(e)}")
-
-            # Return results
+                        masks.append(merge_masks(sam.masks))
+
+                for index, mask in enumerate(masks):
+                    prompt = text_prompts[index]
+                    window_features = []
+                    if mask is not None:
+                        output_image = intermediate_file_path(f"segment_{request_id}_{index}{suffix}.tif")
+                        if output_image:
+                            write_geotiff(output_image, mask, transform)
+
+                        # Convert to GeoJSON
+                        logger.info("Converting to GeoJSON...")
+                        try:
+                            core_mask = mask[offset_y:offset_y + core_height, offset_x:offset_x + core_width]
+                            window_features = vectorize_mask(core_mask, vector_transform)["features"]
+                            logger.success("Converted to GeoJSON successfully")
+                        except Exception as e:
+                            failure_index = index
+                            failure_message = f"Failed to convert to GeoJSON. There may be no {prompt.value} in the specified area"
+                            break
+
+                    if not windowed:
+                        result = self._prompt_result(prompt, index, window_features, request_id, output)
+                        yield result
+                        if "error" in result:
+                            return
+                        continue
+
+                    features[index].extend(dissolvers[index].add(window_features, core))
+                    if stream_windows and window_features:
+                        yield {
+                            "prompt": self._prompt_json(prompt),
+                            "window": window_index,
+                            "windows": len(windows),
+                            "geojson": to_output_geojson(
+                                dissolve_features(window_features, pixel_to_mercator), **output
+                            ),
+                        }
+                # Release the masks of the window before the next one is downloaded
+                masks = None
+
+        if not windowed:
+            # Single pass results were yielded per prompt already
+            if failure_message:
+                yield self._handle_error(text_prompts[failure_index], failure_message)
+            return
+
+        for index, prompt in enumerate(text_prompts):
+            if index == failure_index:
+                yield self._handle_error(prompt, failure_message)
+                return
+            features[index].extend(dissolvers[index].finish())
+            result = self._prompt_result(prompt, index, features[index], request_id, output)
+            # Release the features of the prompt before the next one is processed
+            features[index] = None
+            yield result
+            if "error" in result:
+                return
+
+    def _prompt_result(
+        self,
+        prompt: PromptConfig,
+        index: int,
+        features: list,
+        request_id: str,
+        output: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the result of a prompt from its polygon features.
+
+        Args:
+            prompt (PromptConfig): The prompt the features were predicted for
+            index (int): Position of the prompt in the request
+            features (list): GeoJSON features in EPSG:3857
+            request_id (str): Request ID used for intermediate files
+            output (dict): Keyword arguments for to_output_geojson
+
+        Returns:
+            dict: {"prompt", "geojson"}, or {"prompt", "error"} if nothing was found. The
+                FeatureCollection is empty if min_area or simplification removed every feature
+        """
+        # Process GeoJSON content
+        try:
+            geojson_content = {"type": "FeatureCollection", "features": features}
+
+            output_geojson = intermediate_file_path(f"segment_{request_id}_{index}.geojson")
+            if output_geojson:
+                with open(output_geojson, 'w') as f:
+                    json.dump(geojson_content, f)
+
+            if not features:
+                return self._handle_error(prompt, f"No {prompt.value} found in the specified area")
+
+            # Simplify and transform coordinates to lat/long
+            logger.info("Transforming coordinates to WGS84...")
+            transformed_geojson = to_output_geojson(features, **output)
+            geojson_count = len(transformed_geojson.get('features', []))
+            if not geojson_count:
+                # Objects were found, the output options removed them, which is not an error
+                logger.info(f"All {len(features)} features were removed by the output options")
+            else:
+                logger.success(f"Successfully found {geojson_count} features")
             return {
-                "version": "1.0",
-                "json": results                        
+                "prompt": self._prompt_json(prompt),
+                "geojson": transformed_geojson
             }
+        
+        except Exception as e:
+            return self._handle_error(prompt, f"Failed to process GeoJSON output: {str(e)}")
 
 # Create singleton instance
-textPredictor = TextPredictor()
-textPredictor.setup()
\ No newline at end of file
+textPredictor = TextPredictor()
\ No newline at end of file
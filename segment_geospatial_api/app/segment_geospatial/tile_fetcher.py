@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+from app.config import settings
+from app.segment_geospatial.cache import TileCache, tileCache
+
+
+class TileFetchError(RuntimeError):
+    """Raised when a tile cannot be downloaded after all retries."""
+
+
+class TileFetcher:
+    """Async XYZ tile fetcher with a shared connection pool.
+
+    All downloads go through one aiohttp session whose connector bounds the
+    total and per-host number of connections, so tiles of a request are fetched
+    concurrently and connections are reused across requests. Failed tiles are
+    retried with exponential backoff. Synchronous callers such as the inference
+    workers use fetch_tiles_blocking, which runs on a background event loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_per_host: int,
+        retries: int,
+        backoff_seconds: float,
+        timeout_seconds: float,
+        cache: Optional[TileCache] = None,
+    ):
+        """
+        Args:
+            max_connections (int): Total number of open connections
+            max_per_host (int): Number of open connections per tile server
+            retries (int): Number of retries after a failed attempt
+            backoff_seconds (float): Delay before the first retry, doubled for each further retry
+            timeout_seconds (float): Timeout of a single tile request
+            cache (TileCache, optional): Cache consulted before and filled after downloads
+        """
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.cache = cache
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                headers={"User-Agent": "Mozilla/5.0 (segment-geospatial-api)"},
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def fetch(self, url: str) -> bytes:
+        """Download a single tile, retrying server errors and connection failures."""
+        session = self._get_session()
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(url) as response:
+                    if response.status == 429 or response.status >= 500:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status, message=response.reason or "",
+                        )
+                    if response.status != 200:
+                        raise TileFetchError(f"Tile request failed with HTTP {response.status}: {url}")
+                    return await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise TileFetchError(f"Failed to download tile {url}: {str(e)}") from e
+                delay = self.backoff_seconds * 2**attempt
+                logger.warning(f"Tile request failed ({str(e)}), retrying in {delay:.1f}s: {url}")
+                await asyncio.sleep(delay)
+
+    async def fetch_tiles(
+        self,
+        source: str,
+        url_template: str,
+        zoom_level: int,
+        tiles: List[Tuple[int, int]],
+        on_tile: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[Tuple[int, int], bytes]:
+        """Fetch XYZ tiles concurrently, serving them from the cache when possible.
+
+        Args:
+            source (str): Source name used in cache keys
+            url_template (str): URL template with {x}, {y} and {z} placeholders
+            zoom_level (int): Zoom level of the tiles
+            tiles (list): (x, y) tile indices to fetch
+            on_tile (callable, optional): Called with (done, total) after each tile
+
+        Returns:
+            dict: Raw tile bytes keyed by (x, y)
+        """
+        results = {}
+        missing = []
+        for x, y in tiles:
+            data = self.cache.get_tile(source, zoom_level, x, y) if self.cache else None
+            if data is None:
+                missing.append((x, y))
+            else:
+                results[(x, y)] = data
+        if on_tile and results:
+            on_tile(len(results), len(tiles))
+
+        async def fetch_one(x, y):
+            data = await self.fetch(url_template.format(x=x, y=y, z=zoom_level))
+            if self.cache:
+                self.cache.put_tile(source, zoom_level, x, y, data)
+            results[(x, y)] = data
+            if on_tile:
+                on_tile(len(results), len(tiles))
+
+        if missing:
+            logger.info(f"Downloading {len(missing)} of {len(tiles)} tiles")
+            await asyncio.gather(*(fetch_one(x, y) for x, y in missing))
+        return results
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="tile-fetcher", daemon=True).start()
+            return self._loop
+
+    def fetch_tiles_blocking(self, *args, **kwargs) -> Dict[Tuple[int, int], bytes]:
+        """Run fetch_tiles on the background event loop and wait for the result.
+
+        Must not be called from a coroutine; await fetch_tiles there instead.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.fetch_tiles(*args, **kwargs), loop).result()
+
+    async def close(self):
+        """Close the session bound to the current event loop."""
+        if self._session is not None and self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+            self._session = None
+
+    def close_blocking(self):
+        """Close the session used by fetch_tiles_blocking."""
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop).result()
+
+
+tileFetcher = TileFetcher(
+    max_connections=settings.TILE_FETCH_MAX_CONNECTIONS,
+    max_per_host=settings.TILE_FETCH_MAX_PER_HOST,
+    retries=settings.TILE_FETCH_RETRIES,
+    backoff_seconds=settings.TILE_FETCH_BACKOFF_SECONDS,
+    timeout_seconds=settings.TILE_FETCH_TIMEOUT_SECONDS,
+    cache=tileCache if settings.TILE_CACHE_ENABLED else None,
+)
@@ -1,81 +1,543 @@
+import os
 import math
 import itertools    
+from io import BytesIO
+from functools import lru_cache
 from pyproj import Transformer  
-from samgeo import tms_to_geotiff
 import numpy as np
-from typing import List
+import rasterio
+from PIL import Image
+from rasterio.features import shapes
+from rasterio.transform import from_origin
+from shapely.affinity import affine_transform
+from shapely.geometry import mapping, shape
+from shapely.ops import unary_union
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.segment_geospatial.tile_fetcher import tileFetcher
 
-def count_tiles(bounding_box, zoom_level):
-    """Count the number of tiles needed for the given bounding box and zoom level."""
-    west, south, east, north = bounding_box
+TILE_SIZE = 256
+EARTH_EQUATORIAL_RADIUS = 6378137.0
+# Tolerance for tile edges so that tile-aligned boxes do not pull in a neighbouring tile
+TILE_EDGE_TOLERANCE = 1e-6
+XYZ_TILE_SOURCES = {
+    "Satellite": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
+}
+
+
+def deg2num(lat, lon, zoom):
+    """Convert WGS84 coordinates to fractional XYZ tile coordinates."""
+    lat_r = math.radians(lat)
+    n = 2**zoom
+    xtile = (lon + 180) / 360 * n
+    ytile = (1 - math.log(math.tan(lat_r) + 1 / math.cos(lat_r)) / math.pi) / 2 * n
+    return xtile, ytile
 
-    def deg2num(lat, lon, zoom):
-        lat_r = math.radians(lat)
-        n = 2**zoom
-        xtile = (lon + 180) / 360 * n
-        ytile = (1 - math.log(math.tan(lat_r) + 1 / math.cos(lat_r)) / math.pi) / 2 * n
-        return xtile, ytile
 
-    # Convert bounding box coordinates to tile coordinates
-    x0, y0 = deg2num(south, west, zoom_level)
-    x1, y1 = deg2num(north, east, zoom_level)
+def num2deg(xtile, ytile, zoom):
+    """Convert XYZ tile coordinates to the WGS84 coordinates of the tile's north-west corner."""
+    n = 2**zoom
+    lon = xtile / n * 360 - 180
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ytile / n))))
+    return lat, lon
 
+
+def tile_bounds(bounding_box, zoom_level):
+    """Fractional tile coordinates of a bounding box.
+
+    Returns:
+        tuple: (x0, y0, x1, y1) with (x0, y0) the north-west corner
+    """
+    west, south, east, north = bounding_box
+    x0, y0 = deg2num(north, west, zoom_level)
+    x1, y1 = deg2num(south, east, zoom_level)
     x0, x1 = sorted([x0, x1])
     y0, y1 = sorted([y0, y1])
-    corners = tuple(
-        itertools.product(
-            range(math.floor(x0), math.ceil(x1)),
-            range(math.floor(y0), math.ceil(y1)),
-        )
-    )
-    total_num = len(corners)
-    return total_num
+    return x0, y0, x1, y1
+
+
+def tile_range(bounding_box, zoom_level):
+    """Integer range of the tiles covering a bounding box.
+
+    Returns:
+        tuple: (min_x, min_y, max_x, max_y) with max_x and max_y exclusive
+    """
+    x0, y0, x1, y1 = tile_bounds(bounding_box, zoom_level)
+    min_x = math.floor(x0 + TILE_EDGE_TOLERANCE)
+    min_y = math.floor(y0 + TILE_EDGE_TOLERANCE)
+    max_x = max(math.ceil(x1 - TILE_EDGE_TOLERANCE), min_x + 1)
+    max_y = max(math.ceil(y1 - TILE_EDGE_TOLERANCE), min_y + 1)
+    return min_x, min_y, max_x, max_y
+
+
+def count_tiles(bounding_box, zoom_level):
+    """Count the number of tiles needed for the given bounding box and zoom level."""
+    min_x, min_y, max_x, max_y = tile_range(bounding_box, zoom_level)
+    return (max_x - min_x) * (max_y - min_y)
+
+
+def snap_bounding_box_to_tiles(bounding_box, zoom_level):
+    """Expand a bounding box to the edges of the XYZ tiles it touches.
+
+    Boxes that touch the same tiles snap to the same coordinates, which makes
+    the result usable as a stable key for imagery and embedding caches.
+
+    Args:
+        bounding_box (list): Coordinates [west, south, east, north]
+        zoom_level (int): Zoom level of the tile grid
+
+    Returns:
+        list: Tile-aligned [west, south, east, north]
+    """
+    min_x, min_y, max_x, max_y = tile_range(bounding_box, zoom_level)
+    north, west = num2deg(min_x, min_y, zoom_level)
+    south, east = num2deg(max_x, max_y, zoom_level)
+    return [west, south, east, north]
+
+
+# Nesting depth of the position arrays for each GeoJSON geometry type
+GEOMETRY_COORDINATE_DEPTH = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+
+@lru_cache(maxsize=None)
+def _get_transformer(src_crs: str, dst_crs: str) -> Transformer:
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def web_mercator_to_lonlat(x, y):
+    """Closed-form conversion of EPSG:3857 arrays to EPSG:4326 longitude and latitude."""
+    lon = np.degrees(np.asarray(x) / EARTH_EQUATORIAL_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y) / EARTH_EQUATORIAL_RADIUS)) - np.pi / 2)
+    return lon, lat
+
+
+def _collect_positions(geometry, leaves):
+    """Append the position arrays of a geometry to ``leaves`` in traversal order."""
+    if geometry["type"] == "GeometryCollection":
+        for member in geometry.get("geometries", []):
+            _collect_positions(member, leaves)
+        return
 
+    def walk(coords, depth):
+        if depth <= 1:
+            positions = np.asarray(coords, dtype=float)
+            if positions.size == 0:
+                positions = positions.reshape(0, 2)
+            leaves.append(np.atleast_2d(positions))
+        else:
+            for part in coords:
+                walk(part, depth - 1)
 
-def transform_coordinates(geojson_data):
-    """Transform coordinates from EPSG:3857 to EPSG:4326"""
-    transformer = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+    walk(geometry["coordinates"], GEOMETRY_COORDINATE_DEPTH[geometry["type"]])
+
+
+def _rebuild_positions(geometry, leaves):
+    """Replace the coordinates of a geometry with the next arrays from ``leaves``."""
+    if geometry["type"] == "GeometryCollection":
+        for member in geometry.get("geometries", []):
+            _rebuild_positions(member, leaves)
+        return
+
+    def walk(coords, depth):
+        if depth == 0:
+            return next(leaves)[0].tolist()
+        if depth == 1:
+            return next(leaves).tolist()
+        return [walk(part, depth - 1) for part in coords]
+
+    geometry["coordinates"] = walk(geometry["coordinates"], GEOMETRY_COORDINATE_DEPTH[geometry["type"]])
+
+
+def transform_coordinates(geojson_data, src_crs="EPSG:3857", precision=None):
+    """Transform coordinates of a FeatureCollection to EPSG:4326.
+
+    All positions are gathered into one array and converted in a single
+    vectorized call, using the closed-form formula for EPSG:3857.
+
+    Args:
+        geojson_data (dict): GeoJSON FeatureCollection, modified in place
+        src_crs (str, optional): CRS of the input coordinates. Defaults to EPSG:3857.
+        precision (int, optional): Round longitudes and latitudes to this many decimals
+
+    Returns:
+        dict: The transformed FeatureCollection
+    """
     if not geojson_data or 'features' not in geojson_data:
         return geojson_data
 
-    for feature in geojson_data['features']:
-        if 'geometry' not in feature:
-            continue
+    geometries = [
+        feature['geometry'] for feature in geojson_data['features']
+        if feature.get('geometry') and (
+            feature['geometry'].get('type') in GEOMETRY_COORDINATE_DEPTH
+            or feature['geometry'].get('type') == "GeometryCollection"
+        )
+    ]
+    leaves = []
+    for geometry in geometries:
+        _collect_positions(geometry, leaves)
+    if not leaves:
+        return geojson_data
 
-        geometry = feature['geometry']
-        if geometry['type'] == 'Polygon':
-            for i, ring in enumerate(geometry['coordinates']):
-                transformed_coords = []
-                for x, y in ring:
-                    lon, lat = transformer.transform(x, y)
-                    transformed_coords.append([lon, lat])
-                geometry['coordinates'][i] = transformed_coords
-        elif geometry['type'] == 'MultiPolygon':
-            for i, polygon in enumerate(geometry['coordinates']):
-                for j, ring in enumerate(polygon):
-                    transformed_coords = []
-                    for x, y in ring:
-                        lon, lat = transformer.transform(x, y)
-                        transformed_coords.append([lon, lat])
-                    geometry['coordinates'][i][j] = transformed_coords
+    positions = np.concatenate([leaf[:, :2] for leaf in leaves])
+    if src_crs.upper() == "EPSG:3857":
+        lon, lat = web_mercator_to_lonlat(positions[:, 0], positions[:, 1])
+    else:
+        lon, lat = _get_transformer(src_crs, "EPSG:4326").transform(positions[:, 0], positions[:, 1])
+    if precision is not None:
+        lon, lat = np.round(lon, precision), np.round(lat, precision)
+
+    offset = 0
+    for leaf in leaves:
+        count = len(leaf)
+        leaf[:, 0] = lon[offset:offset + count]
+        leaf[:, 1] = lat[offset:offset + count]
+        offset += count
+
+    leaves_iter = iter(leaves)
+    for geometry in geometries:
+        _rebuild_positions(geometry, leaves_iter)
     return geojson_data
 
-def download_satellite_image(image_name, bounding_box, zoom_level):
-    tms_to_geotiff(
+def bounding_box_to_pixel_window(bounding_box, zoom_level):
+    """Global pixel window of a bounding box on the XYZ grid of a zoom level.
+
+    Returns:
+        tuple: (left, top, right, bottom) pixel offsets, right and bottom exclusive
+    """
+    x0, y0, x1, y1 = tile_bounds(bounding_box, zoom_level)
+    left = round(x0 * TILE_SIZE)
+    top = round(y0 * TILE_SIZE)
+    right = max(round(x1 * TILE_SIZE), left + 1)
+    bottom = max(round(y1 * TILE_SIZE), top + 1)
+    return left, top, right, bottom
+
+
+def pixel_window_transform(window, zoom_level):
+    """Affine transform in EPSG:3857 of the image covering a global pixel window."""
+    left, top = window[0], window[1]
+    resolution = 2 * math.pi * EARTH_EQUATORIAL_RADIUS / (2**zoom_level * TILE_SIZE)
+    origin_x = -math.pi * EARTH_EQUATORIAL_RADIUS + left * resolution
+    origin_y = math.pi * EARTH_EQUATORIAL_RADIUS - top * resolution
+    return from_origin(origin_x, origin_y, resolution, resolution)
+
+
+def iter_windows(window, chip_size, overlap):
+    """Split a pixel window into overlapping chips of at most chip_size pixels.
+
+    The core regions tile the window without gaps or overlap. Each chip extends
+    its core by up to ``overlap`` pixels on every side, so objects crossing a
+    core edge are seen with enough context by the model.
+
+    Args:
+        window (tuple): (left, top, right, bottom) pixel window
+        chip_size (int): Edge length of a chip in pixels
+        overlap (int): Context added on each side of a core, must be below chip_size / 2
+
+    Yields:
+        tuple: (core, chip) pixel windows
+    """
+    left, top, right, bottom = window
+    step = chip_size - 2 * overlap
+    if step <= 0:
+        raise ValueError("Chip size must be larger than twice the overlap")
+    for core_top in range(top, bottom, step):
+        for core_left in range(left, right, step):
+            core = (core_left, core_top, min(core_left + step, right), min(core_top + step, bottom))
+            chip = (
+                max(core[0] - overlap, left),
+                max(core[1] - overlap, top),
+                min(core[2] + overlap, right),
+                min(core[3] + overlap, bottom),
+            )
+            yield core, chip
+
+
+def pixel_window_tile_range(window):
+    """Integer range of the tiles covering a global pixel window.
+
+    Returns:
+        tuple: (min_x, min_y, max_x, max_y) with max_x and max_y exclusive
+    """
+    left, top, right, bottom = window
+    return left // TILE_SIZE, top // TILE_SIZE, -(-right // TILE_SIZE), -(-bottom // TILE_SIZE)
+
+
+def fetch_pixel_window(window, zoom_level, source="Satellite", on_tile=None):
+    """Mosaic the XYZ tiles covering a global pixel window into an EPSG:3857 image.
+
+    Only the tiles intersecting the window are downloaded, so memory use is
+    bounded by the window size rather than by the area of the request.
+
+    Args:
+        window (tuple): (left, top, right, bottom) pixel offsets, right and bottom exclusive
+        zoom_level (int): Zoom level for satellite imagery
+        source (str): Name of a source in XYZ_TILE_SOURCES or a URL template with {x}, {y} and {z}
+        on_tile (callable, optional): Called with (done, total) as tiles arrive
+
+    Returns:
+        tuple: (RGB array of shape (height, width, 3), affine transform in EPSG:3857)
+    """
+    left, top, right, bottom = window
+    tile_x0, tile_y0, tile_x1, tile_y1 = pixel_window_tile_range(window)
+    tiles = list(itertools.product(range(tile_x0, tile_x1), range(tile_y0, tile_y1)))
+    tile_data = tileFetcher.fetch_tiles_blocking(
+        source, XYZ_TILE_SOURCES.get(source, source), zoom_level, tiles, on_tile=on_tile
+    )
+
+    columns = tile_x1 - tile_x0
+    rows = tile_y1 - tile_y0
+    mosaic = np.zeros((rows * TILE_SIZE, columns * TILE_SIZE, 3), dtype=np.uint8)
+    for (x, y), data in tile_data.items():
+        tile = Image.open(BytesIO(data)).convert("RGB")
+        if tile.size != (TILE_SIZE, TILE_SIZE):
+            tile = tile.resize((TILE_SIZE, TILE_SIZE))
+        row = (y - tile_y0) * TILE_SIZE
+        col = (x - tile_x0) * TILE_SIZE
+        mosaic[row:row + TILE_SIZE, col:col + TILE_SIZE] = np.asarray(tile)
+
+    # Crop the mosaic to the requested window
+    offset_x = tile_x0 * TILE_SIZE
+    offset_y = tile_y0 * TILE_SIZE
+    image = mosaic[top - offset_y:bottom - offset_y, left - offset_x:right - offset_x]
+    return image, pixel_window_transform(window, zoom_level)
+
+
+def fetch_satellite_image(bounding_box, zoom_level, source="Satellite", on_tile=None):
+    """Mosaic XYZ tiles covering a bounding box into an EPSG:3857 image.
+
+    Args:
+        bounding_box (list): Coordinates [west, south, east, north]
+        zoom_level (int): Zoom level for satellite imagery
+        source (str): Name of a source in XYZ_TILE_SOURCES or a URL template with {x}, {y} and {z}
+        on_tile (callable, optional): Called with (done, total) as tiles arrive
+
+    Returns:
+        tuple: (RGB array of shape (height, width, 3), affine transform in EPSG:3857)
+    """
+    window = bounding_box_to_pixel_window(bounding_box, zoom_level)
+    return fetch_pixel_window(window, zoom_level, source, on_tile=on_tile)
+
+
+def lonlat_to_pixel(points, transform):
+    """Convert [lon, lat] points to [col, row] pixel coordinates of an EPSG:3857 image.
+
+    Args:
+        points (list): List of [longitude, latitude] coordinates
+        transform (Affine): Affine transform of the image
+
+    Returns:
+        np.ndarray: Array of shape (n, 2) with [col, row] pixel coordinates
+    """
+    points_array = np.asarray(points, dtype=float).reshape(-1, 2)
+    x = np.radians(points_array[:, 0]) * EARTH_EQUATORIAL_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(points_array[:, 1]) / 2)) * EARTH_EQUATORIAL_RADIUS
+    cols, rows = ~transform * (x, y)
+    return np.column_stack([cols, rows])
+
+
+def write_geotiff(image_name, image, transform, crs="EPSG:3857"):
+    """Write an (height, width, bands) array to a GeoTIFF."""
+    if image.ndim == 2:
+        image = image[:, :, np.newaxis]
+    height, width, count = image.shape
+    with rasterio.open(
         image_name,
-        bounding_box,
-        zoom_level,
-        source="Satellite",
-        overwrite=True
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=count,
+        dtype=image.dtype,
+        crs=crs,
+        transform=transform,
+    ) as dst:
+        dst.write(image.transpose((2, 0, 1)))
+
+
+def vectorize_mask(mask, transform):
+    """Polygonize the non-zero pixels of a mask in memory.
+
+    Args:
+        mask (np.ndarray): 2D mask array
+        transform (Affine): Affine transform of the mask
+
+    Returns:
+        dict: GeoJSON FeatureCollection in the CRS of the transform
+    """
+    mask = np.asarray(mask)
+    if mask.dtype not in (np.uint8, np.int16, np.uint16, np.int32, np.float32):
+        mask = mask.astype(np.uint8)
+    features = [
+        {"type": "Feature", "properties": {"value": value}, "geometry": geometry}
+        for geometry, value in shapes(mask, mask=mask != 0, transform=transform)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def dissolve_features(features, transform=None):
+    """Union polygon features that touch or overlap, such as parts split at chip seams.
+
+    Args:
+        features (list): GeoJSON polygon features
+        transform (Affine, optional): Transform applied to the merged polygons,
+            e.g. from global pixel to EPSG:3857 coordinates
+
+    Returns:
+        list: One GeoJSON feature per merged polygon
+    """
+    merged = unary_union([shape(feature["geometry"]) for feature in features])
+    return _polygon_features(getattr(merged, "geoms", [merged]), transform)
+
+
+def _polygon_features(polygons, transform=None):
+    features = []
+    for polygon in polygons:
+        if polygon.is_empty:
+            continue
+        if transform is not None:
+            polygon = affine_transform(polygon, [transform.a, transform.b, transform.d, transform.e, transform.c, transform.f])
+        features.append({"type": "Feature", "properties": {"value": 255.0}, "geometry": mapping(polygon)})
+    return features
+
+
+class SeamDissolver:
+    """Dissolve polygons across window seams while the windows are processed.
+
+    Windows must be added in the row-major order of iter_windows. Polygons are
+    kept in global pixel coordinates only while they may still touch a core
+    that has not been added, i.e. while they reach the right edge of the
+    current core or the bottom edge of the current row. Other polygons are
+    complete: they are transformed and released. Memory is thus bounded by the
+    polygons along the open seams instead of growing with the area.
+    """
+
+    def __init__(self, window, transform=None):
+        """
+        Args:
+            window (tuple): (left, top, right, bottom) pixel window split by iter_windows
+            transform (Affine, optional): Transform applied to complete polygons,
+                e.g. from global pixel to EPSG:3857 coordinates
+        """
+        self.right = window[2]
+        self.bottom = window[3]
+        self.transform = transform
+        self._open = []
+
+    def add(self, features, core):
+        """Add the polygon features of a core.
+
+        Args:
+            features (list): GeoJSON polygon features of the core in global pixel coordinates
+            core (tuple): (left, top, right, bottom) core window the features belong to
+
+        Returns:
+            list: GeoJSON features merged across seams that no later core can touch
+        """
+        geometries = self._open + [shape(feature["geometry"]) for feature in features]
+        if not geometries:
+            return []
+        merged = unary_union(geometries)
+        _, top, right, bottom = core
+        self._open, complete = [], []
+        for polygon in getattr(merged, "geoms", [merged]):
+            _, _, max_x, max_y = polygon.bounds
+            touches_next_core = right < self.right and max_x >= right and max_y >= top
+            touches_next_row = bottom < self.bottom and max_y >= bottom
+            (self._open if touches_next_core or touches_next_row else complete).append(polygon)
+        return _polygon_features(complete, self.transform)
+
+    def finish(self):
+        """Return the remaining polygons after the last core was added."""
+        remaining, self._open = self._open, []
+        return _polygon_features(remaining, self.transform)
+
+
+def simplify_features(features, tolerance=None, min_area=None, latitude=0.0):
+    """Simplify EPSG:3857 polygon features and drop small ones.
+
+    Web Mercator stretches distances by 1 / cos(latitude), so the ground
+    tolerance and area are scaled to map units at ``latitude``.
+
+    Args:
+        features (list): GeoJSON polygon features in EPSG:3857
+        tolerance (float, optional): Topology-preserving simplification tolerance in meters
+        min_area (float, optional): Drop polygons smaller than this many square meters
+        latitude (float): Latitude of the area in degrees
+
+    Returns:
+        list: The remaining features
+    """
+    if not tolerance and not min_area:
+        return features
+    scale = 1 / math.cos(math.radians(latitude))
+    simplified = []
+    for feature in features:
+        geometry = shape(feature["geometry"])
+        if min_area and geometry.area < min_area * scale**2:
+            continue
+        if tolerance:
+            geometry = geometry.simplify(tolerance * scale, preserve_topology=True)
+        if geometry.is_empty:
+            continue
+        simplified.append({"type": "Feature", "properties": feature["properties"], "geometry": mapping(geometry)})
+    return simplified
+
+
+def to_output_geojson(features, latitude, simplify_tolerance=None, min_area=None, coordinate_precision=None):
+    """Simplify EPSG:3857 features and convert them to a WGS84 FeatureCollection.
+
+    Simplifying before the reprojection reduces the vertices that have to be
+    transformed as well as the size of the response.
+
+    Args:
+        features (list): GeoJSON polygon features in EPSG:3857
+        latitude (float): Latitude of the area in degrees
+        simplify_tolerance (float, optional): Simplification tolerance in meters
+        min_area (float, optional): Minimum polygon area in square meters
+        coordinate_precision (int, optional): Decimals of the output coordinates
+
+    Returns:
+        dict: GeoJSON FeatureCollection in EPSG:4326
+    """
+    features = simplify_features(features, simplify_tolerance, min_area, latitude)
+    return transform_coordinates(
+        {"type": "FeatureCollection", "features": features},
+        precision=coordinate_precision,
     )
 
-def calculate_bounding_box(points: List[List[float]], buffer_size: float) -> List[float]:
+
+def intermediate_file_path(filename):
+    """Path for an intermediate debug file, or None unless SAVE_INTERMEDIATE_FILES is enabled."""
+    if not settings.SAVE_INTERMEDIATE_FILES:
+        return None
+    os.makedirs(settings.INTERMEDIATE_FILES_DIR, exist_ok=True)
+    return os.path.join(settings.INTERMEDIATE_FILES_DIR, filename)
+
+
+def download_satellite_image(image_name, bounding_box, zoom_level, source="Satellite"):
+    """Download satellite imagery for a bounding box to a GeoTIFF, reusing cached tiles."""
+    image, transform = fetch_satellite_image(bounding_box, zoom_level, source)
+    write_geotiff(image_name, image, transform)
+
+def calculate_bounding_box(
+    points: List[List[float]],
+    buffer_size: float,
+    zoom_level: Optional[int] = None
+) -> List[float]:
     """
     Calculate bounding box from points with buffer.
     
     Args:
         points: List of [longitude, latitude] coordinates
         buffer_size: Buffer size in degrees
+        zoom_level: If given, snap the padded box to the XYZ tile grid at this zoom
         
     Returns:
         [min_lon, min_lat, max_lon, max_lat]
@@ -86,6 +548,9 @@ def calculate_bounding_box(points: List[List[float]], buffer_size: float) -> Lis
     min_lat = points_array[:, 1].min() - buffer_size
     max_lon = points_array[:, 0].max() + buffer_size
     max_lat = points_array[:, 1].max() + buffer_size
-    
-    return [min_lon, min_lat, max_lon, max_lat]
+    bounding_box = [float(min_lon), float(min_lat), float(max_lon), float(max_lat)]
+
+    if zoom_level is not None:
+        bounding_box = snap_bounding_box_to_tiles(bounding_box, zoom_level)
+    return bounding_box
     
\ No newline at end of file
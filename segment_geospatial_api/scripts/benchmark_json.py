@@ -0,0 +1,101 @@
+"""Benchmark JSON encoding of large FeatureCollections.
+
+Builds a FeatureCollection of building-sized polygons and reports encode
+latency and throughput of the standard library encoder (as used by
+JSONResponse) and of orjson (as used by app.responses.ORJSONResponse).
+With geopandas installed it also compares the former Bing query path,
+GeoDataFrame.to_json() followed by json.loads() and a second json.dumps(),
+against iterfeatures() encoded once with orjson.
+
+Usage:
+    python scripts/benchmark_json.py --features 100000 --repeats 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.responses import dumps
+
+
+def make_feature_collection(count, vertices, seed=0):
+    """Random polygons around Dallas with ``vertices`` corners each."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([-96.9, 32.7], [-96.7, 32.9], size=(count, 2))
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    features = []
+    for index, (lon, lat) in enumerate(centers):
+        radius = rng.uniform(5e-5, 2e-4)
+        ring = np.column_stack([lon + radius * np.cos(angles), lat + radius * np.sin(angles)])
+        ring = np.vstack([ring, ring[:1]])
+        features.append({
+            "type": "Feature",
+            "properties": {"value": 255.0, "id": index},
+            "geometry": {"type": "Polygon", "coordinates": [ring.tolist()]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def measure(name, encode, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        data = encode()
+        times.append(time.perf_counter() - start)
+    seconds = statistics.median(times)
+    size = len(data)
+    print(f"{name:<44}{seconds * 1000:>10.0f} ms{size / 1024**2:>10.1f} MiB{size / 1024**2 / seconds:>10.0f} MiB/s")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--features", type=int, default=100000, help="Number of polygons")
+    parser.add_argument("--vertices", type=int, default=12, help="Corners per polygon")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per encoder, the median is reported")
+    args = parser.parse_args()
+
+    collection = make_feature_collection(args.features, args.vertices)
+    print(f"{args.features} features with {args.vertices} vertices each\n")
+    print(f"{'encoder':<44}{'latency':>13}{'size':>14}{'throughput':>16}")
+
+    baseline = measure("json.dumps (JSONResponse)", lambda: json.dumps(collection).encode(), args.repeats)
+    fast = measure("orjson (ORJSONResponse)", lambda: dumps(collection), args.repeats)
+    print(f"orjson speedup: {baseline / fast:.1f}x")
+
+    try:
+        import geopandas as gpd
+        from shapely.geometry import shape
+    except ImportError:
+        print("\ngeopandas is not installed, skipping the GeoDataFrame comparison")
+        return
+
+    gdf = gpd.GeoDataFrame(
+        [feature["properties"] for feature in collection["features"]],
+        geometry=[shape(feature["geometry"]) for feature in collection["features"]],
+        crs="EPSG:4326",
+    )
+    print()
+    baseline = measure(
+        "to_json + json.loads + json.dumps",
+        lambda: json.dumps(json.loads(gdf.to_json())).encode(),
+        args.repeats,
+    )
+    fast = measure(
+        "iterfeatures + orjson",
+        lambda: dumps({"type": "FeatureCollection", "features": list(gdf.iterfeatures(na="null"))}),
+        args.repeats,
+    )
+    print(f"GeoDataFrame path speedup: {baseline / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
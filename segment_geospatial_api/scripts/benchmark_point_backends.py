@@ -0,0 +1,108 @@
+"""Compare latency and accuracy of the point prediction backends.
+
+Runs the PyTorch SamPredictor and the ONNX Runtime backend (FP32 and INT8) on
+the same images and point prompts. For each backend it reports the median
+encoder and decoder latency and the mean IoU of its masks against the
+PyTorch masks.
+
+Usage:
+    python scripts/benchmark_point_backends.py tile1.tif tile2.png --model-type vit_b --threads 1 4 0
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.batching import decode_points, encode_images
+from app.segment_geospatial.onnx_backend import OnnxSamGeo
+
+
+def read_rgb(path):
+    with rasterio.open(path) as src:
+        image = src.read([1, 2, 3])
+    return np.ascontiguousarray(np.transpose(image, (1, 2, 0))).astype(np.uint8)
+
+
+def sample_points(image, count, rng):
+    """Random foreground clicks away from the image border."""
+    height, width = image.shape[:2]
+    return [
+        (np.array([[rng.integers(width // 8, width - width // 8), rng.integers(height // 8, height - height // 8)]]),
+         np.array([1]))
+        for _ in range(count)
+    ]
+
+
+def run_backend(predictor, images, prompts, repeats):
+    encode_times, decode_times, masks = [], [], []
+    for image, image_prompts in zip(images, prompts):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            embedding = encode_images(predictor, [image])[0]
+            encode_times.append(time.perf_counter() - start)
+        for point_coords, point_labels in image_prompts:
+            start = time.perf_counter()
+            mask = decode_points(predictor, embedding, point_coords, point_labels)
+            decode_times.append(time.perf_counter() - start)
+            masks.append(mask > 0)
+    return statistics.median(encode_times), statistics.median(decode_times), masks
+
+
+def mean_iou(masks, reference):
+    scores = []
+    for mask, ref in zip(masks, reference):
+        union = np.logical_or(mask, ref).sum()
+        scores.append(np.logical_and(mask, ref).sum() / union if union else 1.0)
+    return float(np.mean(scores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+", help="RGB images readable by rasterio, e.g. GeoTIFF or PNG")
+    parser.add_argument("--model-type", default="vit_b", choices=["vit_b", "vit_l", "vit_h"])
+    parser.add_argument("--points", type=int, default=5, help="Point prompts per image")
+    parser.add_argument("--repeats", type=int, default=3, help="Encoder runs per image")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="ONNX intra-op thread counts, 0 for the default")
+    parser.add_argument("--model-dir", default=None, help="Directory for the exported models, a temporary one by default")
+    args = parser.parse_args()
+
+    from samgeo import SamGeo
+
+    rng = np.random.default_rng(0)
+    images = [read_rgb(path) for path in args.images]
+    prompts = [sample_points(image, args.points, rng) for image in images]
+    model_dir = args.model_dir or tempfile.mkdtemp(prefix="sam-onnx-")
+
+    sam = SamGeo(model_type=args.model_type, automatic=False, sam_kwargs=None)
+    torch_encode, torch_decode, reference = run_backend(sam.predictor, images, prompts, args.repeats)
+
+    rows = [("torch fp32", "-", torch_encode, torch_decode, 1.0)]
+    for quantize in (False, True):
+        for threads in args.threads:
+            model = OnnxSamGeo.from_sam(
+                lambda: sam.predictor.model, model_dir, args.model_type,
+                quantize=quantize, intra_op_threads=threads,
+            )
+            encode, decode, masks = run_backend(model.predictor, images, prompts, args.repeats)
+            rows.append(("onnx int8" if quantize else "onnx fp32", threads or "auto", encode, decode, mean_iou(masks, reference)))
+
+    print(f"\n{args.model_type} on {len(images)} image(s), {args.points} point prompt(s) each")
+    print(f"{'backend':<12}{'threads':>8}{'encode ms':>12}{'decode ms':>12}{'speedup':>10}{'IoU':>8}")
+    for name, threads, encode, decode, iou in rows:
+        print(
+            f"{name:<12}{threads:>8}{encode * 1000:>12.1f}{decode * 1000:>12.1f}"
+            f"{torch_encode / encode:>9.2f}x{iou:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import sys
+import types
+
+# samgeo pulls in GroundingDINO and model downloads. Where it is not installed the
+# predictors are imported against stand-ins, and tests replace the models they load.
+try:
+    import samgeo.text_sam  # noqa: F401
+except ImportError:
+    def _not_installed(*args, **kwargs):
+        raise ImportError("samgeo is not installed")
+
+    samgeo = types.ModuleType("samgeo")
+    samgeo.SamGeo = _not_installed
+    text_sam = types.ModuleType("samgeo.text_sam")
+    text_sam.LangSAM = _not_installed
+    samgeo.text_sam = text_sam
+    sys.modules["samgeo"] = samgeo
+    sys.modules["samgeo.text_sam"] = text_sam
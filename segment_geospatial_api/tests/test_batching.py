@@ -0,0 +1,154 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import torch
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.batching import PointBatchScheduler, decode_points, encode_images
+
+encoded_batches = []
+
+
+def fake_encode_images(predictor, images):
+    encoded_batches.append(len(images))
+    return [{"features": image.mean(), "nbytes": 4} for image in images]
+
+
+def fake_decode_points(predictor, embedding, point_coords, point_labels):
+    return np.full((2, 2), embedding["features"], dtype=np.uint8)
+
+
+@patch("app.segment_geospatial.batching.decode_points", fake_decode_points)
+@patch("app.segment_geospatial.batching.encode_images", fake_encode_images)
+def test_concurrent_requests_share_one_encoder_pass():
+    encoded_batches.clear()
+    scheduler = PointBatchScheduler(lambda: None, max_batch_size=4, window_ms=200, latency_budget_ms=10000)
+
+    def predict(value):
+        return scheduler.predict(
+            image=np.full((2, 2, 3), value, dtype=np.uint8),
+            point_coords=np.array([[0, 0]]),
+            point_labels=np.array([1]),
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(predict, [1, 2, 3, 4]))
+
+    assert encoded_batches == [4]
+    assert [int(result["mask"][0, 0]) for result in results] == [1, 2, 3, 4]
+
+
+@patch("app.segment_geospatial.batching.decode_points", fake_decode_points)
+@patch("app.segment_geospatial.batching.encode_images", fake_encode_images)
+def test_cached_embedding_skips_the_encoder():
+    encoded_batches.clear()
+    scheduler = PointBatchScheduler(lambda: None, max_batch_size=4, window_ms=0, latency_budget_ms=10000)
+
+    result = scheduler.predict(
+        embedding={"features": 7, "nbytes": 4},
+        point_coords=np.array([[0, 0]]),
+        point_labels=np.array([1]),
+    )
+    assert encoded_batches == []
+    assert int(result["mask"][0, 0]) == 7
+
+
+@patch("app.segment_geospatial.batching.decode_points", fake_decode_points)
+@patch("app.segment_geospatial.batching.encode_images", fake_encode_images)
+def test_request_without_points_only_encodes():
+    encoded_batches.clear()
+    scheduler = PointBatchScheduler(lambda: None, max_batch_size=4, window_ms=0, latency_budget_ms=10000)
+
+    result = scheduler.predict(image=np.full((2, 2, 3), 5, dtype=np.uint8))
+    assert encoded_batches == [1]
+    assert result["mask"] is None
+    assert result["embedding"]["features"] == 5
+
+
+@patch("app.segment_geospatial.batching.decode_points", fake_decode_points)
+def test_decoding_does_not_wait_for_a_running_encode():
+    encoding = threading.Event()
+    release = threading.Event()
+
+    def slow_encode_images(predictor, images):
+        encoding.set()
+        release.wait(5)
+        return fake_encode_images(predictor, images)
+
+    scheduler = PointBatchScheduler(lambda: None, max_batch_size=4, window_ms=0, latency_budget_ms=10000)
+    with patch("app.segment_geospatial.batching.encode_images", slow_encode_images):
+        pending = scheduler.submit(
+            image=np.full((2, 2, 3), 3, dtype=np.uint8),
+            point_coords=np.array([[0, 0]]),
+            point_labels=np.array([1]),
+        )
+        assert encoding.wait(5)
+        try:
+            result = scheduler.predict(
+                embedding={"features": 7, "nbytes": 4},
+                point_coords=np.array([[0, 0]]),
+                point_labels=np.array([1]),
+            )
+            assert int(result["mask"][0, 0]) == 7
+            assert not pending.done()
+        finally:
+            release.set()
+        assert int(pending.result(5)["mask"][0, 0]) == 3
+
+
+def test_batch_limit_counts_queue_wait():
+    scheduler = PointBatchScheduler(lambda: None, max_batch_size=8, window_ms=0, latency_budget_ms=1000)
+    scheduler._seconds_per_image = 0.1
+
+    assert scheduler._batch_limit(waited=0, remaining_window=0) == 8
+    assert scheduler._batch_limit(waited=0.5, remaining_window=0.1) == 4
+    # A request that already used up the budget is still processed, on its own
+    assert scheduler._batch_limit(waited=2, remaining_window=0) == 1
+
+
+@pytest.fixture(scope="module")
+def sam_predictor():
+    pytest.importorskip("segment_anything")
+    from segment_anything import SamPredictor
+    from segment_anything.build_sam import _build_sam
+
+    # Same architecture as vit_b, shrunk so that the test runs in seconds
+    torch.manual_seed(0)
+    sam = _build_sam(
+        encoder_embed_dim=64,
+        encoder_depth=2,
+        encoder_num_heads=2,
+        encoder_global_attn_indexes=[1],
+    ).eval()
+    return SamPredictor(sam)
+
+
+def test_batched_encoding_matches_the_single_image_path(sam_predictor):
+    rng = np.random.default_rng(0)
+    images = [
+        rng.integers(0, 255, (300, 400, 3), dtype=np.uint8),
+        rng.integers(0, 255, (200, 400, 3), dtype=np.uint8),
+    ]
+    points, labels = np.array([[150, 100], [20, 30]]), np.array([1, 0])
+
+    embeddings = encode_images(sam_predictor, images)
+
+    for image, embedding in zip(images, embeddings):
+        sam_predictor.set_image(image)
+        assert embedding["original_size"] == sam_predictor.original_size
+        assert embedding["input_size"] == sam_predictor.input_size
+        assert torch.allclose(embedding["features"], sam_predictor.features, atol=1e-4)
+
+        masks, scores, _ = sam_predictor.predict(point_coords=points, point_labels=labels, multimask_output=True)
+        expected = masks[np.argmax(scores)]
+        mask = decode_points(sam_predictor, embedding, points, labels) > 0
+        assert mask.shape == image.shape[:2]
+        assert np.logical_and(mask, expected).sum() / max(np.logical_or(mask, expected).sum(), 1) > 0.99
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.cache import DiskLRUCache, TileCache, LRUCache, ResultCache
+
+
+def test_disk_cache_hit_and_miss(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1024)
+    assert cache.get("a") is None
+    cache.put("a", b"tile")
+    assert cache.get("a") == b"tile"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 4
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")  # "b" becomes the least recently used entry
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.stats()["evictions"] == 1
+    assert not os.path.exists(os.path.join(str(tmp_path), "b"))
+
+
+def test_tile_cache_persists_across_instances(tmp_path):
+    cache = TileCache(str(tmp_path), max_bytes=1024)
+    cache.put_tile("Satellite", 20, 1, 2, b"png")
+
+    reloaded = TileCache(str(tmp_path), max_bytes=1024)
+    assert reloaded.get_tile("Satellite", 20, 1, 2) == b"png"
+    assert reloaded.get_tile("Satellite", 20, 2, 1) is None
+
+
+def test_memory_cache_respects_byte_budget():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", "embedding-a", 60)
+    cache.put("b", "embedding-b", 60)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "embedding-b"
+    assert cache.stats()["bytes"] == 60
+
+
+def test_memory_cache_expires_idle_entries():
+    cache = LRUCache(max_bytes=100, ttl_seconds=0.05)
+    cache.put("a", "embedding-a", 10)
+    assert cache.get("a") == "embedding-a"
+
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_key_ignores_key_order_and_number_formatting():
+    first = ResultCache.request_key("text", "sam", {"zoom_level": 20, "bounding_box": [-96.8104, 32.9714]})
+    second = ResultCache.request_key("text", "sam", {"bounding_box": [-96.81040, 32.97140], "zoom_level": 20})
+    assert first == second
+    assert first != ResultCache.request_key("text", "other", {"zoom_level": 20, "bounding_box": [-96.8104, 32.9714]})
+
+
+def test_result_cache_backends_return_independent_copies(tmp_path):
+    for backend in ("memory", "disk"):
+        cache = ResultCache(backend, max_bytes=1024 * 1024, ttl_seconds=60, cache_dir=str(tmp_path / backend))
+        result = {"version": "1.0", "json": [{"geojson": {"features": []}}]}
+        cache.put("abc", result)
+        cached = cache.get("abc")
+        assert cached == result
+        cached["json"].clear()
+        assert cache.get("abc") == result
+
+
+def test_result_cache_expires_old_results(tmp_path):
+    cache = ResultCache("disk", max_bytes=1024 * 1024, ttl_seconds=0.05, cache_dir=str(tmp_path))
+    cache.put("abc", {"json": []})
+    assert cache.get("abc") == {"json": []}
+    time.sleep(0.1)
+    assert cache.get("abc") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_result_cache_only_accepts_complete_results():
+    item = {"prompt": {"value": "tree"}, "geojson": {"type": "FeatureCollection", "features": []}}
+    assert ResultCache.is_complete({"version": "1.0", "json": [item, item]}, 2)
+    # A failure that cut the request short leaves fewer items than prompts
+    assert not ResultCache.is_complete({"version": "1.0", "json": []}, 2)
+    assert not ResultCache.is_complete({"version": "1.0", "json": [item]}, 2)
+    assert not ResultCache.is_complete({"version": "1.0", "json": [item, {"prompt": {}, "error": "failed"}]}, 2)
+    assert not ResultCache.is_complete({"error": "Prediction failed: out of memory"}, 2)
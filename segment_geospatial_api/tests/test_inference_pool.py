@@ -0,0 +1,117 @@
+import os
+import sys
+import asyncio
+import threading
+
+import pytest
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.inference_pool import InferencePool, InferencePoolFull
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_off_the_event_loop():
+    pool = InferencePool(max_workers=1, max_queue=0)
+    loop_thread = threading.get_ident()
+
+    result = await pool.run(threading.get_ident)
+    assert result != loop_thread
+    assert pool.stats()["submitted"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_rejects_requests_beyond_capacity():
+    pool = InferencePool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(InferencePoolFull):
+        await pool.run(release.wait, 5)
+
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+
+
+@pytest.mark.asyncio
+async def test_call_waits_for_capacity_instead_of_rejecting():
+    pool = InferencePool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(pool.run(release.wait, 5))
+    await asyncio.sleep(0.05)
+    waiting = asyncio.ensure_future(asyncio.to_thread(pool.call, lambda: "done"))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    release.set()
+    assert await running is True
+    assert await waiting == "done"
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_items_while_generator_runs():
+    pool = InferencePool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    def produce():
+        yield 1
+        release.wait(5)
+        yield 2
+
+    items = pool.stream(produce)
+    assert await items.__anext__() == 1
+    release.set()
+    assert [item async for item in items] == [2]
+    await asyncio.sleep(0.05)
+    assert pool.stats()["submitted"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_raises_generator_errors():
+    pool = InferencePool(max_workers=1, max_queue=0)
+
+    def produce():
+        yield 1
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        [item async for item in pool.stream(produce)]
+
+
+@pytest.mark.asyncio
+async def test_stream_pauses_the_generator_for_a_slow_consumer():
+    pool = InferencePool(max_workers=1, max_queue=0, stream_buffer=2)
+    produced = []
+
+    def produce():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    items = pool.stream(produce)
+    assert await items.__anext__() == 0
+    await asyncio.sleep(0.1)
+    # One item was consumed, two are buffered and the generator waits with the next one
+    assert len(produced) <= 4
+
+    assert [item async for item in items] == list(range(1, 10))
+
+
+@pytest.mark.asyncio
+async def test_stream_releases_the_worker_when_the_consumer_stops():
+    pool = InferencePool(max_workers=1, max_queue=0, stream_buffer=1)
+
+    def produce():
+        for i in range(10):
+            yield i
+
+    items = pool.stream(produce)
+    assert await items.__anext__() == 0
+    await asyncio.sleep(0.05)
+    await items.aclose()
+    await asyncio.sleep(0.1)
+    assert pool.stats()["submitted"] == 0
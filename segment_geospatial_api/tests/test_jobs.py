@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.inference_pool import InferencePool
+from app.segment_geospatial.jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JobManager,
+    JobQueueFull,
+    JobStore,
+)
+
+
+def wait_for_status(manager, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach {status}: {manager.get(job_id)}")
+
+
+def test_job_runs_in_background_and_records_result(tmp_path):
+    manager = JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), workers=1, max_queue=10)
+
+    def runner(request, report):
+        report(tiles_done=4, tiles_total=4, prompts_done=1, prompts_total=1)
+        return [{"value": request["value"] * 2}]
+
+    manager.register("double", runner)
+    job = manager.submit("double", {"value": 21})
+    assert job["status"] in (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED)
+
+    job = wait_for_status(manager, job["job_id"], JOB_SUCCEEDED)
+    assert job["result"] == [{"value": 42}]
+    assert job["progress"] == {"tiles_done": 4, "tiles_total": 4, "prompts_done": 1, "prompts_total": 1}
+
+
+def test_failed_job_records_error(tmp_path):
+    manager = JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), workers=1, max_queue=10)
+
+    def runner(request, report):
+        raise ValueError("no imagery")
+
+    manager.register("broken", runner)
+    job = wait_for_status(manager, manager.submit("broken", {})["job_id"], JOB_FAILED)
+    assert job["error"] == "no imagery"
+
+
+def test_jobs_share_the_inference_pool(tmp_path):
+    pool = InferencePool(max_workers=1, max_queue=0)
+    manager = JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), workers=2, max_queue=10, pool=pool)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def runner(request, report):
+        with lock:
+            running.append(request["value"])
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(request["value"])
+        return threading.current_thread().name
+
+    manager.register("sleep", runner)
+    job_ids = [manager.submit("sleep", {"value": value})["job_id"] for value in range(2)]
+    jobs = [wait_for_status(manager, job_id, JOB_SUCCEEDED) for job_id in job_ids]
+
+    # Two job workers, but the pool runs one job at a time
+    assert max(peak) == 1
+    assert all(job["result"].startswith("inference") for job in jobs)
+
+
+def test_queue_limit_rejects_new_jobs(tmp_path):
+    manager = JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), workers=1, max_queue=1)
+    release = threading.Event()
+    manager.register("wait", lambda request, report: release.wait(5))
+
+    first = manager.submit("wait", {})
+    wait_for_status(manager, first["job_id"], JOB_RUNNING)
+    manager.submit("wait", {})
+    with pytest.raises(JobQueueFull):
+        manager.submit("wait", {})
+    release.set()
+
+
+def test_restart_resumes_queued_and_fails_interrupted_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    interrupted = store.create("echo", {"value": 1})
+    store.update(interrupted["job_id"], status=JOB_RUNNING)
+    queued = store.create("echo", {"value": 2})
+
+    manager = JobManager(JobStore(store.path), workers=1, max_queue=10)
+    manager.register("echo", lambda request, report: request["value"])
+    manager.start()
+
+    assert wait_for_status(manager, queued["job_id"], JOB_SUCCEEDED)["result"] == 2
+    assert manager.get(interrupted["job_id"])["status"] == JOB_FAILED
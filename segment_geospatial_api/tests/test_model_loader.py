@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.model_loader import ModelLoader
+
+
+class FakePredictor:
+    def __init__(self, release=None, fail=False):
+        self.release = release
+        self.fail = fail
+        self._initialized = False
+        self.warmed_up = False
+        self.loading_threads = set()
+
+    def setup(self):
+        self.loading_threads.add(threading.get_ident())
+        if self.release:
+            self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("weights missing")
+        self._initialized = True
+
+    def warmup(self):
+        self.warmed_up = True
+
+
+def test_background_loading_reports_each_model_when_ready():
+    release = threading.Event()
+    slow, fast = FakePredictor(release), FakePredictor()
+    loader = ModelLoader({"text": slow, "points": fast})
+
+    loader.start("background", warmup=True)
+    loader._threads["points"].join(5)
+    assert loader.status() == {"text": "loading", "points": "ready"}
+    assert not loader.ready
+
+    release.set()
+    loader.wait(5)
+    assert loader.ready
+    assert slow.warmed_up and fast.warmed_up
+    assert slow.loading_threads != fast.loading_threads
+
+
+def test_failed_model_is_not_ready():
+    loader = ModelLoader({"text": FakePredictor(fail=True)})
+    loader.start("eager")
+    assert loader.status() == {"text": "failed"}
+    assert not loader.ready
+
+
+def test_lazy_mode_is_ready_without_loading():
+    predictor = FakePredictor()
+    loader = ModelLoader({"text": predictor})
+    loader.start("lazy")
+    assert loader.ready
+    assert loader.status() == {"text": "pending"}
+    predictor.setup()
+    assert loader.status() == {"text": "ready"}
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ModelLoader({}).start("sometimes")
@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.model_registry import ModelRegistry, estimate_model_bytes
+
+SIZES = {"vit_b": 100, "vit_l": 300, "vit_h": 600}
+
+
+def fake_model(model_type):
+    # float32 parameters, wrapped like SamGeo wraps its network
+    return SimpleNamespace(predictor=SimpleNamespace(model=torch.nn.Linear(SIZES[model_type], 1, bias=False)))
+
+
+def make_registry(max_bytes, factory=fake_model):
+    registry = ModelRegistry(max_bytes)
+    registry.register("points", factory, SIZES)
+    return registry
+
+
+def test_estimate_counts_wrapped_parameters_once():
+    model = fake_model("vit_b")
+    model.sam = model.predictor.model
+    assert estimate_model_bytes(model) == 100 * 4
+
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    registry = make_registry(max_bytes=(100 + 300) * 4)
+    registry.get("points", "vit_b")
+    registry.get("points", "vit_l")
+    registry.get("points", "vit_b")
+    registry.get("points", "vit_h")
+
+    assert not registry.is_loaded("points", "vit_l")
+    assert registry.stats()["evictions"] == 2
+    assert registry.stats()["loaded"] == ["points:vit_h"]
+
+
+def test_models_in_use_are_not_evicted():
+    registry = make_registry(max_bytes=300 * 4)
+    with registry.acquire("points", "vit_l") as model:
+        registry.get("points", "vit_b")
+        assert registry.is_loaded("points", "vit_l")
+        assert model.predictor.model.in_features == 300
+    assert registry.is_loaded("points", "vit_l")
+    assert not registry.is_loaded("points", "vit_b")
+
+
+def test_concurrent_requests_load_a_model_once():
+    loads = []
+
+    def slow_factory(model_type):
+        loads.append(model_type)
+        time.sleep(0.05)
+        return fake_model(model_type)
+
+    registry = make_registry(max_bytes=10**6, factory=slow_factory)
+    threads = [threading.Thread(target=registry.get, args=("points", "vit_b")) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["vit_b"]
+
+
+def test_unsupported_model_type_is_rejected():
+    with pytest.raises(ValueError):
+        make_registry(max_bytes=10**6).get("points", "vit_xl")
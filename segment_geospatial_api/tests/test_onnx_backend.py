@@ -0,0 +1,74 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("segment_anything")
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from segment_anything import SamPredictor
+from segment_anything.build_sam import _build_sam
+
+from app.segment_geospatial.batching import decode_points, encode_images
+from app.segment_geospatial.model_registry import estimate_model_bytes
+from app.segment_geospatial.onnx_backend import OnnxSamGeo
+
+
+@pytest.fixture(scope="module")
+def tiny_sam():
+    # Same architecture as vit_b, shrunk so that the export takes seconds
+    torch.manual_seed(0)
+    return _build_sam(
+        encoder_embed_dim=64,
+        encoder_depth=2,
+        encoder_num_heads=2,
+        encoder_global_attn_indexes=[1],
+    ).eval()
+
+
+@pytest.fixture(scope="module")
+def image():
+    rng = np.random.default_rng(0)
+    image = np.zeros((300, 400, 3), dtype=np.uint8)
+    image[80:220, 120:300] = 200
+    return np.clip(image + rng.integers(0, 40, image.shape), 0, 255).astype(np.uint8)
+
+
+def iou(a, b):
+    return np.logical_and(a, b).sum() / max(np.logical_or(a, b).sum(), 1)
+
+
+def test_onnx_predictor_matches_torch(tiny_sam, image, tmp_path):
+    model = OnnxSamGeo.from_sam(lambda: tiny_sam, str(tmp_path), "tiny", quantize=False, intra_op_threads=1)
+    points, labels = np.array([[200, 150], [50, 50]]), np.array([1, 0])
+
+    torch_predictor = SamPredictor(tiny_sam)
+    torch_mask = decode_points(torch_predictor, encode_images(torch_predictor, [image])[0], points, labels)
+    onnx_mask = decode_points(model.predictor, encode_images(model.predictor, [image])[0], points, labels)
+
+    assert onnx_mask.shape == torch_mask.shape == image.shape[:2]
+    assert iou(onnx_mask > 0, torch_mask > 0) > 0.99
+
+
+def test_quantized_model_is_smaller_and_reported_to_the_registry(tiny_sam, image, tmp_path):
+    full = OnnxSamGeo.from_sam(lambda: tiny_sam, str(tmp_path), "tiny", quantize=False)
+    quantized = OnnxSamGeo.from_sam(lambda: tiny_sam, str(tmp_path), "tiny", quantize=True)
+
+    assert quantized.nbytes < full.nbytes
+    assert estimate_model_bytes(quantized) == quantized.nbytes
+
+    embeddings = encode_images(quantized.predictor, [image, image[:200]])
+    assert [e["original_size"] for e in embeddings] == [(300, 400), (200, 400)]
+    mask = decode_points(quantized.predictor, embeddings[0], np.array([[200, 150]]), np.array([1]))
+    assert mask.shape == (300, 400)
+
+
+def test_existing_export_is_reused(tiny_sam, tmp_path):
+    OnnxSamGeo.from_sam(lambda: tiny_sam, str(tmp_path), "tiny", quantize=False)
+    OnnxSamGeo.from_sam(lambda: pytest.fail("model was exported twice"), str(tmp_path), "tiny", quantize=False)
@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import types
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.config import settings
+from app.main import app
+from app.segment_geospatial import point_predict, utils
+from app.segment_geospatial.cache import embeddingCache, resultCache
+from app.segment_geospatial.model_registry import ModelRegistry
+
+client = TestClient(app)
+
+POINT = [-96.8102, 32.9716]
+SESSION_BOX = [-96.8106, 32.9712, -96.8098, 32.9720]
+
+
+def fake_fetch_pixel_window(window, zoom_level, source="Satellite", on_tile=None):
+    """Imagery of a bright square on a dark background, laid out in global pixel coordinates."""
+    left, top, right, bottom = window
+    rows, columns = np.mgrid[top:bottom, left:right]
+    image = np.full((bottom - top, right - left, 3), 30, dtype=np.uint8)
+    image[((columns // 64) % 2 == 0) & ((rows // 64) % 2 == 0)] = 220
+    return image, utils.pixel_window_transform(window, zoom_level)
+
+
+@pytest.fixture(scope="module")
+def tiny_samgeo():
+    pytest.importorskip("segment_anything")
+    import torch
+    from segment_anything import SamPredictor
+    from segment_anything.build_sam import _build_sam
+
+    # Same architecture as vit_b, shrunk so that the test runs in seconds
+    torch.manual_seed(0)
+    sam = _build_sam(
+        encoder_embed_dim=64,
+        encoder_depth=2,
+        encoder_num_heads=2,
+        encoder_global_attn_indexes=[1],
+    ).eval()
+    # Stands in for SamGeo, the point predictor only uses its SamPredictor
+    return types.SimpleNamespace(predictor=SamPredictor(sam))
+
+
+@pytest.fixture
+def point_model(tiny_samgeo, monkeypatch):
+    registry = ModelRegistry(max_bytes=1024**3)
+    registry.register("points", lambda model_type: tiny_samgeo, settings.POINT_MODEL_TYPES)
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "POINT_BACKEND", "torch")
+    embeddingCache.clear()
+    with patch.object(point_predict, "modelRegistry", registry), \
+            patch.object(utils, "fetch_pixel_window", fake_fetch_pixel_window):
+        yield tiny_samgeo
+
+
+def test_point_prediction_returns_a_feature_collection(point_model):
+    response = client.post("/api/v1/predict/points", json={"points_include": [POINT], "zoom_level": 17})
+    assert response.status_code == 200
+    [item] = response.json()
+    assert item["prompt"]["type"] == "points"
+    assert item["geojson"]["type"] == "FeatureCollection"
+    assert item["geojson"]["features"]
+
+
+def test_model_type_is_validated(point_model):
+    response = client.post(
+        "/api/v1/predict/points", json={"points_include": [POINT], "zoom_level": 17, "model_type": "vit_l"}
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/v1/predict/points", json={"points_include": [POINT], "zoom_level": 17, "model_type": "unknown"}
+    )
+    assert response.status_code == 400
+    assert "Unsupported model type unknown" in response.json()["error"]["message"]
+
+
+def test_model_load_failure_is_a_server_error(point_model):
+    registry = ModelRegistry(max_bytes=1024**3)
+
+    def unavailable(model_type):
+        raise RuntimeError("Failed to initialize models: out of memory")
+
+    registry.register("points", unavailable, settings.POINT_MODEL_TYPES)
+    with patch.object(point_predict, "modelRegistry", registry):
+        response = client.post("/api/v1/sessions", json={"bounding_box": SESSION_BOX, "zoom_level": 17})
+    assert response.status_code == 500
+
+
+def test_session_create_refine_and_delete(point_model):
+    response = client.post("/api/v1/sessions", json={"bounding_box": SESSION_BOX, "zoom_level": 17})
+    assert response.status_code == 201
+    session = response.json()
+    assert session["model_type"] == settings.DEFAULT_POINT_MODEL_TYPE
+
+    # Refining only runs the mask decoder against the embedding of the session
+    with patch("app.segment_geospatial.batching.encode_images", side_effect=AssertionError("encoded again")):
+        response = client.post(
+            f"/api/v1/sessions/{session['session_id']}/points",
+            json={"points_include": [POINT], "points_exclude": [[-96.8104, 32.9714]]},
+        )
+    assert response.status_code == 200
+    [item] = response.json()
+    assert item["prompt"]["session_id"] == session["session_id"]
+    assert item["geojson"]["features"]
+
+    assert client.delete(f"/api/v1/sessions/{session['session_id']}").status_code == 204
+    assert client.delete(f"/api/v1/sessions/{session['session_id']}").status_code == 404
+
+
+def test_session_status_codes(point_model, monkeypatch):
+    response = client.post("/api/v1/sessions", json={"bounding_box": [-97.0, 32.0, -96.0, 33.0], "zoom_level": 17})
+    assert response.status_code == 400
+    assert "limit is" in response.json()["error"]["message"]
+
+    session = client.post("/api/v1/sessions", json={"bounding_box": SESSION_BOX, "zoom_level": 17}).json()
+    response = client.post(f"/api/v1/sessions/{session['session_id']}/points", json={"points_include": [[-96.0, 32.0]]})
+    assert response.status_code == 400
+    assert "within the session bounding box" in response.json()["error"]["message"]
+
+    # Sessions that were idle for longer than the timeout are gone
+    monkeypatch.setattr(point_predict.sessionStore, "ttl_seconds", 0.01)
+    time.sleep(0.05)
+    response = client.post(f"/api/v1/sessions/{session['session_id']}/points", json={"points_include": [POINT]})
+    assert response.status_code == 404
+    assert "not found or expired" in response.json()["error"]["message"]
+
+
+def test_polygons_removed_by_min_area_leave_an_empty_feature_collection(point_model):
+    request = {"points_include": [POINT], "zoom_level": 17, "min_area": 1e9}
+    response = client.post("/api/v1/predict/points", json=request)
+    assert response.status_code == 200
+    assert response.json()[0]["geojson"] == {"type": "FeatureCollection", "features": []}
+
+    session = client.post("/api/v1/sessions", json={"bounding_box": SESSION_BOX, "zoom_level": 17}).json()
+    response = client.post(
+        f"/api/v1/sessions/{session['session_id']}/points", json={"points_include": [POINT], "min_area": 1e9}
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["geojson"] == {"type": "FeatureCollection", "features": []}
+
+
+def test_cached_result_echoes_the_box_threshold_of_the_request(point_model, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", True)
+    resultCache.clear()
+    request = {"points_include": [POINT], "zoom_level": 17}
+
+    first = client.post("/api/v1/predict/points", json=dict(request, box_threshold=0.3)).json()
+    hits = resultCache.stats()["hits"]
+    second = client.post("/api/v1/predict/points", json=dict(request, box_threshold=0.5)).json()
+    assert resultCache.stats()["hits"] == hits + 1
+    assert first[0]["prompt"]["box_threshold"] == 0.3
+    assert second[0]["prompt"]["box_threshold"] == 0.5
+    assert first[0]["geojson"] == second[0]["geojson"]
+
+
+def test_excluded_points_are_background_points():
+    labels = point_predict.point_prompt_labels([[0, 0]], [[1, 1], [2, 2]])
+    assert labels.tolist() == [1, 0, 0]
+    assert point_predict.point_prompt_labels([[0, 0]]).tolist() == [1]
@@ -0,0 +1,59 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.config import settings
+from app.main import app
+from app.segment_geospatial.predict import TextPredictor
+
+client = TestClient(app)
+
+REQUEST = {
+    "bounding_box": [-96.8104, 32.9714, -96.8100, 32.9718],
+    "zoom_level": 19,
+    "text_prompts": [{"value": "trees"}],
+}
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", False)
+
+
+def failing_predictions(self, **kwargs):
+    raise RuntimeError("CUDA out of memory")
+    yield
+
+
+def test_invalid_request_is_a_client_error():
+    request = dict(REQUEST, model_type="unknown")
+    assert client.post("/api/v1/predict/text", json=request).status_code == 400
+    assert client.post("/api/v1/predict/text/stream", json=request).status_code == 400
+
+
+@patch.object(TextPredictor, "iter_predictions", failing_predictions)
+def test_inference_failure_is_a_server_error():
+    response = client.post("/api/v1/predict/text", json=REQUEST)
+    assert response.status_code == 500
+    assert "CUDA out of memory" in response.json()["error"]["message"]
+
+    response = client.post("/api/v1/predict/text/stream", json=REQUEST)
+    assert response.status_code == 500
+
+
+def test_imagery_download_failure_is_a_server_error():
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("tile server unavailable")
+
+    with patch("app.segment_geospatial.predict.fetch_pixel_window", unavailable), \
+            patch("app.segment_geospatial.predict.modelRegistry.acquire"):
+        response = client.post("/api/v1/predict/text", json=REQUEST)
+    assert response.status_code == 500
+    assert "tile server unavailable" in response.json()["error"]["message"]
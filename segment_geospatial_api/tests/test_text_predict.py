@@ -0,0 +1,174 @@
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from shapely.geometry import shape
+from shapely.ops import unary_union
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.config import settings
+from app.schemas.predict import PromptConfig
+from app.segment_geospatial import predict
+from app.segment_geospatial.model_registry import ModelRegistry
+from app.segment_geospatial.predict import TextPredictor, textPredictor
+from app.segment_geospatial.utils import count_tiles, pixel_window_transform
+
+BOUNDING_BOX = [-96.83, 32.96, -96.81, 32.972]
+
+
+class FakeSamPredictor:
+    def __init__(self):
+        self.encoded = 0
+        self.image = None
+
+    def set_image(self, image):
+        self.encoded += 1
+        self.image = np.asarray(image)
+
+
+class FakeLangSAM:
+    """Stands in for LangSAM, detecting bright pixels of the red or green channel."""
+
+    def __init__(self):
+        self.sam = FakeSamPredictor()
+        self.masks = None
+
+    def predict(self, image, text_prompt, box_threshold, text_threshold):
+        self.sam.set_image(image)
+        channel = self.sam.image[..., 0 if text_prompt == "red" else 1]
+        # Two objects per prompt, LangSAM returns one mask per detected box
+        bright = channel > 100
+        half = bright.shape[1] // 2
+        left, right = bright.copy(), bright.copy()
+        left[:, half:] = False
+        right[:, :half] = False
+        self.masks = np.stack([left, right]) if bright.any() else None
+
+
+def fake_fetch_pixel_window(window, zoom_level, source="Satellite", on_tile=None):
+    """Imagery of red and green rectangles laid out in global pixel coordinates."""
+    left, top, right, bottom = window
+    rows, columns = np.mgrid[top:bottom, left:right]
+    image = np.zeros((bottom - top, right - left, 3), dtype=np.uint8)
+    image[((columns // 300) % 2 == 0) & ((rows // 700) % 2 == 0), 0] = 200
+    image[((columns // 500) % 3 == 1) & ((rows // 400) % 2 == 1), 1] = 200
+    return image, pixel_window_transform(window, zoom_level)
+
+
+@pytest.fixture
+def fake_model():
+    registry = ModelRegistry(max_bytes=1024**3)
+    model = FakeLangSAM()
+    registry.register("text", lambda model_type: model, settings.TEXT_MODEL_TYPES)
+    with patch.object(predict, "modelRegistry", registry), \
+            patch.object(predict, "fetch_pixel_window", fake_fetch_pixel_window):
+        yield model
+
+
+def prompts(*values):
+    return [PromptConfig(value=value) for value in values]
+
+
+def test_consumer_does_not_hold_the_model_lock(fake_model):
+    results = textPredictor.iter_predictions(
+        bounding_box=BOUNDING_BOX, text_prompts=prompts("red", "green"), zoom_level=17, windowed=False
+    )
+    first = next(results)
+    assert first["geojson"]["features"]
+    # The consumer has not asked for the next result yet, other requests may use the model
+    assert not TextPredictor._lock.locked()
+    assert next(results)["geojson"]["features"]
+
+
+def test_image_is_encoded_once_for_all_prompts(fake_model):
+    request = dict(
+        bounding_box=BOUNDING_BOX, text_prompts=prompts("red", "green", "red"), zoom_level=17, windowed=False
+    )
+
+    shared = textPredictor.run_predictions(reuse_embedding=True, **request)
+    assert fake_model.sam.encoded == 1
+
+    fake_model.sam.encoded = 0
+    separate = textPredictor.run_predictions(reuse_embedding=False, **request)
+    assert fake_model.sam.encoded == 3
+
+    assert shared == separate
+    assert [len(item["geojson"]["features"]) > 0 for item in shared["json"]] == [True, True, True]
+
+
+def test_shared_embedding_restores_set_image():
+    model = FakeLangSAM()
+    set_image = model.sam.set_image
+    with predict.shared_image_embedding(model):
+        model.sam.set_image(np.zeros((2, 2, 3)))
+        model.sam.set_image(np.ones((2, 2, 3)))
+    assert model.sam.encoded == 1
+    assert model.sam.set_image == set_image
+
+
+def test_merge_masks_combines_objects_into_one_mask():
+    torch = pytest.importorskip("torch")
+    masks = torch.zeros((2, 3, 3), dtype=torch.bool)
+    masks[0, 0, 0] = True
+    masks[1, 2, 2] = True
+
+    merged = predict.merge_masks(masks)
+    assert merged.dtype == np.uint8
+    assert merged.tolist() == [[255, 0, 0], [0, 0, 0], [0, 0, 255]]
+    assert predict.merge_masks(np.eye(2)).tolist() == [[255, 0], [0, 255]]
+    assert predict.merge_masks(None) is None
+    assert predict.merge_masks(np.zeros((0, 3, 3))) is None
+
+
+def union(result):
+    return unary_union([shape(feature["geometry"]) for feature in result["geojson"]["features"]])
+
+
+def test_windowed_path_matches_single_pass(fake_model, monkeypatch):
+    request = dict(bounding_box=BOUNDING_BOX, text_prompts=prompts("red", "green"), zoom_level=17)
+    single = textPredictor.run_predictions(windowed=False, **request)
+
+    monkeypatch.setattr(settings, "MAX_TILES_SINGLE_PASS", count_tiles(BOUNDING_BOX, 17) - 1)
+    monkeypatch.setattr(settings, "WINDOW_CHIP_SIZE", 512)
+    monkeypatch.setattr(settings, "WINDOW_OVERLAP", 64)
+    fake_model.sam.encoded = 0
+    # Areas above MAX_TILES_SINGLE_PASS are windowed by default
+    windowed = textPredictor.run_predictions(**request)
+    assert fake_model.sam.encoded > 1
+
+    for single_item, windowed_item in zip(single["json"], windowed["json"]):
+        assert single_item["prompt"] == windowed_item["prompt"]
+        assert single_item["geojson"]["features"]
+        # Polygons cut by window seams are merged back into the polygons of the single pass
+        assert len(windowed_item["geojson"]["features"]) == len(single_item["geojson"]["features"])
+        expected, actual = union(single_item), union(windowed_item)
+        assert expected.symmetric_difference(actual).area < expected.area * 1e-9
+
+
+def test_areas_above_the_tile_limit_are_rejected(fake_model, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_TILES_SINGLE_PASS", 1)
+    monkeypatch.setattr(settings, "MAX_TILES_LIMIT", count_tiles(BOUNDING_BOX, 17) - 1)
+
+    result = textPredictor.run_predictions(bounding_box=BOUNDING_BOX, text_prompts=prompts("red"), zoom_level=17)
+    assert result == {"error": "Area too large for zoom level 17. Please reduce zoom level or area size."}
+    assert fake_model.sam.encoded == 0
+
+
+def test_filtered_and_undetected_prompts(fake_model):
+    request = dict(bounding_box=BOUNDING_BOX, zoom_level=17, windowed=False)
+
+    filtered = textPredictor.run_predictions(text_prompts=prompts("red"), min_area=1e12, **request)
+    assert filtered["json"][0]["geojson"] == {"type": "FeatureCollection", "features": []}
+
+    # Nothing is detected in an image without bright pixels
+    with patch.object(predict, "fetch_pixel_window", lambda window, zoom_level, **kwargs: (
+        np.zeros((window[3] - window[1], window[2] - window[0], 3), dtype=np.uint8),
+        pixel_window_transform(window, zoom_level),
+    )):
+        undetected = textPredictor.run_predictions(text_prompts=prompts("red"), **request)
+    assert undetected["json"][0]["error"] == "No red found in the specified area"
@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.cache import TileCache
+from app.segment_geospatial.tile_fetcher import TileFetcher, TileFetchError
+from app.segment_geospatial import utils
+
+TILE_DELAY_SECONDS = 0.2
+
+
+class StubTileHandler(BaseHTTPRequestHandler):
+    """Serves solid-color PNG tiles whose red channel encodes the tile x index."""
+
+    requests = []
+    failures = {}
+
+    def do_GET(self):
+        StubTileHandler.requests.append(self.path)
+        if StubTileHandler.failures.get(self.path, 0) > 0:
+            StubTileHandler.failures[self.path] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] == "missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        time.sleep(TILE_DELAY_SECONDS)
+        x = int(parts[1])
+        buffer = BytesIO()
+        Image.new("RGB", (256, 256), (x % 256, 0, 0)).save(buffer, "PNG")
+        body = buffer.getvalue()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTileServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+@pytest.fixture
+def tile_server():
+    StubTileHandler.requests = []
+    StubTileHandler.failures = {}
+    server = StubTileServer(("127.0.0.1", 0), StubTileHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}" + "/{z}/{x}/{y}"
+    server.shutdown()
+
+
+def make_fetcher(cache=None):
+    return TileFetcher(
+        max_connections=64,
+        max_per_host=32,
+        retries=2,
+        backoff_seconds=0.01,
+        timeout_seconds=5,
+        cache=cache,
+    )
+
+
+@pytest.mark.asyncio
+async def test_tiles_are_fetched_concurrently(tile_server):
+    fetcher = make_fetcher()
+    tiles = [(x, y) for x in range(6) for y in range(5)]
+
+    start = time.monotonic()
+    results = await fetcher.fetch_tiles("stub", tile_server, 20, tiles)
+    elapsed = time.monotonic() - start
+    await fetcher.close()
+
+    assert set(results) == set(tiles)
+    # 30 tiles at 0.2 s each would take 6 s one after another
+    assert elapsed < TILE_DELAY_SECONDS * 5
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_retried(tile_server):
+    fetcher = make_fetcher()
+    StubTileHandler.failures["/20/1/1"] = 2
+
+    results = await fetcher.fetch_tiles("stub", tile_server, 20, [(1, 1)])
+    await fetcher.close()
+
+    assert (1, 1) in results
+    assert StubTileHandler.requests.count("/20/1/1") == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(tile_server):
+    fetcher = make_fetcher()
+    missing_template = tile_server.replace("/{z}/", "/missing/")
+
+    with pytest.raises(TileFetchError):
+        await fetcher.fetch_tiles("stub", missing_template, 20, [(1, 1)])
+    await fetcher.close()
+    assert len(StubTileHandler.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_tiles_skip_the_network(tile_server, tmp_path):
+    fetcher = make_fetcher(cache=TileCache(str(tmp_path), max_bytes=10 * 1024**2))
+    tiles = [(0, 0), (1, 0)]
+
+    await fetcher.fetch_tiles("stub", tile_server, 20, tiles)
+    results = await fetcher.fetch_tiles("stub", tile_server, 20, tiles + [(2, 0)])
+    await fetcher.close()
+
+    assert set(results) == {(0, 0), (1, 0), (2, 0)}
+    assert len(StubTileHandler.requests) == 3
+
+
+def test_fetch_satellite_image_mosaics_stub_tiles(tile_server):
+    fetcher = make_fetcher()
+    bounding_box = [-96.81040, 32.97140, -96.81000, 32.97180]
+    with patch.object(utils, "tileFetcher", fetcher):
+        image, transform = utils.fetch_satellite_image(bounding_box, 20, source=tile_server)
+    fetcher.close_blocking()
+
+    assert image.shape[2] == 3
+    min_x = utils.tile_range(bounding_box, 20)[0]
+    # The red channel of each column encodes the x index of the tile it came from
+    assert set(np.unique(image[:, :, 0])) == {min_x % 256, (min_x + 1) % 256}
+    assert transform.a == pytest.approx(-transform.e)
@@ -0,0 +1,163 @@
+import os
+import sys
+
+import numpy as np
+from pyproj import Transformer
+from rasterio.transform import from_origin
+from shapely.geometry import shape
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from app.segment_geospatial.utils import (
+    SeamDissolver,
+    calculate_bounding_box,
+    count_tiles,
+    dissolve_features,
+    iter_windows,
+    simplify_features,
+    snap_bounding_box_to_tiles,
+    tile_range,
+    to_output_geojson,
+    transform_coordinates,
+    vectorize_mask,
+)
+from affine import Affine
+
+BOUNDING_BOX = [-96.81040, 32.97140, -96.81000, 32.97180]
+
+
+def test_count_tiles():
+    assert count_tiles(BOUNDING_BOX, 20) == 4
+
+
+def test_snapped_bounding_box_covers_same_tiles():
+    snapped = snap_bounding_box_to_tiles(BOUNDING_BOX, 20)
+    assert tile_range(snapped, 20) == tile_range(BOUNDING_BOX, 20)
+    assert snapped[0] <= BOUNDING_BOX[0] and snapped[1] <= BOUNDING_BOX[1]
+    assert snapped[2] >= BOUNDING_BOX[2] and snapped[3] >= BOUNDING_BOX[3]
+    assert snap_bounding_box_to_tiles(snapped, 20) == snapped
+
+
+def test_nearby_points_share_tile_aligned_bounding_box():
+    first = calculate_bounding_box([[-96.81020, 32.97160]], 0.001, zoom_level=20)
+    second = calculate_bounding_box([[-96.81021, 32.97161]], 0.001, zoom_level=20)
+    assert first == second
+
+
+def test_calculate_bounding_box_without_snapping():
+    bounding_box = calculate_bounding_box([[-96.81020, 32.97160], [-96.81030, 32.97170]], 0.001)
+    np.testing.assert_allclose(bounding_box, [-96.81130, 32.97060, -96.80920, 32.97270])
+
+
+def test_transform_coordinates_matches_pyproj():
+    transformer = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+    ring = [[-10776884.4, 3891561.5], [-10776839.9, 3891561.5], [-10776839.9, 3891508.4], [-10776884.4, 3891561.5]]
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}},
+            {"type": "Feature", "properties": {}, "geometry": {"type": "MultiPolygon", "coordinates": [[ring], [ring]]}},
+            {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": ring[0]}},
+            {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": ring[:2]}},
+        ],
+    }
+    expected = [list(transformer.transform(x, y)) for x, y in ring]
+
+    features = transform_coordinates(geojson)["features"]
+    np.testing.assert_allclose(features[0]["geometry"]["coordinates"][0], expected)
+    np.testing.assert_allclose(features[1]["geometry"]["coordinates"][1][0], expected)
+    np.testing.assert_allclose(features[2]["geometry"]["coordinates"], expected[0])
+    np.testing.assert_allclose(features[3]["geometry"]["coordinates"], expected[:2])
+
+
+def test_vectorize_mask_in_memory():
+    mask = np.zeros((10, 10), dtype=np.uint8)
+    mask[2:4, 2:4] = 255
+    mask[6:9, 6:9] = 255
+
+    geojson = vectorize_mask(mask, from_origin(1000.0, 2000.0, 0.5, 0.5))
+    assert geojson["type"] == "FeatureCollection"
+    assert len(geojson["features"]) == 2
+    xs = [x for x, _ in geojson["features"][0]["geometry"]["coordinates"][0]]
+    assert min(xs) == 1001.0 and max(xs) == 1002.0
+
+
+def test_window_cores_cover_area_once_and_chips_fit_model():
+    window = (1000, 2000, 3500, 2900)
+    coverage = np.zeros((900, 2500), dtype=int)
+    for core, chip in iter_windows(window, chip_size=1024, overlap=128):
+        assert chip[2] - chip[0] <= 1024 and chip[3] - chip[1] <= 1024
+        assert chip[0] <= core[0] and chip[1] <= core[1] and chip[2] >= core[2] and chip[3] >= core[3]
+        coverage[core[1] - 2000:core[3] - 2000, core[0] - 1000:core[2] - 1000] += 1
+    assert (coverage == 1).all()
+
+
+def test_dissolve_merges_polygons_split_at_window_seam():
+    mask = np.zeros((4, 8), dtype=np.uint8)
+    mask[1:3, 2:6] = 255
+    left = vectorize_mask(mask[:, :4], Affine.translation(0, 0))["features"]
+    right = vectorize_mask(mask[:, 4:], Affine.translation(4, 0))["features"]
+    merged = dissolve_features(left + right, Affine(2, 0, 100, 0, -2, 50))
+    assert len(merged) == 1
+    xs = [x for x, _ in merged[0]["geometry"]["coordinates"][0]]
+    ys = [y for _, y in merged[0]["geometry"]["coordinates"][0]]
+    assert (min(xs), max(xs), min(ys), max(ys)) == (104, 112, 44, 48)
+
+
+def test_seam_dissolver_matches_dissolving_all_windows_at_once():
+    rng = np.random.default_rng(0)
+    window = (100, 200, 400, 440)
+    mask = np.zeros((240, 300), dtype=np.uint8)
+    for _ in range(40):
+        x, y, w, h = rng.integers(0, 300), rng.integers(0, 240), rng.integers(2, 90), rng.integers(2, 90)
+        mask[y:y + h, x:x + w] = 255
+
+    transform = Affine(0.5, 0, 1000, 0, -0.5, 2000)
+    dissolver = SeamDissolver(window, transform)
+    all_features = []
+    complete = []
+    for core, _ in iter_windows(window, chip_size=100, overlap=10):
+        core_mask = mask[core[1] - 200:core[3] - 200, core[0] - 100:core[2] - 100]
+        features = vectorize_mask(core_mask, Affine.translation(core[0], core[1]))["features"]
+        all_features.extend(features)
+        complete.extend(dissolver.add(features, core))
+        # Only polygons along the open seams are kept
+        assert all(polygon.bounds[3] >= core[1] for polygon in dissolver._open)
+    complete.extend(dissolver.finish())
+
+    expected = dissolve_features(all_features, transform)
+    assert len(complete) == len(expected)
+    assert sorted(shape(f["geometry"]).area for f in complete) == sorted(shape(f["geometry"]).area for f in expected)
+
+
+
+def test_simplify_features_reduces_vertices_and_drops_small_polygons():
+    # A staircase disc of 40 px radius and a 2x2 px speck at 0.5 m per pixel
+    yy, xx = np.mgrid[:200, :200]
+    mask = (((yy - 100) ** 2 + (xx - 100) ** 2) < 40**2).astype(np.uint8)
+    mask[5:7, 5:7] = 1
+    features = vectorize_mask(mask, from_origin(-10777000, 3885000, 0.5, 0.5))["features"]
+    assert len(features) == 2
+
+    # Web Mercator distances are stretched by 1 / cos(latitude)
+    latitude = 60.0
+    simplified = simplify_features(features, tolerance=0.5, min_area=2.0, latitude=latitude)
+    assert len(simplified) == 1
+    before = len(max(features, key=lambda f: len(f["geometry"]["coordinates"][0]))["geometry"]["coordinates"][0])
+    after = len(simplified[0]["geometry"]["coordinates"][0])
+    assert after < before / 4
+
+    disc = shape(max(features, key=lambda f: shape(f["geometry"]).area)["geometry"])
+    assert abs(shape(simplified[0]["geometry"]).area - disc.area) / disc.area < 0.02
+
+
+def test_output_geojson_rounds_coordinates():
+    mask = np.zeros((4, 4), dtype=np.uint8)
+    mask[1:3, 1:3] = 1
+    features = vectorize_mask(mask, from_origin(-10777000, 3885000, 0.3, 0.3))["features"]
+
+    geojson = to_output_geojson(features, latitude=32.97, coordinate_precision=6)
+    for lon, lat in geojson["features"][0]["geometry"]["coordinates"][0]:
+        assert lon == round(lon, 6) and lat == round(lat, 6)